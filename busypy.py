@@ -1,237 +1,901 @@
 from multiprocessing import Pool
+from multiprocessing import Process
+from multiprocessing import Value
+from multiprocessing import Array
 from multiprocessing import cpu_count
 import time
+import math
+import random
 import signal
 import os
 import sys
-import psutil
 import argparse
 import threading
-import random
-import string
 import socket
+import queue
 import grpc
 import busypy_pb2 as busypy_pb2
 import busypy_pb2_grpc as busypy_pb2_grpc
+from busypy_controller import CONTROLLERS, make_controller
+from busypy_engine import ENGINES, PERIOD_MS, make_engine
+from busypy_workload import WORKLOADS, make_workload
+from busypy_memory import MEMORY_INCREMENT_MB, MEMORY_TOLERANCE_PERCENT, MemoryArena, MemoryManager
+from busypy_sampler import SAMPLE_HZ, WINDOW_SEC, UsageSampler
+from busypy_profile import LoadProfile, ProfilePlayer
+from busypy_trace import TracePlayer, open_trace, expand_columns
+from busypy_io import IO_MODES, IO_BLOCK_KB, IO_FILE_MB, IO_FSYNC_EVERY, MB, IOLoad
+from busypy_membw import MEMBW_KERNELS, MEMBW_WORKING_SET_MB, GB, MemBandwidthLoad
+from busypy_net import NET_PORT, MBIT, NetSink, NetSender, parse_peer
+from busypy_metrics import MetricsRegistry, MetricsServer
+from busypy_affinity import MEM_NUMA_MODES, allowed_cpus, memory_nodes, nodes_of, parse_cpu_list, pin, set_memory_policy
+from busypy_cgroup import CgroupLimits, describe_quota
+from busypy_calibration import CALIBRATION_FILE, calibration_key, empty_table, known_points, learn, lookup, same_table
+from busypy_calibration import load as load_calibration, save as save_calibration
 
 # testing
 
 # A BUSY loop python program
-# Each processor starts a thread to get accurate CPU usage.
+# Each processor starts a sampler thread to get accurate CPU usage, and a control
+# thread to steer the busy loop.  The parent process owns the memory hog and the
+# one session with the server for the whole node.
 
 GRPC_SERVER_PORT = "50051"
 GRPC_SERVER = "localhost"
 
 lock = threading.Lock()
-PSUTIL_CAPTURE_INTERVAL_SEC = 2
-MEMORY_HOG_CHUNK_SIZE_MB = 100
+REPORT_INTERVAL_SEC = 2             # print status and talk to the server, the server may suggest another
+POLL_INTERVAL_MIN_SEC = 0.5         # bounds of the server's suggested interval
+POLL_INTERVAL_MAX_SEC = 300
+POLL_BACKOFF_MIN_SEC = 1            # retries while the server is unavailable back off from this
+POLL_BACKOFF_MAX_SEC = 60           # up to this, with jitter
+RECONNECT_JITTER_SEC = 1            # a returning server is contacted after a random delay of up to this
+SAMPLE_RATE_HZ = SAMPLE_HZ          # cpu usage sampling rate
+SAMPLE_WINDOW_SEC = WINDOW_SEC      # cpu usage moving window, also the control interval
+MEMORY_ADJUST_INTERVAL_SEC = 0.5
+PROFILE_TICK_SEC = 0.1              # load profile resolution
+TARGET_POLL_SEC = 0.1               # workers pick up new targets this often
 
 BusyPySettings = {
     "update": True,  # when set client will update
     "cpu": 10,
     "mem": 5,
     "exit": False,
+    "io_mbps": 0,    # disk I/O targets, 0=none
+    "io_iops": 0,
+    "membw": 0.0,    # memory bandwidth target GB/s, 0=none
+    "net_mbps": 0.0, # network target Mbit/s, 0=none
 }
 
-SLEEP_INC = 0.0001
-SLEEP_INC_FAST_FACTOR = 0.8
-SLEEP_INITIAL_VALUE = 0.4  # start from a low CPU usage and go higher
-SLEEP_INITIAL_BINARY_SRC_COUNT = 20   # # cycles to try sleep *= SLEEP_INC_FAST_FACTOR
+CONTROLLER = "pid"       # see busypy_controller.CONTROLLERS
+ENGINE = "timeslice"     # see busypy_engine.ENGINES
+ENGINE_PERIOD_MS = PERIOD_MS
+WORKLOAD = "sort"        # see busypy_workload.WORKLOADS
+BURN_THREADS = 1         # burn threads per process, > 1 needs a workload that releases the GIL
+
+MEM_INCREMENT_MB = MEMORY_INCREMENT_MB
+MEM_TOLERANCE_PERCENT = MEMORY_TOLERANCE_PERCENT
+
+IO_MODE = "randread"     # see busypy_io.IO_MODES
+IO_DIR = None            # scratch file directory, None is the temp dir
+IO_BLOCK_SIZE_KB = IO_BLOCK_KB
+IO_FILE_SIZE_MB = IO_FILE_MB
+IO_DIRECT = False
+IO_FSYNC = IO_FSYNC_EVERY
+IO_MMAP = False
+IO_RATE_HEADROOM = 2.0   # the I/O controller may issue up to this many times the target op rate
+IO_IDLE_SEC = 0.2        # I/O worker poll interval while there is no I/O target
+
+MEMBW_KERNEL = "triad"   # see busypy_membw.MEMBW_KERNELS
+MEMBW_WORKING_SET = MEMBW_WORKING_SET_MB
+
+NET_SINK_PORT = NET_PORT  # port of this node's network sink, 0=no sink
+NET_PEER = None           # fixed "host:port" to send to, None takes the peer from the server
+NET_SENDFILE = False
+NET_RATE_HEADROOM = 2.0   # the network controller may send up to this many times the target rate
+NET_RETRY_SEC = 2
 
-MEM_TOLERANCE_PERCENT = 2
+METRICS_PORT = 0          # Prometheus metrics http port, 0=none
+GROUP = None              # group name sent to the server, targets can be set per group, see busypy_admin.py
+
+CPU_LIST = None           # cpus the busy loop processes are pinned to, --threads cpus each, None=not pinned
+MEM_POLICY = None         # (set_mempolicy policy, [NUMA nodes]) of the memory hog and bandwidth load, None=OS default
+
+CGROUP_TARGETS = False    # cpu/mem targets are a percent of the cgroup cpu quota and memory limit, not of the host
+CGROUP_POLL_SEC = 5       # cgroup limits are reread, and throttling reported, this often
+CGROUP_MEMORY_MAX_PERCENT = 90  # the memory hog never takes busypy past this percent of the cgroup memory limit
+
+CALIBRATION = CALIBRATION_FILE  # target -> duty cycle calibration file, see busypy_calibration.py, None=off
+CALIBRATION_KEY = None          # the table of this host/Python/workload in the file, see calibration_key()
+CALIBRATION_SAVE_SEC = 30       # the calibration learned so far is saved this often, and at exit
 
-current_cpu_usage = 0
-update = False
 running = True
 force_exit = False
 processes = 1
 
+# the load profile being played, see busypy_profile.ProfilePlayer, None for constant targets
+profile_player = None
+# the trace being replayed, see busypy_trace.TracePlayer
+trace_player = None
+# limits of the cgroup busypy runs in, see busypy_cgroup.CgroupLimits, None if not in a cgroup
+cgroup_limits = None
+
+# node state shared between the parent process, which owns the memory hog and
+# the one server session of the node, and the worker processes running the
+# busy loops, see _make_shared()
+shared = {}
+
+
+def _make_shared(num_workers):
+    """ Create the state shared between the parent and the worker processes
+    :param num_workers: number of busy loop processes
+    :return: dict of multiprocessing Value/Array
+    """
+    return {
+        "cpu_target": Value('d', BusyPySettings["cpu"]),  # per core cpu target %, of the cgroup quota with --cgroup-targets
+        "cpu_scale": Value('d', 1.0),                     # per core cpu % per cpu_target %, see _cgroup_apply()
+        "mem_target": Value('i', BusyPySettings["mem"]),  # node memory target %
+        "mem_percent": Value('d', 0.0),                   # measured node memory %
+        "exit": Value('b', False),                        # server told the node to exit
+        "worker_pid": Array('i', num_workers),            # pid of each worker, by worker index
+        "worker_cpu": Array('d', num_workers),            # measured per core cpu % of each worker
+        "worker_target": Array('d', [-1.0] * num_workers),  # per core cpu target % of each worker, < 0 uses cpu_target
+        "worker_settle": Array('d', [float("nan")] * num_workers),  # controller settling time s, NaN while settling
+        "worker_sse": Array('d', [float("nan")] * num_workers),     # controller steady state error %
+        "worker_overshoot": Array('d', num_workers),      # mean busy loop sleep overshoot s, over the last window
+        "io_mbps_target": Value('d', BusyPySettings["io_mbps"]),  # node disk I/O targets
+        "io_iops_target": Value('d', BusyPySettings["io_iops"]),
+        "io_status": Array('d', 5),                       # measured MB/s, IOPS, latency p50/p95/p99 ms
+        "membw_target": Value('d', BusyPySettings["membw"]),  # node memory bandwidth target GB/s
+        "membw": Value('d', 0.0),                         # measured memory bandwidth GB/s
+        "net_target": Value('d', BusyPySettings["net_mbps"]),  # node network target Mbit/s
+        "net_peer": Array('c', 128),                      # "host:port" to send to, empty=own sink
+        "net_port": Value('i', 0),                        # port of the running network sink, 0=none
+        "net_status": Array('d', 2),                      # measured Mbit/s sent, received
+        "cgroup": Array('d', 5),                          # cpu quota (cpus), memory limit (bytes), 0=none,
+                                                          # nr_periods, nr_throttled, throttled s
+        "calibration": Array('d', empty_table()),         # duty cycle per per core cpu %, NaN=not known yet
+    }
+
+
+# node metrics, see --metrics-port, the gauges are filled from the shared state at scrape time
+metrics = MetricsRegistry()
+grpc_latency = metrics.histogram("busypy_grpc_latency_seconds",
+                                 "Round trip time to the server, GetSettings calls and Subscribe stream opens",
+                                 ("method",))
+_worker_labels = ("worker", "pid")
+_cpu_target_gauge = metrics.gauge("busypy_cpu_target_percent", "Per core cpu target of each busy loop process",
+                                  _worker_labels)
+_cpu_gauge = metrics.gauge("busypy_cpu_percent", "Measured per core cpu of each busy loop process", _worker_labels)
+_error_gauge = metrics.gauge("busypy_controller_error_percent", "cpu target - measured cpu", _worker_labels)
+_settle_gauge = metrics.gauge("busypy_controller_settling_seconds",
+                              "Time to converge on the current target, NaN until settled", _worker_labels)
+_sse_gauge = metrics.gauge("busypy_controller_steady_state_error_percent",
+                           "Mean error since settling, NaN until settled", _worker_labels)
+_overshoot_gauge = metrics.gauge("busypy_sleep_overshoot_seconds",
+                                 "Mean time the busy loop sleeps overshoot their deadline, over the last window",
+                                 _worker_labels)
+_mem_target_gauge = metrics.gauge("busypy_memory_target_percent", "Node memory target")
+_mem_gauge = metrics.gauge("busypy_memory_percent", "Measured memory of busypy, as a percent of the node")
+_io_gauge = metrics.gauge("busypy_io", "Measured disk I/O", ("unit",))
+_membw_gauge = metrics.gauge("busypy_membw_gbps", "Measured memory bandwidth GB/s")
+_net_gauge = metrics.gauge("busypy_net_mbps", "Measured network Mbit/s", ("direction",))
+_cgroup_gauge = metrics.gauge("busypy_cgroup", "cgroup cpu quota (cpus) and memory limit (bytes), 0=none", ("limit",))
+_throttled_gauge = metrics.gauge("busypy_cgroup_throttled", "cgroup cpu.stat periods, throttled periods and seconds",
+                                 ("counter",))
+
+
+@metrics.collector
+def _collect_metrics():
+    for x, pid in enumerate(shared["worker_pid"]):
+        if not pid:
+            continue
+        target, cpu = _cpu_target(x), shared["worker_cpu"][x]
+        _cpu_target_gauge.set(target, worker=x, pid=pid)
+        _cpu_gauge.set(cpu, worker=x, pid=pid)
+        _error_gauge.set(target - cpu, worker=x, pid=pid)
+        _settle_gauge.set(shared["worker_settle"][x], worker=x, pid=pid)
+        _sse_gauge.set(shared["worker_sse"][x], worker=x, pid=pid)
+        _overshoot_gauge.set(shared["worker_overshoot"][x], worker=x, pid=pid)
+    _mem_target_gauge.set(shared["mem_target"].value)
+    _mem_gauge.set(shared["mem_percent"].value)
+    for unit, value in zip(("mbps", "iops", "latency_p50_ms", "latency_p95_ms", "latency_p99_ms"), shared["io_status"]):
+        _io_gauge.set(value, unit=unit)
+    _membw_gauge.set(shared["membw"].value)
+    _net_gauge.set(shared["net_status"][0], direction="sent")
+    _net_gauge.set(shared["net_status"][1], direction="received")
+    if cgroup_limits is not None:
+        cpus, memory, periods, throttled, seconds = shared["cgroup"]
+        _cgroup_gauge.set(cpus, limit="cpus")
+        _cgroup_gauge.set(memory, limit="memory_bytes")
+        _throttled_gauge.set(periods, counter="nr_periods")
+        _throttled_gauge.set(throttled, counter="nr_throttled")
+        _throttled_gauge.set(seconds, counter="throttled_seconds")
+
+
+def _cpu_target(x):
+    """ per core cpu target of worker x, its own target if it has one, else the node cpu_target
+    """
+    target = shared["worker_target"][x]
+    return target if target >= 0 else shared["cpu_target"].value * shared["cpu_scale"].value
+
+
+def _node_cpus():
+    """ cpus a node wide cpu target (--cpu, a local profile or trace) is split over, 1 with --cgroup-targets,
+    where the targets stay a percent of the quota and cpu_scale splits them
+    """
+    return 1 if CGROUP_TARGETS else processes * BURN_THREADS
+
+
+def _reset_controller(controller, target):
+    """ (Re)target a busy loop controller, from the calibrated duty cycle of the target if it is known
+    """
+    controller.reset(target)
+    if CALIBRATION:
+        duty = lookup(shared["calibration"], target)
+        if duty is not None:
+            controller.start_at(duty)
+
+
+def calibration_save(stop):
+    """ This function runs on a thread in the parent process, saves the
+    calibration the busy loop processes learned every CALIBRATION_SAVE_SEC, and
+    once more when stopped
+    :param stop: threading.Event, set to exit
+    """
+    saved = list(shared["calibration"])
+    while True:
+        stopping = stop.wait(CALIBRATION_SAVE_SEC)
+        table = list(shared["calibration"])
+        if not same_table(table, saved):
+            try:
+                save_calibration(CALIBRATION, CALIBRATION_KEY, table)
+                saved = table
+            except (IOError, OSError) as e:
+                print("Calibration not saved to {}: {}".format(CALIBRATION, e))
+        if stopping:
+            break
+    print("calibration_save thread exit")
+
+
+def _init_worker(state):
+    """ Pool initializer, hands the shared state to the worker
+    """
+    shared.update(state)
+
+
+def _worker_cpus(x):
+    """ cpus worker x is pinned to, one per burn thread, None if not pinned
+    """
+    if not CPU_LIST:
+        return None
+    return sorted(set(CPU_LIST[(x * BURN_THREADS + t) % len(CPU_LIST)] for t in range(BURN_THREADS)))
+
+
+def _place_memory(what):
+    """ Apply the NUMA memory policy to the calling thread, it applies to the memory it touches from now on
+    """
+    if MEM_POLICY is None:
+        return
+    policy, nodes = MEM_POLICY
+    try:
+        set_memory_policy(policy, nodes)
+        print("{} memory on NUMA node(s) {}".format(what, nodes))
+    except OSError as e:
+        print("{} memory placement failed: {}".format(what, e))
+
+
+def memory_usage(manager, stop):
+    """ This function runs on a thread in the parent process, it is the only
+    owner of the memory hog for the node.
+    - resizes the memory arena to hit the shared mem_target, the node memory percent
+    - publishes the measured node memory percent in the shared mem_percent
+    - the arena is placed on the --mem-numa node(s), as this thread fills it
+    :param manager: MemoryManager
+    :param stop: threading.Event, set to exit
+    """
+    _place_memory("Memory hog")
+    while not stop.is_set():
+        shared["mem_percent"].value = manager.adjust(shared["mem_target"].value)
+        stop.wait(MEMORY_ADJUST_INTERVAL_SEC)
+    manager.close()
+    print("memory_usage thread exit")
+
+
+def _cgroup_apply(quota, manager):
+    """ Apply the cgroup limits
+    - with --cgroup-targets cpu targets are a percent of the quota, spread over the busy loop cpus, and the
+      memory target is a percent of the memory limit
+    - the memory hog is capped at CGROUP_MEMORY_MAX_PERCENT of the memory limit, so it does not get busypy
+      OOM killed, whatever the target
+    :param quota: busypy_cgroup.CgroupQuota
+    :param manager: MemoryManager
+    """
+    cpus, memory = cgroup_limits.capacity(quota)
+    if CGROUP_TARGETS:
+        shared["cpu_scale"].value = cpus / (processes * BURN_THREADS)
+        manager.total = memory
+    manager.limit = quota.memory * CGROUP_MEMORY_MAX_PERCENT / 100.0 if quota.memory is not None else None
+
+
+def _cgroup_publish(quota):
+    shared["cgroup"][:] = [quota.cpus or 0, quota.memory or 0, quota.nr_periods, quota.nr_throttled,
+                           quota.throttled_sec]
+
+
+def cgroup_watch(quota, manager, stop):
+    """ This function runs on a thread in the parent process, every CGROUP_POLL_SEC it
+    - rereads the cgroup limits, they can change under a running container (e.g. docker update --cpus),
+      and applies them when they do, see _cgroup_apply()
+    - publishes the limits and the throttling counters in the shared cgroup status, for the server
+    - prints when the cpu was throttled since the last time
+    :param quota: busypy_cgroup.CgroupQuota applied at startup
+    :param manager: MemoryManager
+    :param stop: threading.Event, set to exit
+    """
+    last = quota
+    while not stop.wait(CGROUP_POLL_SEC):
+        quota = cgroup_limits.read()
+        _cgroup_publish(quota)
+        if (quota.cpus, quota.memory) != (last.cpus, last.memory):
+            print("cgroup limits changed: {}".format(describe_quota(quota)))
+            _cgroup_apply(quota, manager)
+        if quota.nr_throttled > last.nr_throttled:
+            print("cgroup cpu throttled in {} of {} periods, {:.2f}s".format(quota.nr_throttled - last.nr_throttled,
+                                                                            quota.nr_periods - last.nr_periods,
+                                                                            quota.throttled_sec - last.throttled_sec))
+        last = quota
+    print("cgroup_watch thread exit")
+
+
+def set_profile(player):
+    """ Start playing a load profile, or stop with None, the targets are set right away
+    :param player: ProfilePlayer or None
+    """
+    global profile_player
+    profile_player = player
+    if player is not None:
+        _apply_profile(player)
+
+
+def _apply_profile(player):
+    cpu, mem = player.targets(time.time())
+    shared["cpu_target"].value = cpu
+    if mem is not None:
+        shared["mem_target"].value = int(round(mem))
+
+
+def apply_trace(cpu_values, mem):
+    """ TracePlayer callback, sets the targets from one trace row
+    - one cpu column is the node total, split per cpu like --cpu
+    - else there is one cpu column per worker process, split over its burn threads
+    :param cpu_values: cpu percent per trace cpu column
+    :param mem: node memory percent, None if the trace has no mem column
+    """
+    if len(cpu_values) == 1:
+        shared["cpu_target"].value = max(0.0, cpu_values[0] / _node_cpus())
+    else:
+        for x, cpu in enumerate(cpu_values):
+            shared["worker_target"][x] = max(0.0, cpu / BURN_THREADS * shared["cpu_scale"].value)
+    if mem is not None:
+        shared["mem_target"].value = int(round(mem))
+
+
+def stop_trace():
+    """ Stop replaying the trace, and go back to the node cpu target
+    """
+    global trace_player
+    player = trace_player
+    if player is None:
+        return
+    trace_player = None
+    player.stop()
+    for x in range(len(shared["worker_target"])):
+        shared["worker_target"][x] = -1.0
+
+
+def profile_usage(stop):
+    """ This function runs on a thread in the parent process, while a load
+    profile is set it moves the shared cpu/mem targets along the profile
+    every PROFILE_TICK_SEC, the workers follow the shared targets
+    :param stop: threading.Event, set to exit
+    """
+    while not stop.is_set():
+        player = profile_player
+        if player is not None:
+            _apply_profile(player)
+        stop.wait(PROFILE_TICK_SEC)
+    print("profile_usage thread exit")
+
+
+class Backoff(object):
+    """ Exponential backoff with jitter, each delay is a random value in the
+    upper half of the current step, so clients that failed together spread out
+    """
+
+    def __init__(self, minimum=POLL_BACKOFF_MIN_SEC, maximum=POLL_BACKOFF_MAX_SEC, factor=2.0):
+        self.minimum = minimum
+        self.maximum = maximum
+        self.factor = factor
+        self.failures = 0
+
+    def next(self):
+        """ :return: seconds to wait before the next retry
+        """
+        step = min(self.maximum, self.minimum * self.factor ** self.failures)
+        self.failures += 1
+        return random.uniform(step / 2, step)
+
+    def reset(self):
+        self.failures = 0
+
 
 # gRPC stuff taken from https://alexandreesl.com/tag/grpc/, https://grpc.io/docs/tutorials/basic/python.html
 class gRPCClient():
 
     GRPC_TIMEOUT = 2
+    STREAM_RETRY_SEC = 0.5
+
+    # reconnect quickly when the server comes back, the default backoff grows to 2 minutes
+    CHANNEL_OPTIONS = [('grpc.initial_reconnect_backoff_ms', 250),
+                       ('grpc.min_reconnect_backoff_ms', 250),
+                       ('grpc.max_reconnect_backoff_ms', 1000)]
 
     def __init__(self, pid):
         server_addr = '{}:{}'.format(GRPC_SERVER, GRPC_SERVER_PORT)
-        channel = grpc.insecure_channel(server_addr)
+        channel = grpc.insecure_channel(server_addr, options=self.CHANNEL_OPTIONS)
+        self.streaming = True  # cleared if the server does not support Subscribe
         self.stub = busypy_pb2_grpc.BusyPyServiceStub(channel)
 
+        # the channel keeps (re)connecting in the background, cheap TCP connects, not RPCs,
+        # so a client backing off from a dead server still sees it come back right away
+        self.connected = threading.Event()
+        channel.subscribe(self._connectivity, try_to_connect=True)
+        self.channel = channel
+
         # from https://stackoverflow.com/questions/166506/finding-local-ip-addresses-using-pythons-stdlib
         ip = (([ip for ip in socket.gethostbyname_ex(socket.gethostname())[2] if not ip.startswith("127.")] or [
             [(s.connect(("8.8.8.8", 53)), s.getsockname()[0], s.close()) for s in
              [socket.socket(socket.AF_INET, socket.SOCK_DGRAM)]][0][1]]) + ["no IP found"])[0]
 
         self.metadata = [('ip', ip), ('pid', str(pid))]
+        if GROUP:
+            self.metadata.append(('group', GROUP))
 
         print("Server: {}, metadata: {}".format(server_addr, self.metadata))
 
-    def GetSettings(self, cpu, memory, running):
-        client_exit = not running
-        return self.stub.GetSettings(busypy_pb2.BusyPySettings(cpuLoadPercent=cpu,
-                                                               memoryPercent=int(memory),
-                                                               clientExit=client_exit,
-                                                               update=False),  # update has no meaning for server
+    def _connectivity(self, state):
+        if state == grpc.ChannelConnectivity.READY:
+            self.connected.set()
+        else:
+            self.connected.clear()
+
+    def wait_retry(self, delay, stop):
+        """ Wait before retrying a failed call, cut short when the server comes
+        back, then wait a random bit more so the clients do not all call at once
+        :param delay: seconds, see Backoff
+        :param stop: threading.Event, set to exit
+        :return: True if the server came back
+        """
+        was_connected = self.connected.is_set()
+        deadline = time.time() + delay
+        while not stop.is_set():
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                return False
+            if not was_connected and self.connected.wait(min(remaining, 0.5)):
+                stop.wait(random.uniform(0, RECONNECT_JITTER_SEC))
+                return True
+            if was_connected:
+                stop.wait(remaining)
+        return False
+
+    def GetSettings(self, status):
+        return self.stub.GetSettings(status,
                                      metadata=self.metadata,
                                      timeout=self.GRPC_TIMEOUT)
 
+    def Subscribe(self, status_iterator):
+        """ Open the settings stream, status messages from status_iterator are sent
+        to the server, new settings are pushed back by the server when they change
+        :return: iterator of BusyPySettings, also a grpc.Call that can be cancelled
+        """
+        return self.stub.Subscribe(status_iterator, metadata=self.metadata)
 
-def f(x):
-    """ This is a worker function that is run one per processor.
-    - starts a busy loop with a sleep to burn up processor usage
-    - creates an array to gobble up memory
-    - gets 'commands/settings' from a gRPC Server
-    :param x: not used
-    """
-    global current_cpu_usage, update, running, force_exit, sleep
 
-    pid = os.getpid()
-    client = gRPCClient(pid)
-    p = psutil.Process(pid)
-    ip = socket.gethostbyname(socket.gethostname())
-    MEMORY_HOG = []
+class NodeSession(object):
+    """ The one server session of the node, runs in the parent process.
+    - sends one status message covering all the busy loop processes
+    - applies the settings from the server to the shared state, where the
+      worker processes pick them up
+    """
 
-    os.nice(10)
+    def __init__(self):
+        self.client = gRPCClient(os.getpid())
+        self._queue = None  # status queue of the open settings stream, None when not connected
+        self._profile = None  # last LoadProfile from the server
+        self._call = None
+        self._stop = threading.Event()
+        self._threads = []
+        self.poll_interval = REPORT_INTERVAL_SEC  # seconds between status reports, the server may suggest another
+        self._available = True
+
+    def exiting(self):
+        return self._stop.is_set() or shared["exit"].value
+
+    def _wait_for_workers(self):
+        """ Wait for the busy loop processes to start, so the server sees their
+        pids in the first status, rather than the pid of this process
+        """
+        while not all(shared["worker_pid"]) and not self.exiting():
+            self._stop.wait(0.1)
 
-    def set_memory():
-        MEMORY_HOG.clear()
-        while p.memory_percent() < BusyPySettings["mem"]:
-            MEMORY_HOG.append("*" * 1024 * 1024 * MEMORY_HOG_CHUNK_SIZE_MB)
+    def status(self):
+        """ Status of the node, and each of its busy loop processes
+        :return: BusyPySettings
+        """
+        # in the units of the server targets, a percent of the cgroup quota with --cgroup-targets
+        scale = shared["cpu_scale"].value or 1.0
+        workers = [busypy_pb2.WorkerStatus(pid=pid, cpuLoadPercent=int(round(cpu / scale)))
+                   for pid, cpu in zip(shared["worker_pid"], shared["worker_cpu"]) if pid]
+        cpu = sum(w.cpuLoadPercent for w in workers) / len(workers) if workers else 0
+        io = None
+        if shared["io_mbps_target"].value or shared["io_iops_target"].value:
+            mbps, iops, p50, p95, p99 = shared["io_status"]
+            io = busypy_pb2.IOStatus(mbps=mbps, iops=iops, latencyP50Ms=p50, latencyP95Ms=p95, latencyP99Ms=p99)
+        cgroup = None
+        if cgroup_limits is not None:
+            cpus, memory, periods, throttled, seconds = shared["cgroup"]
+            cgroup = busypy_pb2.CgroupStatus(cpuQuota=cpus, memoryLimit=int(memory), nrPeriods=int(periods),
+                                             nrThrottled=int(throttled), throttledSec=seconds)
+        return busypy_pb2.BusyPySettings(cpuLoadPercent=int(round(cpu)),
+                                         memoryPercent=int(round(shared["mem_percent"].value)),
+                                         clientExit=not running or bool(shared["exit"].value),
+                                         update=False,  # update has no meaning for server
+                                         workers=workers,
+                                         ioMBps=int(round(io.mbps)) if io else 0,
+                                         ioIOPS=int(round(io.iops)) if io else 0,
+                                         io=io,
+                                         memBandwidthGBps=shared["membw"].value,
+                                         netMbps=shared["net_status"][0],
+                                         netPort=shared["net_port"].value,
+                                         netRxMbps=shared["net_status"][1],
+                                         cgroup=cgroup)
+
+    def apply_settings(self, newTargets):
+        """ Apply settings received from the server
+        :param newTargets: BusyPySettings
+        """
+        interval = REPORT_INTERVAL_SEC
+        if newTargets.pollInterval > 0:
+            interval = min(POLL_INTERVAL_MAX_SEC, max(POLL_INTERVAL_MIN_SEC, newTargets.pollInterval))
+        if interval != self.poll_interval:
+            print("Reporting to the server every {}s".format(interval))
+            self.poll_interval = interval
+
+        if not newTargets.update:
+            return
+
+        if trace_player is not None:
+            print("Server sent new targets, trace replay stopped")
+            stop_trace()
+
+        BusyPySettings["cpu"] = newTargets.cpuLoadPercent
+        BusyPySettings["mem"] = newTargets.memoryPercent
+        BusyPySettings["exit"] = newTargets.clientExit
+
+        if newTargets.HasField("profile"):
+            # the profile is sent with every update, only (re)start it when it changes
+            if newTargets.profile != self._profile:
+                self._profile = newTargets.profile
+                print("Server sent a load profile of {} segments".format(len(newTargets.profile.segments)))
+                shared["mem_target"].value = newTargets.memoryPercent  # unless the profile sets memory
+                set_profile(ProfilePlayer(LoadProfile.from_proto(newTargets.profile), time.time()))
+        else:
+            if self._profile is not None or profile_player is not None:
+                set_profile(None)
+                self._profile = None
+            shared["cpu_target"].value = newTargets.cpuLoadPercent
+            shared["mem_target"].value = newTargets.memoryPercent
+
+        BusyPySettings["io_mbps"] = newTargets.ioMBps
+        BusyPySettings["io_iops"] = newTargets.ioIOPS
+        shared["io_mbps_target"].value = newTargets.ioMBps
+        shared["io_iops_target"].value = newTargets.ioIOPS
+
+        BusyPySettings["membw"] = newTargets.memBandwidthGBps
+        shared["membw_target"].value = newTargets.memBandwidthGBps
+
+        BusyPySettings["net_mbps"] = newTargets.netMbps
+        shared["net_target"].value = newTargets.netMbps
+        if NET_PEER is None:
+            shared["net_peer"].value = newTargets.netPeer.encode()
+
+        if newTargets.clientExit and not shared["exit"].value:
+            print("Server instructed to exit...")
+            shared["exit"].value = True
+
+    def _server_state(self, available):
+        """ Print when the server goes away or comes back
+        """
+        if available != self._available:
+            self._available = available
+            print("Server {}".format("is back" if available else "unavailable, backing off"))
 
-    set_memory()
+    def _status_stream(self, statuses, closed):
+        """ Request side of the settings stream, yields status messages until
+        None is queued or the stream is closed
+        """
+        while not closed.is_set():
+            try:
+                status = statuses.get(timeout=self.poll_interval)
+            except queue.Empty:
+                continue
+            if status is None:
+                return
+            yield status
+
+    def settings_stream(self, arg):
+        """ This function runs on a thread in the parent process.
+        - subscribes to the server, and applies settings as the server pushes them
+        - resubscribes if the server goes away, backing off while it is
+          unavailable, falls back to polling (see report) if the server does
+          not support Subscribe
+        :param arg: nothing right now
+        """
+        self._wait_for_workers()
+        backoff = Backoff()
+        while self.client.streaming and not self.exiting():
+            statuses = queue.Queue()
+            closed = threading.Event()
+            statuses.put(self.status())  # the server gets a status as soon as the stream opens
+            opened = False
+            try:
+                start = time.perf_counter()
+                self._call = self.client.Subscribe(self._status_stream(statuses, closed))
+                self._queue = statuses
+                # the server sends the headers as soon as the stream opens
+                if self._call.initial_metadata() is not None and not self._call.done():
+                    grpc_latency.observe(time.perf_counter() - start, method="Subscribe")
+                    opened = True
+                    backoff.reset()
+                    self._server_state(True)
+                for newTargets in self._call:
+                    self.apply_settings(newTargets)
+
+            except grpc.RpcError as e:
+                if e.code() == grpc.StatusCode.UNIMPLEMENTED:
+                    print("Server does not support Subscribe, polling instead")
+                    self.client.streaming = False
+
+                elif e.code() not in (grpc.StatusCode.UNAVAILABLE,
+                                      grpc.StatusCode.DEADLINE_EXCEEDED,
+                                      grpc.StatusCode.CANCELLED):
+                    print(e)
 
-    def cpu_usage(arg):
-        """ This function runs on a thread spawned off the process, and therefore
-        does not affect the busy loop.
-        - this thread is blocked by
-          - PSUTIL_CAPTURE_INTERVAL_SEC
-          - talking to gRPC Server
-        - prints out the current status of cpu/memory usage
-        - tries to talk to the gRPC server to get new targets
-        - sets the flag 'update' which triggers the main process to
-          update its cpu(sleep)/mem usage in order to try and hit target
+            finally:
+                self._queue = None
+                self._call = None
+                closed.set()
+
+            if opened:
+                # the stream was up, resubscribe right away, e.g. the server restarted
+                delay = self.client.STREAM_RETRY_SEC
+            else:
+                self._server_state(False)
+                delay = backoff.next()
+            self.client.wait_retry(delay, self._stop)
+
+    def report(self, arg):
+        """ This function runs on a thread in the parent process.
+        - sends the node status to the server on the settings stream, or if the
+          server does not support streams, polls the server for new targets
+        - reports every poll_interval, and backs off while the server is unavailable
         :param arg: nothing right now
         """
-        global current_cpu_usage, update, running, binary_src_count, sleep
+        self._wait_for_workers()
+        backoff = Backoff()
+        next_report = time.time() + self.poll_interval
+        while not self.exiting():
+            self._stop.wait(max(0, next_report - time.time()))
+            if self._stop.is_set():
+                break
+            next_report += self.poll_interval
+
+            if self.client.streaming:
+                statuses = self._queue
+                if statuses is not None:
+                    statuses.put(self.status())
+                continue
 
-        os.nice(10)
+            try:
+                start = time.perf_counter()
+                newTargets = self.client.GetSettings(self.status())
+                grpc_latency.observe(time.perf_counter() - start, method="GetSettings")
+                backoff.reset()
+                self._server_state(True)
+                self.apply_settings(newTargets)
+
+            except grpc.RpcError as e:
+                # see https://stackoverflow.com/questions/43869397/how-do-you-set-a-timeout-in-pythons-grpc-library
 
-        while (not BusyPySettings["exit"]) and not force_exit:
-            cp = int(p.cpu_percent(interval=PSUTIL_CAPTURE_INTERVAL_SEC))  # blocking
-            mp = int(p.memory_percent())
-            with lock:
-                current_cpu_usage = cp
-                update = True
+                if e.code() in (grpc.StatusCode.UNAVAILABLE, grpc.StatusCode.DEADLINE_EXCEEDED):
+                    # the server may not be present, back off rather than keep calling it,
+                    # and call again as soon as the wait is over
+                    self._server_state(False)
+                    self.client.wait_retry(backoff.next(), self._stop)
+                    next_report = time.time()
 
-            print("IP: {}, PID:{:5d}, CPU: {:2d}/{:2d}%, Mem: {:2d}/{:2d}%, (Sleep: {:6.5f})".format(ip,
-                                                                                                     pid,
-                                                                                                     current_cpu_usage,
-                                                                                                     BusyPySettings["cpu"],
-                                                                                                     mp,
-                                                                                                     BusyPySettings["mem"],
-                                                                                                     sleep))
+                else:
+                    print(e)
 
-            try:
-                newTargets = client.GetSettings(cp, mp, running)
-                if newTargets.update:
-                    if BusyPySettings["mem"] != newTargets.memoryPercent:
-                        BusyPySettings["mem"] = newTargets.memoryPercent
-                        set_memory()
+    def start(self):
+        self._threads = [threading.Thread(target=self.report, args=(None,)),
+                         threading.Thread(target=self.settings_stream, args=(None,))]
+        for t in self._threads:
+            t.daemon = True  # may be blocked on the stream at exit
+            t.start()
+        return self
 
-                    BusyPySettings["cpu"] = newTargets.cpuLoadPercent
-                    BusyPySettings["exit"] = newTargets.clientExit
+    def stop(self):
+        """ Report in one last time, then close the session
+        """
+        self._stop.set()
+        final = self.status()
+        final.clientExit = True
+        statuses = self._queue
+        try:
+            if statuses is not None:
+                statuses.put(final)
+                statuses.put(None)
+            elif not self.client.streaming:
+                self.client.GetSettings(final)
+        except grpc.RpcError:
+            pass
+
+        # give the last status a chance to go out on the stream before closing it
+        for t in self._threads:
+            t.join(gRPCClient.GRPC_TIMEOUT)
+        call = self._call
+        if call is not None:
+            call.cancel()
 
-                    binary_src_count = SLEEP_INITIAL_BINARY_SRC_COUNT
-                    sleep = SLEEP_INITIAL_VALUE
 
-                if BusyPySettings["exit"]:
-                    print("Server instructed to exit...")
-                    running = False
-                    client.GetSettings(cp, mp, running)  # report in one last time
+def f(x):
+    """ This is a worker function that is run one per processor.
+    - starts a busy loop with a sleep to burn up processor usage
+    - publishes its cpu usage in the shared state, the parent process reports
+      it to the server
+    - follows the cpu target and exit flag in the shared state, which the
+      parent process sets from the server
+    :param x: worker index, its slot in the shared state
+    """
+    global running, force_exit
 
-            except KeyboardInterrupt:
-                BusyPySettings["exit"] = True
+    pid = os.getpid()
+    shared["worker_pid"][x] = pid
+    cpus = _worker_cpus(x)
+    if cpus is not None:
+        # before any thread is started, threads inherit the affinity
+        try:
+            pin(cpus)
+            print("Worker {} pid {} pinned to cpu(s) {}".format(x, pid, cpus))
+        except OSError as e:
+            print("Worker {} pid {} not pinned: {}".format(x, pid, e))
+    sampler = UsageSampler(pid, hz=SAMPLE_RATE_HZ, window=SAMPLE_WINDOW_SEC).start()
+    ip = socket.gethostbyname(socket.gethostname())
 
-            except Exception as e:
-                # see https://stackoverflow.com/questions/43869397/how-do-you-set-a-timeout-in-pythons-grpc-library
+    os.nice(10)
 
-                if str(e.code()) == u'StatusCode.UNAVAILABLE':
-                    # the server may not be present, allow silent fail
-                    pass
+    controller = make_controller(CONTROLLER)
+    _reset_controller(controller, _cpu_target(x))
+    engine = make_engine(ENGINE, period_ms=ENGINE_PERIOD_MS, work=make_workload(WORKLOAD))
+
+    def control(arg):
+        """ This function runs on a thread spawned off the process, once per
+        sample window it
+        - feeds the measured cpu usage to the controller, which sets the duty
+          cycle of the main busy loop in order to try and hit target
+        - publishes the measured cpu usage, and picks up new targets, from the
+          shared state
+        Sampling is non blocking, so this runs at the window rate.  Targets are
+        picked up every TARGET_POLL_SEC, so a load profile has sub second resolution.
+        :param arg: nothing right now
+        """
+        global running
+
+        last = time.time()
+        next_update = last + SAMPLE_WINDOW_SEC
+        last_sleeps, last_overshoot = engine.sleeps, engine.overshoot
+        while running and not force_exit:
+            time.sleep(max(0, min(TARGET_POLL_SEC, next_update - time.time())))
+            now = time.time()
+            target = _cpu_target(x)
+            with lock:
+                if abs(controller.target - target) > controller.tolerance:
+                    # a step, start over and measure a full window at the new target
+                    _reset_controller(controller, target)
+                    next_update = now + SAMPLE_WINDOW_SEC
+                    last = now
+                elif controller.target != target:
+                    controller.follow(target)
+
+            if shared["exit"].value:
+                running = False
+
+            if now < next_update:
+                continue
+            next_update += SAMPLE_WINDOW_SEC
+
+            # targets are per core, so average the process usage over the burn threads
+            cp = sampler.cpu_percent() / BURN_THREADS
+            shared["worker_cpu"][x] = cp
+            with lock:
+                controller.update(cp, now - last)
+                if CALIBRATION and controller.settled:
+                    # refine the calibration online, with the duty cycle that holds the target
+                    learn(shared["calibration"], controller.target, controller.duty)
+            last = now
+
+            # for the metrics
+            sse = controller.steady_state_error
+            shared["worker_settle"][x] = controller.settling_time if controller.settled else float("nan")
+            shared["worker_sse"][x] = sse if sse is not None else float("nan")
+            sleeps, overshoot = engine.sleeps - last_sleeps, engine.overshoot - last_overshoot
+            shared["worker_overshoot"][x] = overshoot / sleeps if sleeps else 0.0
+            last_sleeps, last_overshoot = engine.sleeps, engine.overshoot
 
-                elif str(e.code()) == u'StatusCode.DEADLINE_EXCEEDED':
-                    # the server may not be present, allow silent fail
-                    pass
+    def cpu_usage(arg):
+        """ This function runs on a thread spawned off the process, and therefore
+        does not affect the busy loop.
+        - prints out the current status of cpu/memory usage every REPORT_INTERVAL_SEC
+        :param arg: nothing right now
+        """
+        os.nice(10)
 
-                else:
-                    print(e)
+        next_report = time.time()
+        while running and not force_exit:
+            next_report += REPORT_INTERVAL_SEC
+            time.sleep(max(0, next_report - time.time()))
 
-            # because memory usage does not depend on a measurement timing window
-            # like cpu usage does, update on every loop thru...
-            # note that this memory usage adaptation could be running on multiple
-            # cpus (processes) and thus "fighting" each other... but in testing
-            # this error seemed minimal... TODO: allow only one process to do memory usage
-            low_mem = BusyPySettings["mem"] - MEM_TOLERANCE_PERCENT
-            hi_mem = BusyPySettings["mem"] + MEM_TOLERANCE_PERCENT
-            if p.memory_percent() > hi_mem:
-                MEMORY_HOG.pop()
-            elif p.memory_percent() < low_mem:
-                MEMORY_HOG.append("*" * 1024 * 1024 * MEMORY_HOG_CHUNK_SIZE_MB)
+            cp = int(round(sampler.cpu_percent() / BURN_THREADS))
+            mp = int(round(shared["mem_percent"].value))
+            node_cp = sampler.node_cpu_percent()
+
+            print("IP: {}, PID:{:5d}, CPU: {:2d}/{:2.0f}%, Mem: {:2d}/{:2d}%, Node: {:3.0f}%, ({})".format(ip,
+                                                                                                       pid,
+                                                                                                       cp,
+                                                                                                       controller.target,
+                                                                                                       mp,
+                                                                                                       shared["mem_target"].value,
+                                                                                                       node_cp or 0,
+                                                                                                       controller.status()))
 
         print("cpu_usage thread exit")
 
-    # fire off a thread in order to read cpu/mem usage.  This is done because in order to
-    # get decent accuracy the cpu_percent() call needs 2 seconds to measure.
+    # fire off threads to steer the busy loop, and to print cpu/mem usage.
+    c = threading.Thread(target=control, args=(None,))
+    c.start()
     t = threading.Thread(target=cpu_usage, args=(None,))
     t.start()
 
-    # create some dummy things in order to make cpu/mem busy
-    sortme = ''.join(random.choice(string.ascii_uppercase) for _ in range(100))
+    def burn(arg):
+        """ Extra burn thread, runs the same duty cycle as the main busy loop
+        on its own engine and workload instance.
+        :param arg: nothing right now
+        """
+        burn_engine = make_engine(ENGINE, period_ms=ENGINE_PERIOD_MS, work=make_workload(WORKLOAD))
+        while running and not force_exit:
+            burn_engine.cycle(controller.duty)
 
-    # quick and dirty things to make CPU busy... hacked!
-    reversed = False
-    sleep = SLEEP_INITIAL_VALUE
-    binary_src_count = SLEEP_INITIAL_BINARY_SRC_COUNT
-    busy_iterations = 500
-    busy_iterations_increase_done = False
+    burners = [threading.Thread(target=burn, args=(None,)) for _ in range(BURN_THREADS - 1)]
+    for b in burners:
+        b.start()
 
-    # main busy loop
+    # main busy loop, the controller sets the duty cycle (busy time / period)
+    # and the engine burns cpu for that fraction of each period
     try:
         while running:
-            for i in range(busy_iterations):
-                sortme = sorted(sortme, reverse=reversed)
-                (x+22) * (x+33) / (i + 1) * ord(sortme[i % 10])
-                reversed = not reversed
-            time.sleep(sleep)
-
-            with lock:
-                # check to see if we should update 'sleep' in order to hit target
-                if update:
-                    update = False
-
-                    # initially use a binary like search to approach the desired usage
-                    if binary_src_count > 0:
-                        binary_src_count -= 1
-                        if current_cpu_usage < BusyPySettings["cpu"]:
-                            sleep = sleep * SLEEP_INC_FAST_FACTOR
-                        else:
-                            # cpu usage is now greater than target, stop binary search
-                            binary_src_count = 0
-
-                    # then finally use small increments to get to the usage
-                    else:
-                        if current_cpu_usage > BusyPySettings["cpu"]:
-                            sleep += SLEEP_INC
-                        else:
-                            if sleep >= SLEEP_INC:
-                                sleep -= SLEEP_INC
-
-                    # finally, if we exhaust the range, increase pure iterations for extra usage
-                    if sleep < SLEEP_INC:
-                        sleep = SLEEP_INC
-                        if not busy_iterations_increase_done:
-                            busy_iterations *= 2
-                            busy_iterations_increase_done = True
+            engine.cycle(controller.duty)
 
     except Exception as e:
         print(e)
@@ -239,16 +903,270 @@ def f(x):
     except KeyboardInterrupt:
         running = False  # exit the thread that was started
 
-    BusyPySettings["exit"] = True
     force_exit = True
     print("busyloop exit")
 
     try:
+        c.join()
         t.join()
+        for b in burners:
+            b.join()
+        sampler.stop()
     except:
         pass
 
 
+def io_worker(state):
+    """ This is the disk I/O worker, run in its own process next to the busy
+    loop processes.
+    - reads/writes a scratch file to hit the shared MB/s and IOPS targets, the
+      scratch file only exists while there is a target
+    - publishes the achieved MB/s, IOPS and latency percentiles in the shared
+      io_status, the parent process reports them to the server
+    The op rate is closed loop like the cpu, the controller works on the achieved
+    rate as a percent of the target rate, and its duty cycle scales the issued
+    rate from 0 to IO_RATE_HEADROOM times the target.
+    :param state: shared state, see _make_shared()
+    """
+    _init_worker(state)
+    os.nice(10)
+
+    controller = make_controller("pid", ff_gain=1.0 / IO_RATE_HEADROOM)
+    load = None
+    rate = 0.0
+    last = last_ops = last_bytes = next_report = 0
+
+    try:
+        while running and not shared["exit"].value:
+            mbps, iops = shared["io_mbps_target"].value, shared["io_iops_target"].value
+            if mbps <= 0 and iops <= 0:
+                if load is not None:
+                    load.close()
+                    load = None
+                    rate = 0.0
+                    shared["io_status"][:] = [0.0] * 5
+                time.sleep(IO_IDLE_SEC)
+                continue
+
+            if load is None:
+                try:
+                    load = IOLoad(IO_DIR, mode=IO_MODE, block_kb=IO_BLOCK_SIZE_KB, file_mb=IO_FILE_SIZE_MB,
+                                  direct=IO_DIRECT, fsync_every=IO_FSYNC, use_mmap=IO_MMAP)
+                except (IOError, OSError, ValueError) as e:
+                    print("I/O worker disabled: {}".format(e))
+                    return
+                print("I/O worker: {} {}KB blocks on {}".format(IO_MODE, load.block // 1024, load.path))
+
+            # with both targets the higher op rate wins
+            target = max(iops, mbps * MB / load.block)
+            now = time.time()
+            if target != rate:
+                rate = target
+                controller.reset(100)
+                last, last_ops, last_bytes = now, load.ops, load.bytes
+                next_report = now + REPORT_INTERVAL_SEC
+
+            elif now - last >= SAMPLE_WINDOW_SEC:
+                dt = now - last
+                achieved = (load.ops - last_ops) / dt
+                controller.update(100.0 * achieved / rate, dt)
+                shared["io_status"][:] = [(load.bytes - last_bytes) / dt / MB, achieved] + load.latency.percentiles()
+                last, last_ops, last_bytes = now, load.ops, load.bytes
+
+            if now >= next_report:
+                next_report += REPORT_INTERVAL_SEC
+                io_mbps, io_iops, p50, p95, p99 = shared["io_status"]
+                print("IO: {:6.1f}/{:.0f} MB/s, {:6.0f}/{:.0f} IOPS, lat p50/p95/p99: {:.2f}/{:.2f}/{:.2f} ms, ({})".format(
+                    io_mbps, mbps, io_iops, iops, p50, p95, p99, controller.status()))
+
+            load.cycle(rate * controller.duty * IO_RATE_HEADROOM)
+
+    except KeyboardInterrupt:
+        pass
+
+    finally:
+        if load is not None:
+            load.close()
+    print("io_worker exit")
+
+
+def membw_worker(state):
+    """ This is the memory bandwidth worker, run in its own process next to
+    the busy loop processes.
+    - runs a memory bandwidth kernel (see busypy_membw) at a duty cycle, to hit
+      the shared GB/s target, the arrays only exist while there is a target
+    - publishes the achieved GB/s in the shared membw
+    The peak GB/s of the kernel is measured first, then the controller works like
+    it does for the cpu, with the target and the achieved GB/s as a percent of the peak.
+    :param state: shared state, see _make_shared()
+    """
+    _init_worker(state)
+    os.nice(10)
+    if CPU_LIST:
+        # next to the busy loops, so --mem-numa remote really is remote for the kernel
+        try:
+            pin(CPU_LIST)
+        except OSError as e:
+            print("Memory bandwidth worker not pinned: {}".format(e))
+    _place_memory("Memory bandwidth")
+
+    controller = make_controller(CONTROLLER)
+    load = engine = None
+    peak = target = 0.0
+    last = last_bytes = next_report = 0
+
+    try:
+        while running and not shared["exit"].value:
+            gbps = shared["membw_target"].value
+            if gbps <= 0:
+                if load is not None:
+                    load = engine = None  # frees the arrays
+                    target = 0.0
+                    shared["membw"].value = 0.0
+                time.sleep(IO_IDLE_SEC)
+                continue
+
+            if load is None:
+                try:
+                    load = MemBandwidthLoad(MEMBW_KERNEL, working_set_mb=MEMBW_WORKING_SET)
+                except (RuntimeError, ValueError, MemoryError) as e:
+                    print("Memory bandwidth worker disabled: {}".format(e))
+                    return
+                peak = load.calibrate()
+                engine = make_engine("timeslice", period_ms=ENGINE_PERIOD_MS, work=load)
+                print("Memory bandwidth worker: {}, {}MB working set, peak {:.1f} GB/s".format(MEMBW_KERNEL,
+                                                                                                MEMBW_WORKING_SET,
+                                                                                                peak))
+
+            now = time.time()
+            if gbps != target:
+                target = gbps
+                controller.reset(100.0 * target / peak)
+                last, last_bytes = now, load.bytes
+                next_report = now + REPORT_INTERVAL_SEC
+
+            elif now - last >= SAMPLE_WINDOW_SEC:
+                dt = now - last
+                shared["membw"].value = (load.bytes - last_bytes) / dt / GB
+                controller.update(100.0 * shared["membw"].value / peak, dt)
+                last, last_bytes = now, load.bytes
+
+            if now >= next_report:
+                next_report += REPORT_INTERVAL_SEC
+                print("MemBW: {:5.2f}/{:.2f} GB/s, peak {:.1f} GB/s, ({})".format(shared["membw"].value,
+                                                                                   target, peak,
+                                                                                   controller.status()))
+
+            engine.cycle(controller.duty)
+
+    except KeyboardInterrupt:
+        pass
+    print("membw_worker exit")
+
+
+def net_worker(state):
+    """ This is the network worker, run in its own process next to the busy
+    loop processes.
+    - runs the node's network sink, which peers send to
+    - streams to the peer in the shared net_peer (from the server or --net-peer),
+      or to its own sink, at the shared Mbit/s target
+    - publishes the achieved Mbit/s sent and received in the shared net_status
+    The send rate is closed loop, like the disk I/O worker.
+    :param state: shared state, see _make_shared()
+    """
+    _init_worker(state)
+    os.nice(10)
+
+    sink = None
+    if NET_SINK_PORT:
+        try:
+            sink = NetSink(NET_SINK_PORT).start()
+            shared["net_port"].value = sink.port
+        except OSError as e:
+            print("Network sink disabled, port {}: {}".format(NET_SINK_PORT, e))
+
+    controller = make_controller("pid", ff_gain=1.0 / NET_RATE_HEADROOM)
+    sender = None
+    failed_peer = None
+    target = 0.0
+    last = time.time()
+    last_tx = last_rx = 0
+    next_report = last + REPORT_INTERVAL_SEC
+
+    try:
+        while running and not shared["exit"].value:
+            now = time.time()
+            if now - last >= SAMPLE_WINDOW_SEC:
+                dt = now - last
+                tx = (sender.bytes - last_tx) / dt / MBIT if sender is not None else 0.0
+                rx = (sink.bytes - last_rx) / dt / MBIT if sink is not None else 0.0
+                shared["net_status"][:] = [tx, rx]
+                if sender is not None and target:
+                    controller.update(100.0 * tx / target, dt)
+                last = now
+                last_tx = sender.bytes if sender is not None else 0
+                last_rx = sink.bytes if sink is not None else 0
+
+            if now >= next_report:
+                next_report += REPORT_INTERVAL_SEC
+                tx, rx = shared["net_status"]
+                if target:
+                    print("Net: {:7.1f}/{:.0f} Mbit/s to {}, received {:7.1f} Mbit/s, ({})".format(
+                        tx, target, "{}:{}".format(*sender.peer) if sender is not None else "-", rx,
+                        controller.status()))
+                elif rx:
+                    print("Net: received {:7.1f} Mbit/s".format(rx))
+
+            mbps = shared["net_target"].value
+            peer = shared["net_peer"].value.decode() or ("127.0.0.1:{}".format(sink.port) if sink is not None else "")
+            if mbps <= 0 or not peer:
+                if sender is not None:
+                    sender.close()
+                    sender = None
+                target = 0.0
+                time.sleep(IO_IDLE_SEC)
+                continue
+
+            peer = parse_peer(peer)
+            if sender is None or sender.peer != peer:
+                if sender is not None:
+                    sender.close()
+                    sender = None
+                try:
+                    sender = NetSender(peer[0], peer[1], use_sendfile=NET_SENDFILE)
+                except (OSError, ValueError) as e:
+                    if failed_peer != peer:
+                        print("Network peer {}:{} unreachable: {}".format(peer[0], peer[1], e))
+                        failed_peer = peer
+                    time.sleep(NET_RETRY_SEC)
+                    continue
+                failed_peer = None
+                print("Network: sending to {}:{}".format(*peer))
+                target = 0.0  # new stream, restart the controller
+
+            if mbps != target:
+                target = mbps
+                controller.reset(100)
+                last, last_tx, last_rx = now, sender.bytes, sink.bytes if sink is not None else 0
+
+            try:
+                sender.cycle(target * MBIT * controller.duty * NET_RATE_HEADROOM)
+            except OSError as e:
+                print("Network peer {}:{} failed: {}".format(peer[0], peer[1], e))
+                sender.close()
+                sender = None
+
+    except KeyboardInterrupt:
+        pass
+
+    finally:
+        if sender is not None:
+            sender.close()
+        if sink is not None:
+            sink.stop()
+    print("net_worker exit")
+
+
 def exit_gracefully(signum, frame):
     # from https://stackoverflow.com/questions/18114560/python-catch-ctrl-c-command-prompt-really-want-to-quit-y-n-resume-executi
     global running
@@ -258,7 +1176,7 @@ def exit_gracefully(signum, frame):
     signal.signal(signal.SIGINT, original_sigint)
 
     running = False
-    time.sleep(PSUTIL_CAPTURE_INTERVAL_SEC)  # gives a chance for the thead to run and exit
+    time.sleep(REPORT_INTERVAL_SEC)  # gives a chance for the thead to run and exit
 
     # restore the exit gracefully handler here
     signal.signal(signal.SIGINT, exit_gracefully)
@@ -296,15 +1214,141 @@ if __name__ == '__main__':
     parser.add_argument('--mem', type=int, default=BusyPySettings["mem"],
                         help='Percent usage of the memory, default={}'.format(BusyPySettings["mem"]))
 
+    parser.add_argument('--mem-increment-mb', dest="mem_increment_mb", action='store', type=float,
+                        default=MEM_INCREMENT_MB,
+                        help='Memory is grown/shrunk in steps of this many MB, default={}.'.format(MEM_INCREMENT_MB))
+
     parser.add_argument('--cpu-all', dest="cpu_all", action='store_true', default=False,
                         help='Use all CPUs, default only one CPU is used.')
 
     parser.add_argument('--cpus', dest="cpus", action='store', type=int, default=1,
                         help='Number CPUs to use, default only one CPU is used.')
 
+    parser.add_argument('--cpu-list', dest="cpu_list", action='store',
+                        help='Pin the busy loop processes to these cpus, e.g. 0-3,8 or node1 for the cpus of NUMA '
+                             'node 1, one process per cpu (per --threads cpus), overrides --cpus.')
+
+    parser.add_argument('--pin', dest="pin", action='store_true', default=False,
+                        help='Pin the busy loop processes to the first allowed cpus, one per process.')
+
+    parser.add_argument('--mem-numa', dest="mem_numa", action='store', default="none",
+                        help='NUMA placement of the memory hog and the memory bandwidth working set, one of {}, '
+                             'or a node list, e.g. 1 or 0,2, local/remote are the nodes with/without the busy loop '
+                             'cpus, default=none.'.format(", ".join(MEM_NUMA_MODES)))
+
+    parser.add_argument('--cgroup-targets', dest="cgroup_targets", action='store_true', default=False,
+                        help='cpu/mem targets, local and from the server, are a percent of the cgroup (container) '
+                             'cpu quota and memory limit, rather than of the host, --cpu-all uses the quota.')
+
+    parser.add_argument('--calibration', dest="calibration", action='store', default=CALIBRATION_FILE,
+                        help='File of the learned cpu target -> duty cycle mapping of this host, Python and '
+                             'workload, busy loops start from it and refine it, default={}.'.format(CALIBRATION_FILE))
+
+    parser.add_argument('--no-calibration', dest="no_calibration", action='store_true', default=False,
+                        help='Do not use or update the calibration file.')
+
+    parser.add_argument('--controller', dest="controller", action='store', default=CONTROLLER,
+                        choices=sorted(CONTROLLERS),
+                        help='CPU usage controller, default={}.'.format(CONTROLLER))
+
+    parser.add_argument('--engine', dest="engine", action='store', default=ENGINE,
+                        choices=sorted(ENGINES),
+                        help='CPU burn engine, default={}.'.format(ENGINE))
+
+    parser.add_argument('--period-ms', dest="period_ms", action='store', type=float, default=ENGINE_PERIOD_MS,
+                        help='Busy loop period of the timeslice engine in ms, default={}.'.format(ENGINE_PERIOD_MS))
+
+    parser.add_argument('--workload', dest="workload", action='store', default=WORKLOAD,
+                        choices=sorted(WORKLOADS),
+                        help='Compute kernel used to burn CPU, all but sort release the GIL, default={}.'.format(WORKLOAD))
+
+    parser.add_argument('--threads', dest="threads", action='store', type=int, default=BURN_THREADS,
+                        help='Burn threads per CPU process, default={}.'.format(BURN_THREADS))
+
+    parser.add_argument('--sample-hz', dest="sample_hz", action='store', type=float, default=SAMPLE_RATE_HZ,
+                        help='CPU usage sampling rate, default={}.'.format(SAMPLE_RATE_HZ))
+
+    parser.add_argument('--window', dest="window", action='store', type=float, default=SAMPLE_WINDOW_SEC,
+                        help='CPU usage moving average window and control interval in seconds, default={}.'.format(SAMPLE_WINDOW_SEC))
+
+    parser.add_argument('--io-mbps', dest="io_mbps", action='store', type=int, default=BusyPySettings["io_mbps"],
+                        help='Disk I/O MB/s, 0=none, default={}.'.format(BusyPySettings["io_mbps"]))
+
+    parser.add_argument('--io-iops', dest="io_iops", action='store', type=int, default=BusyPySettings["io_iops"],
+                        help='Disk I/O operations per second, 0=none, default={}.'.format(BusyPySettings["io_iops"]))
+
+    parser.add_argument('--io-mode', dest="io_mode", action='store', default=IO_MODE, choices=IO_MODES,
+                        help='Disk I/O pattern, like fio, default={}.'.format(IO_MODE))
+
+    parser.add_argument('--io-dir', dest="io_dir", action='store', default=IO_DIR,
+                        help='Directory of the I/O scratch file, default is the temp directory.')
+
+    parser.add_argument('--io-block-kb', dest="io_block_kb", action='store', type=int, default=IO_BLOCK_SIZE_KB,
+                        help='Disk I/O block size in KB, default={}.'.format(IO_BLOCK_SIZE_KB))
+
+    parser.add_argument('--io-file-mb', dest="io_file_mb", action='store', type=int, default=IO_FILE_SIZE_MB,
+                        help='Size of the I/O scratch file in MB, default={}.'.format(IO_FILE_SIZE_MB))
+
+    parser.add_argument('--io-direct', dest="io_direct", action='store_true', default=IO_DIRECT,
+                        help='Open the I/O scratch file O_DIRECT, bypassing the page cache.')
+
+    parser.add_argument('--io-fsync', dest="io_fsync", action='store', type=int, default=IO_FSYNC,
+                        help='fsync after this many writes, 0=never, default={}.'.format(IO_FSYNC))
+
+    parser.add_argument('--io-mmap', dest="io_mmap", action='store_true', default=IO_MMAP,
+                        help='Do the I/O through an mmap of the scratch file.')
+
+    parser.add_argument('--membw', dest="membw", action='store', type=float, default=BusyPySettings["membw"],
+                        help='Memory bandwidth GB/s, 0=none, needs numpy, default={}.'.format(BusyPySettings["membw"]))
+
+    parser.add_argument('--membw-kernel', dest="membw_kernel", action='store', default=MEMBW_KERNEL,
+                        choices=MEMBW_KERNELS,
+                        help='Memory bandwidth kernel, chase reads random cache lines, default={}.'.format(MEMBW_KERNEL))
+
+    parser.add_argument('--membw-working-set-mb', dest="membw_working_set_mb", action='store', type=float,
+                        default=MEMBW_WORKING_SET,
+                        help='Memory bandwidth working set in MB, default={}.'.format(MEMBW_WORKING_SET))
+
+    parser.add_argument('--net-mbps', dest="net_mbps", action='store', type=float, default=BusyPySettings["net_mbps"],
+                        help='Network Mbit/s sent, 0=none, default={}.'.format(BusyPySettings["net_mbps"]))
+
+    parser.add_argument('--net-peer', dest="net_peer", action='store', default=NET_PEER,
+                        help='Send to this host[:port], default is the peer from the server, or this node.')
+
+    parser.add_argument('--net-port', dest="net_port", action='store', type=int, default=NET_SINK_PORT,
+                        help='Port of this node\'s network sink, 0=no sink, default={}.'.format(NET_SINK_PORT))
+
+    parser.add_argument('--net-sendfile', dest="net_sendfile", action='store_true', default=NET_SENDFILE,
+                        help='Send with sendfile() from a scratch file, rather than from a buffer.')
+
+    parser.add_argument('--profile', dest="profile", action='store',
+                        help='JSON load profile to play, cpu values like --cpu, see busypy_profile.py, overrides --cpu/--mem.')
+
+    parser.add_argument('--trace', dest="trace", action='store',
+                        help='CSV or binary utilization trace to replay, see busypy_trace.py, overrides --cpu/--mem.')
+
+    parser.add_argument('--trace-cpu', dest="trace_cpu", action='store', default="cpu",
+                        help='Trace cpu column(s), one for the node total, like --cpu, or one per CPU, '
+                             '{host} is replaced by the host name, default=cpu.')
+
+    parser.add_argument('--trace-mem', dest="trace_mem", action='store',
+                        help='Trace memory percent column, {host} is replaced by the host name, default none.')
+
+    parser.add_argument('--trace-speed', dest="trace_speed", action='store', type=float, default=1.0,
+                        help='Trace playback speed, 60 plays an hour in a minute, default=1.0.')
+
+    parser.add_argument('--trace-loop', dest="trace_loop", action='store_true', default=False,
+                        help='Replay the trace forever.')
+
+    parser.add_argument('--metrics-port', dest="metrics_port", action='store', type=int, default=METRICS_PORT,
+                        help='Serve Prometheus metrics on this http port, 0=none, default={}.'.format(METRICS_PORT))
+
     parser.add_argument('--server', dest="grpc_server", action='store', default=GRPC_SERVER,
                         help='gRPC server, default={}.'.format(GRPC_SERVER))
 
+    parser.add_argument('--group', dest="group", action='store', default=GROUP,
+                        help='Group of this client, targets can be set per group on a running server, default=none.')
+
     parser.add_argument('--port', dest="grpc_port", action='store', default=GRPC_SERVER_PORT,
                         help='gRPC server port, default={}.'.format(GRPC_SERVER_PORT))
 
@@ -318,29 +1362,215 @@ if __name__ == '__main__':
 
     # TODO: limit cpu usage to 5-90%
 
-    if args.cpu_all:  processes = cpu_count()
+    cgroup_limits = CgroupLimits()
+    if cgroup_limits.found:
+        cgroup_quota = cgroup_limits.read()
+        print("cgroup v{}, {}".format(cgroup_limits.version, describe_quota(cgroup_quota)))
+    else:
+        cgroup_limits = None
+    if args.cgroup_targets:
+        if cgroup_limits is None:
+            print("--cgroup-targets needs cgroup limits, busypy is not in a cgroup")
+            sys.exit(1)
+        CGROUP_TARGETS = True
+
+    if args.cpu_all and CGROUP_TARGETS:  processes = int(math.ceil(cgroup_limits.capacity(cgroup_quota)[0]))
+    elif args.cpu_all:  processes = cpu_count()
     else: processes = args.cpus
 
-    # docker stats reports the total (sum) of % user per CPU,
-    # busypy takes the target percent and divides per # of cpus
+    SAMPLE_RATE_HZ = args.sample_hz
+    SAMPLE_WINDOW_SEC = args.window
+    WORKLOAD = args.workload
+    BURN_THREADS = max(1, args.threads)
+    if BURN_THREADS > 1 and not WORKLOADS[WORKLOAD].releases_gil:
+        print("Warning: workload '{}' holds the GIL, {} threads per process will not use more than one core".format(WORKLOAD, BURN_THREADS))
 
-    BusyPySettings["cpu"] = int(args.cpu / processes)
-    BusyPySettings["mem"] = int(args.mem / processes)
+    try:
+        if args.cpu_list:
+            CPU_LIST = parse_cpu_list(args.cpu_list)
+            not_allowed = sorted(set(CPU_LIST) - set(allowed_cpus()))
+            if not_allowed:
+                raise ValueError("cpu(s) {} are not available, the allowed cpus are {}".format(not_allowed, allowed_cpus()))
+            processes = max(1, len(CPU_LIST) // BURN_THREADS)
+        elif args.pin:
+            CPU_LIST = allowed_cpus()[:processes * BURN_THREADS]
+        if args.mem_numa != "none":
+            MEM_POLICY = memory_nodes(args.mem_numa, CPU_LIST)
+    except ValueError as e:
+        print("Bad --cpu-list/--mem-numa: {}".format(e))
+        sys.exit(1)
+    if CPU_LIST:
+        print("Busy loops on cpu(s) {}, NUMA node(s) {}".format(CPU_LIST, nodes_of(CPU_LIST)))
+
+    try:
+        make_workload(WORKLOAD)
+    except RuntimeError as e:
+        print(e)
+        sys.exit(1)
+
+    local_profile = None
+    if args.profile:
+        try:
+            local_profile = LoadProfile.load(args.profile)
+        except (IOError, OSError, ValueError) as e:
+            print("Bad profile {}: {}".format(args.profile, e))
+            sys.exit(1)
+
+    if args.trace:
+        if args.profile:
+            print("Use one of --profile and --trace")
+            sys.exit(1)
+        trace_cpu = expand_columns(args.trace_cpu)
+        trace_mem = expand_columns(args.trace_mem)[0] if args.trace_mem else None
+        if len(trace_cpu) not in (1, processes):
+            print("--trace-cpu needs one column for the node, or one per CPU ({}), got {}".format(processes, trace_cpu))
+            sys.exit(1)
+        try:
+            trace_player = TracePlayer(open_trace(args.trace), apply_trace, trace_cpu, trace_mem,
+                                       speed=args.trace_speed, loop=args.trace_loop)
+            trace_rows = trace_player.validate()
+        except (IOError, OSError, ValueError) as e:
+            print("Bad trace {}: {}".format(args.trace, e))
+            sys.exit(1)
+
+    # docker stats reports the total (sum) of % user per CPU,
+    # busypy takes the target percent and divides per # of cpus (processes x threads)
+
+    # with --cgroup-targets the target stays a percent of the quota, see _cgroup_apply()
+    BusyPySettings["cpu"] = int(args.cpu / _node_cpus())
+    # memory target is for the whole node, one memory hog in this (parent) process
+    BusyPySettings["mem"] = args.mem
+    BusyPySettings["io_mbps"] = args.io_mbps
+    BusyPySettings["io_iops"] = args.io_iops
+    IO_MODE = args.io_mode
+    IO_DIR = args.io_dir
+    IO_BLOCK_SIZE_KB = args.io_block_kb
+    IO_FILE_SIZE_MB = args.io_file_mb
+    IO_DIRECT = args.io_direct
+    IO_FSYNC = args.io_fsync
+    IO_MMAP = args.io_mmap
+    BusyPySettings["membw"] = args.membw
+    MEMBW_KERNEL = args.membw_kernel
+    MEMBW_WORKING_SET = args.membw_working_set_mb
+    BusyPySettings["net_mbps"] = args.net_mbps
+    NET_PEER = args.net_peer
+    NET_SINK_PORT = args.net_port
+    NET_SENDFILE = args.net_sendfile
+    METRICS_PORT = args.metrics_port
+    GROUP = args.group
     GRPC_SERVER = args.grpc_server
     GRPC_SERVER_PORT = args.grpc_port
+    CONTROLLER = args.controller
+    ENGINE = args.engine
+    ENGINE_PERIOD_MS = args.period_ms
+    CALIBRATION = None if args.no_calibration else args.calibration
+    calibration = None
+    if CALIBRATION:
+        CALIBRATION_KEY = calibration_key(WORKLOAD, ENGINE, ENGINE_PERIOD_MS, BURN_THREADS)
+        try:
+            calibration = load_calibration(CALIBRATION, CALIBRATION_KEY)
+        except (ValueError, AttributeError, TypeError) as e:
+            print("Bad calibration file {}, starting over: {}".format(CALIBRATION, e))
+        print("Calibration: {} of {}, {}".format(
+            "{} points".format(known_points(calibration)) if calibration else "none yet",
+            CALIBRATION, CALIBRATION_KEY))
 
     print("Press CTRL-C to abort (it may take a few seconds to exit)")
-    print("Targetting {} CPU(s): {}%, MEM: {}, SLEEP_INC: {}".format(processes,
-                                                                     BusyPySettings["cpu"],
-                                                                     BusyPySettings["mem"],
-                                                                     SLEEP_INC))
+    print("Targetting {} CPU(s): {}%, MEM: {}{}, controller: {}, engine: {}, workload: {}".format(processes * BURN_THREADS,
+                                                                                                BusyPySettings["cpu"],
+                                                                                                BusyPySettings["mem"],
+                                                                                                " of the cgroup" if CGROUP_TARGETS else "",
+                                                                                                CONTROLLER,
+                                                                                                ENGINE,
+                                                                                                WORKLOAD))
+
+    state = _make_shared(processes)
+    shared.update(state)
+    if calibration:
+        shared["calibration"][:] = calibration
+    if NET_PEER:
+        try:
+            host, port = parse_peer(NET_PEER)
+        except ValueError:
+            print("Bad --net-peer {}, use host[:port]".format(NET_PEER))
+            sys.exit(1)
+        shared["net_peer"].value = "{}:{}".format(host, port).encode()
 
     # create the busy loop on processors
-    pool = Pool(processes)
+    pool = Pool(processes, initializer=_init_worker, initargs=(state,))
+
+    # and the disk I/O worker, idle until there is an I/O target
+    io_proc = Process(target=io_worker, args=(state,))
+    io_proc.start()
+
+    # and the memory bandwidth worker, idle until there is a GB/s target
+    membw_proc = Process(target=membw_worker, args=(state,))
+    membw_proc.start()
+
+    # and the network worker, its sink takes traffic from peers even without a target
+    net_proc = Process(target=net_worker, args=(state,))
+    net_proc.start()
+
+    # the parent process owns the memory hog for the whole node, started after the
+    # pool so the workers do not inherit (and double count) the arena mappings.
+    # The I/O, memory bandwidth and network workers are not counted, their buffers are a load of their own
+    mem_manager = MemoryManager(MemoryArena(args.mem_increment_mb), tolerance=MEM_TOLERANCE_PERCENT,
+                                exclude=(io_proc.pid, membw_proc.pid, net_proc.pid))
+    mem_stop = threading.Event()
+    if cgroup_limits is not None:
+        # before the memory hog starts, so its first step is within the limits
+        _cgroup_apply(cgroup_quota, mem_manager)
+        _cgroup_publish(cgroup_quota)
+        cgroup_thread = threading.Thread(target=cgroup_watch, args=(cgroup_quota, mem_manager, mem_stop))
+        cgroup_thread.start()
+    mem_thread = threading.Thread(target=memory_usage, args=(mem_manager, mem_stop))
+    mem_thread.start()
+
+    # a local profile, cpu is for the node like --cpu, so split it per cpu
+    if local_profile is not None:
+        set_profile(ProfilePlayer(local_profile, time.time(), scale=1.0 / _node_cpus()))
+    profile_thread = threading.Thread(target=profile_usage, args=(mem_stop,))
+    profile_thread.start()
+    if CALIBRATION:
+        calibration_thread = threading.Thread(target=calibration_save, args=(mem_stop,))
+        calibration_thread.start()
+
+    if trace_player is not None:
+        print("Replaying trace {} of {} rows at {}x, cpu: {}, mem: {}".format(args.trace, trace_rows, args.trace_speed,
+                                                                           trace_cpu, trace_mem))
+        trace_player.start()
+
+    # and the one server session for the whole node
+    session = NodeSession().start()
+
+    metrics_server = None
+    if METRICS_PORT:
+        try:
+            metrics_server = MetricsServer(metrics, METRICS_PORT).start()
+            print("Metrics on http://localhost:{}/metrics".format(metrics_server.port))
+        except OSError as e:
+            print("Metrics disabled, port {}: {}".format(METRICS_PORT, e))
+
     try:
         pool.map(f, range(processes))
     except:
         pool.close()
 
+    session.stop()
+    if metrics_server is not None:
+        metrics_server.stop()
+    stop_trace()
+    for proc in (io_proc, membw_proc, net_proc):
+        proc.join(REPORT_INTERVAL_SEC * 2)
+        if proc.is_alive():
+            proc.terminate()
+    mem_stop.set()
+    mem_thread.join()
+    profile_thread.join()
+    if CALIBRATION:
+        calibration_thread.join()
+    if cgroup_limits is not None:
+        cgroup_thread.join()
+
     print("main exit")
     sys.exit(0)
@@ -0,0 +1,203 @@
+import ipaddress
+
+# Live target changes on a running server, see busypyctl.py.
+# Targets set with the admin service are kept in layers over the server's own
+# targets (the command line), each layer holds only the fields that were set:
+# - global, every client
+# - group, the clients started with --group NAME
+# - network, the clients in an ip network like 10.0.1.0/24, smaller networks last
+# - ip, one client node
+# A client gets the server targets with its layers applied on top, in that
+# order.  The server runs one event loop, so a change is applied in one go,
+# clients see all of it or none of it, on their next status, or right away when
+# subscribed.
+# An exit is not a layer, it is one-shot, see exit_once(), only the client
+# processes known at the time are told, once, so a client restarted after it
+# is not told to exit again.
+
+# BusyPySettings keys that can be set, see busypyserver.py, and their Targets (proto) field
+TARGET_FIELDS = (("cpu", "cpuLoadPercent"), ("mem", "memoryPercent"), ("exit", "clientExit"),
+                 ("io_mbps", "ioMBps"), ("io_iops", "ioIOPS"), ("membw", "memBandwidthGBps"),
+                 ("net_mbps", "netMbps"))
+
+GLOBAL = "*"
+GROUP_PREFIX = "group:"
+
+
+def targets_from_proto(message):
+    """ Targets message into a dict of the fields that are set
+    """
+    return {key: getattr(message, field) for key, field in TARGET_FIELDS if message.HasField(field)}
+
+
+def targets_to_proto(targets, cls):
+    """ dict of targets into a Targets message
+    :param cls: busypy_pb2.Targets
+    """
+    return cls(**{field: targets[key] for key, field in TARGET_FIELDS if key in targets})
+
+
+def validate(targets):
+    """ :raises ValueError: a target is out of range
+    """
+    for key in ("cpu", "mem"):
+        if key in targets and not 0 <= targets[key] <= 100:
+            raise ValueError("{} must be 0-100%, got {}".format(key, targets[key]))
+    for key in ("io_mbps", "io_iops", "membw", "net_mbps"):
+        if key in targets and targets[key] < 0:
+            raise ValueError("{} must be >= 0, got {}".format(key, targets[key]))
+
+
+def parse_networks(ips):
+    """ Client ips or networks into ip_network, a single ip is a /32 (/128)
+    :raises ValueError: not an ip or network
+    """
+    return [ipaddress.ip_network(ip.strip(), strict=False) for ip in ips]
+
+
+def ip_key(ip):
+    """ Sort key of client ips, numeric, ips that do not parse last
+    """
+    try:
+        address = ipaddress.ip_address(ip)
+        return 0, address.version, int(address), ip
+    except ValueError:
+        return 1, 0, 0, ip
+
+
+def selects(everyone, group, networks, ip, client_group):
+    """ Whether a selector (see busypy.proto TargetSelector) selects a client
+    :param networks: see parse_networks()
+    """
+    if everyone:
+        return True
+    if group and group == client_group:
+        return True
+    if networks:
+        try:
+            address = ipaddress.ip_address(ip)
+        except ValueError:
+            return False
+        return any(address in n for n in networks)
+    return False
+
+
+class TargetOverrides(object):
+    """ The layers of targets set on a running server
+    """
+
+    def __init__(self):
+        self.version = 0      # number of changes
+        self._global = {}
+        self._groups = {}     # group -> targets
+        self._ips = {}        # ip -> targets, single ips are looked up directly
+        self._networks = {}   # ip_network -> targets, of networks larger than one ip
+        self._exits = {}      # ip -> pids still to be told to exit, see exit_once()
+
+    def __bool__(self):
+        return bool(self._global or self._groups or self._ips or self._networks)
+
+    def _layers(self, everyone, group, networks):
+        """ The layers a selector addresses, (dict, key) pairs
+        """
+        if everyone:
+            yield self, "_global"
+        if group:
+            yield self._groups, group
+        for n in networks:
+            if n.num_addresses == 1:
+                yield self._ips, str(n.network_address)
+            else:
+                yield self._networks, n
+
+    def set(self, targets, everyone=False, group="", networks=()):
+        """ Set targets of the selected clients, merged with what was set before
+        :param targets: dict of BusyPySettings keys, see TARGET_FIELDS
+        :raises ValueError: bad targets, or nothing selected
+        """
+        validate(targets)
+        if not (everyone or group or networks):
+            raise ValueError("select all the clients, a group, or client ips/networks")
+        for layer, key in self._layers(everyone, group, networks):
+            if layer is self:
+                self._global = dict(self._global, **targets)
+            else:
+                layer[key] = dict(layer.get(key, {}), **targets)
+        self.version += 1
+
+    def clear(self, everyone=False, group="", networks=()):
+        """ Drop the targets of the selected clients, all of them for everyone
+        :return: # of layers dropped
+        """
+        dropped = 0
+        if everyone:
+            dropped = bool(self._global) + len(self._groups) + len(self._ips) + len(self._networks)
+            self._global, self._groups, self._ips, self._networks = {}, {}, {}, {}
+        else:
+            for layer, key in self._layers(False, group, networks):
+                dropped += layer.pop(key, None) is not None
+        if dropped:
+            self.version += 1
+        return dropped
+
+    def resolve(self, ip, group=""):
+        """ The targets set for a client, all its layers merged
+        :return: dict, empty if none were set for the client
+        """
+        if not self:
+            return {}
+        targets = dict(self._global)
+        if group and group in self._groups:
+            targets.update(self._groups[group])
+        if self._networks:
+            try:
+                address = ipaddress.ip_address(ip)
+                for n in sorted((n for n in self._networks if address in n), key=lambda n: n.prefixlen):
+                    targets.update(self._networks[n])
+            except ValueError:
+                pass
+        if ip in self._ips:
+            targets.update(self._ips[ip])
+        return targets
+
+    def exit_once(self, nodes):
+        """ Tell client processes to exit, once each, on their next status
+        :param nodes: {ip: [pids]} of the known clients to exit
+        """
+        for ip, pids in nodes.items():
+            self._exits.setdefault(ip, set()).update(pids)
+        self.version += 1
+
+    def take_exit(self, ip, pids):
+        """ Whether a client is to exit now, a pid is told only once
+        :param pids: the pids of the client status
+        :return: True if any of the pids was still to be told
+        """
+        pending = self._exits.get(ip)
+        if not pending:
+            return False
+        told = pending.intersection(pids)
+        if not told:
+            return False
+        pending.difference_update(told)
+        if not pending:
+            del self._exits[ip]
+        return True
+
+    def exit_pending(self, ip):
+        return ip in self._exits
+
+    def forget(self, ips):
+        """ Drop the exits still to be told to client ips, e.g. clients that are gone
+        :return: # of ips dropped
+        """
+        return sum(self._exits.pop(ip, None) is not None for ip in ips)
+
+    def describe(self):
+        """ :return: [(selector, targets)] in the order they are applied
+        """
+        layers = [(GLOBAL, self._global)] if self._global else []
+        layers += [(GROUP_PREFIX + g, t) for g, t in sorted(self._groups.items())]
+        layers += [(str(n), t) for n, t in sorted(self._networks.items(), key=lambda i: (i[0].prefixlen, str(i[0])))]
+        layers += [(ip, t) for ip, t in sorted(self._ips.items())]
+        return layers
@@ -0,0 +1,140 @@
+import os
+import glob
+import ctypes
+import platform
+
+# CPU affinity and NUMA placement, Linux only.
+# Busy loop processes can be pinned to given cores, so the load lands on known
+# cores, e.g. all the cores of one socket.  Memory can be placed on the NUMA
+# node(s) of those cores (local), on the other nodes (remote), interleaved over
+# all nodes, or on given nodes, with set_mempolicy(2).  The policy is per
+# thread, it applies to the memory the calling thread touches from then on, so
+# it is set by the thread that fills the memory arena, and by the memory
+# bandwidth worker before it allocates its working set.
+
+MPOL_DEFAULT = 0
+MPOL_PREFERRED = 1
+MPOL_BIND = 2
+MPOL_INTERLEAVE = 3
+
+MEM_NUMA_MODES = ("none", "local", "remote", "interleave")  # or a node list, e.g. "1" or "0,2"
+
+# set_mempolicy(2) syscall numbers, there is no Python or libc wrapper without libnuma
+_SYS_SET_MEMPOLICY = {"x86_64": 238, "aarch64": 237, "ppc64le": 261, "ppc64": 261, "s390x": 270}
+
+_NODE_DIR = "/sys/devices/system/node"
+
+
+def parse_cpu_list(spec, nodes=None):
+    """ A Linux cpu list, "0-3,8,10-11", into a sorted list of cpus, "nodeN" is all the cpus of NUMA node N
+    :param nodes: {node: [cpus]}, default numa_nodes()
+    :raises ValueError: bad list, or unknown node
+    """
+    cpus = set()
+    for part in spec.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        if part.startswith("node"):
+            nodes = numa_nodes() if nodes is None else nodes
+            node = int(part[4:])
+            if node not in nodes:
+                raise ValueError("no NUMA node {}, nodes are {}".format(node, sorted(nodes)))
+            cpus.update(nodes[node])
+        elif "-" in part:
+            first, last = (int(v) for v in part.split("-", 1))
+            if last < first:
+                raise ValueError("bad cpu range {}".format(part))
+            cpus.update(range(first, last + 1))
+        else:
+            cpus.add(int(part))
+    if not cpus:
+        raise ValueError("empty cpu list")
+    return sorted(cpus)
+
+
+def numa_nodes():
+    """ :return: {node: [cpus]} from sysfs, one node with all the allowed cpus if there is no NUMA information
+    """
+    nodes = {}
+    for path in glob.glob(os.path.join(_NODE_DIR, "node[0-9]*")):
+        try:
+            with open(os.path.join(path, "cpulist")) as f:
+                text = f.read().strip()
+        except (IOError, OSError):
+            continue
+        nodes[int(os.path.basename(path)[4:])] = parse_cpu_list(text, {}) if text else []
+    if not nodes:
+        nodes[0] = allowed_cpus()
+    return nodes
+
+
+def nodes_of(cpus, nodes=None):
+    """ :return: sorted NUMA nodes of the cpus
+    """
+    nodes = numa_nodes() if nodes is None else nodes
+    cpus = set(cpus)
+    return sorted(n for n, node_cpus in nodes.items() if cpus.intersection(node_cpus))
+
+
+def allowed_cpus():
+    """ :return: sorted cpus this process may run on
+    """
+    if hasattr(os, "sched_getaffinity"):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+
+def pin(cpus):
+    """ Pin the calling process (and its threads started later) to cpus
+    :raises OSError: not supported, or cpus not allowed
+    """
+    if not hasattr(os, "sched_setaffinity"):
+        raise OSError("cpu affinity is not supported on this platform")
+    os.sched_setaffinity(0, cpus)
+
+
+def memory_nodes(mode, cpus=None, nodes=None):
+    """ Work out the policy and nodes of a --mem-numa mode
+    :param mode: see MEM_NUMA_MODES, or a node list
+    :param cpus: the cpus the load runs on, for local/remote, default the allowed cpus
+    :return: (policy, [nodes]), (MPOL_DEFAULT, []) for "none"
+    :raises ValueError: no node matches
+    """
+    nodes = numa_nodes() if nodes is None else nodes
+    if mode == "none":
+        return MPOL_DEFAULT, []
+    if mode == "interleave":
+        return MPOL_INTERLEAVE, sorted(nodes)
+    local = nodes_of(cpus or allowed_cpus(), nodes)
+    if mode == "local":
+        return MPOL_BIND, local
+    if mode == "remote":
+        remote = [n for n in sorted(nodes) if n not in local]
+        if not remote:
+            raise ValueError("remote memory needs a NUMA node without the busy loop cpus, "
+                             "this host has node(s) {} and the cpus are on {}".format(sorted(nodes), local))
+        return MPOL_BIND, remote
+    wanted = sorted(set(int(n) for n in mode.split(",") if n.strip()))
+    unknown = [n for n in wanted if n not in nodes]
+    if unknown or not wanted:
+        raise ValueError("no NUMA node(s) {}, nodes are {}".format(unknown or mode, sorted(nodes)))
+    return MPOL_BIND, wanted
+
+
+def set_memory_policy(policy, nodes):
+    """ set_mempolicy(2) for the calling thread
+    :raises OSError: the syscall failed or is not available
+    """
+    number = _SYS_SET_MEMPOLICY.get(platform.machine())
+    if number is None or not platform.system() == "Linux":
+        raise OSError("NUMA memory placement is not supported on {} {}".format(platform.system(), platform.machine()))
+    bits = 8 * ctypes.sizeof(ctypes.c_ulong)
+    mask = (ctypes.c_ulong * (max(nodes or [0]) // bits + 1))()
+    for n in nodes:
+        mask[n // bits] |= 1 << (n % bits)
+    libc = ctypes.CDLL(None, use_errno=True)
+    if libc.syscall(ctypes.c_long(number), ctypes.c_int(policy),
+                    mask if nodes else None, ctypes.c_ulong(len(mask) * bits + 1 if nodes else 0)) != 0:
+        e = ctypes.get_errno()
+        raise OSError(e, "set_mempolicy: {}".format(os.strerror(e)))
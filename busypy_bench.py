@@ -0,0 +1,361 @@
+import os
+import re
+import sys
+import json
+import time
+import math
+import signal
+import socket
+import platform
+import argparse
+import itertools
+import statistics
+import subprocess
+from urllib.request import urlopen
+from urllib.error import URLError
+
+from busypy_controller import CONTROLLERS, SETTLE_TOLERANCE_PERCENT, SETTLE_SAMPLES
+from busypy_engine import ENGINES
+from busypy_workload import WORKLOADS
+
+# Load accuracy benchmark.
+# Runs the busypy client over a matrix of engines, controllers, core counts,
+# cpu and memory targets, one run at a time, and scrapes its metrics endpoint
+# (see busypy_metrics) while it runs.  Every run appends one JSON line to the
+# results file, with the host, the case and
+# - converge_s: from the workers being up until the measured cpu of every
+#   worker stays within the tolerance of its target, for the rest of the run
+# - error_percent / abs_error_percent: mean (measured - target) after converging
+# - jitter_percent: standard deviation of (measured - target) after converging
+# - mem_converge_s, mem_overshoot_percent: memory reaching its target, and the
+#   most it went over
+# Runs that do not converge are scored over the second half of the run.
+# The client runs with --no-calibration, a run starting from what earlier runs
+# learned (see busypy_calibration) would depend on the case order, and write to
+# the user's calibration file.
+# With --baseline, runs are compared to the same case in an earlier results
+# file, and the exit code is 1 when one got worse, for CI.
+#
+#   python3 busypy_bench.py --cpu 10,50,90 --cpus 1,2 --engine timeslice,iterations --controller pid,step
+
+BUSYPY = os.path.join(os.path.dirname(os.path.abspath(__file__)), "busypy.py")
+
+DURATION_SEC = 20
+SCRAPE_SEC = 0.25
+STARTUP_TIMEOUT_SEC = 30
+STOP_TIMEOUT_SEC = 20
+MEM_TOLERANCE_PERCENT = 1.0
+RESULTS = "busypy_bench.jsonl"
+REGRESSION_PERCENT = 2.0     # --baseline, allowed increase of the abs error and jitter, percentage points
+REGRESSION_SEC = 2.0         # --baseline, allowed increase of the convergence time
+
+CASE_KEYS = ("engine", "controller", "workload", "cpus", "cpu", "mem")
+
+_SAMPLE = re.compile(r'^([A-Za-z_:][\w:]*)(\{[^}]*\})?\s+(\S+)$')
+_LABEL = re.compile(r'(\w+)="((?:[^"\\]|\\.)*)"')
+
+
+def _free_port():
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _list(value, kind=str):
+    return [kind(v.strip()) for v in value.split(",") if v.strip()]
+
+
+def parse_metrics(text):
+    """ Prometheus text format into {name: [(labels dict, value)]}
+    """
+    result = {}
+    for line in text.splitlines():
+        if not line or line.startswith("#"):
+            continue
+        m = _SAMPLE.match(line)
+        if not m:
+            continue
+        labels = dict(_LABEL.findall(m.group(2) or ""))
+        result.setdefault(m.group(1), []).append((labels, float(m.group(3))))
+    return result
+
+
+def scrape(port):
+    """ :return: the metrics of the client on port, None if it is not up (yet)
+    """
+    try:
+        with urlopen("http://127.0.0.1:{}/metrics".format(port), timeout=1) as r:
+            return parse_metrics(r.read().decode("utf-8"))
+    except (URLError, OSError):
+        return None
+
+
+def host_info():
+    model = platform.processor() or "unknown"
+    try:
+        with open("/proc/cpuinfo") as f:
+            for line in f:
+                if line.startswith("model name"):
+                    model = line.split(":", 1)[1].strip()
+                    break
+    except (IOError, OSError):
+        pass
+    return {
+        "host": platform.node(),
+        "cpu_model": model,
+        "cpu_count": os.cpu_count(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+    }
+
+
+def _converged_from(samples, tolerance, settle_samples=SETTLE_SAMPLES):
+    """ Index of the first sample from which all samples are within tolerance,
+    None if fewer than settle_samples at the end are, like the controller settling
+    :param samples: [(t, target, measured)]
+    """
+    index = None
+    for i in range(len(samples) - 1, -1, -1):
+        _, target, measured = samples[i]
+        if abs(measured - target) > tolerance:
+            break
+        index = i
+    if index is None or len(samples) - index < settle_samples:
+        return None
+    return index
+
+
+def score(workers, memory, start, end, tolerance=SETTLE_TOLERANCE_PERCENT, mem_tolerance=MEM_TOLERANCE_PERCENT):
+    """ Turn the scraped series of one run into its results
+    :param workers: {worker: [(t, target, measured)]}, one sample per control window
+    :param memory: [(t, target, measured)], one sample per scrape
+    :param start: time the workers were up
+    :param end: time the run ended
+    """
+    result = {"converged": False, "converge_s": None, "error_percent": None, "abs_error_percent": None,
+              "jitter_percent": None, "mem_converge_s": None, "mem_overshoot_percent": None}
+
+    converge = []
+    for samples in workers.values():
+        index = _converged_from(samples, tolerance)
+        converge.append(None if index is None else samples[index][0] - start)
+    converged = bool(converge) and all(c is not None for c in converge)
+    if converged:
+        result["converged"] = True
+        result["converge_s"] = round(max(converge), 3)
+        since = start + max(converge)
+    else:
+        since = start + (end - start) / 2
+
+    errors = [measured - target for samples in workers.values() for t, target, measured in samples if t >= since]
+    if errors:
+        result["error_percent"] = round(statistics.mean(errors), 3)
+        result["abs_error_percent"] = round(statistics.mean(abs(e) for e in errors), 3)
+        result["jitter_percent"] = round(statistics.pstdev(errors), 3)
+
+    memory = [s for s in memory if s[1] > 0]
+    if memory:
+        result["mem_overshoot_percent"] = round(max(0.0, max(measured - target for _, target, measured in memory)), 3)
+        reached = next((t for t, target, measured in memory if abs(measured - target) <= mem_tolerance), None)
+        if reached is not None:
+            result["mem_converge_s"] = round(max(0.0, reached - start), 3)
+    return result
+
+
+def run_case(case, duration=DURATION_SEC, verbose=False):
+    """ Run the busypy client for one case and score it
+    :param case: dict of CASE_KEYS, cpu is per core like the busypy target
+    :return: dict of results, None if the client did not come up
+    """
+    metrics_port = _free_port()
+    command = [sys.executable, BUSYPY,
+               "--cpu", str(int(case["cpu"] * case["cpus"])), "--cpus", str(case["cpus"]), "--mem", str(case["mem"]),
+               "--engine", case["engine"], "--controller", case["controller"], "--workload", case["workload"],
+               "--metrics-port", str(metrics_port), "--net-port", "0", "--no-calibration",
+               # no server, the client keeps its command line targets
+               "--server", "127.0.0.1", "--port", str(_free_port())]
+    output = None if verbose else subprocess.DEVNULL
+    proc = subprocess.Popen(command, cwd=os.path.dirname(BUSYPY), stdout=output, stderr=output,
+                            start_new_session=True)
+
+    workers = {}
+    memory = []
+    overshoot = []
+    settle = []
+    start = None
+    launched = time.time()
+    try:
+        while True:
+            now = time.time()
+            if proc.poll() is not None:
+                print("busypy exited with {}".format(proc.returncode))
+                return None
+            if start is None and now - launched > STARTUP_TIMEOUT_SEC:
+                print("busypy did not come up in {}s".format(STARTUP_TIMEOUT_SEC))
+                return None
+            if start is not None and now - start >= duration:
+                break
+            m = scrape(metrics_port)
+            if m is not None:
+                cpu = {l["worker"]: v for l, v in m.get("busypy_cpu_percent", [])}
+                target = {l["worker"]: v for l, v in m.get("busypy_cpu_target_percent", [])}
+                if start is None and len(cpu) >= case["cpus"]:
+                    start = now
+                if start is not None:
+                    for x, measured in cpu.items():
+                        samples = workers.setdefault(x, [])
+                        # measured cpu changes once per control window, keep one sample per window
+                        if not samples or samples[-1][2] != measured:
+                            samples.append((now, target.get(x, 0.0), measured))
+                    for _, value in m.get("busypy_memory_percent", []):
+                        memory.append((now, case["mem"], value))
+                    overshoot = [v for _, v in m.get("busypy_sleep_overshoot_seconds", []) if not math.isnan(v)]
+                    settle = [v for _, v in m.get("busypy_controller_settling_seconds", [])]
+            time.sleep(SCRAPE_SEC)
+    finally:
+        _stop(proc)
+
+    # the first sample of a worker is its warm up window, before it is steering
+    workers = {x: samples[1:] for x, samples in workers.items()}
+    result = score(workers, memory, start, time.time())
+    result["controller_settle_s"] = round(max(settle), 3) if settle and not any(math.isnan(s) for s in settle) else None
+    result["sleep_overshoot_ms"] = round(1000.0 * statistics.mean(overshoot), 3) if overshoot else None
+    result["samples"] = sum(len(s) for s in workers.values())
+    return result
+
+
+def _stop(proc):
+    """ CTRL-C the client and its workers, like a terminal does, kill it if it does not exit
+    """
+    if proc.poll() is not None:
+        return
+    try:
+        os.killpg(proc.pid, signal.SIGINT)
+        proc.wait(STOP_TIMEOUT_SEC)
+    except subprocess.TimeoutExpired:
+        os.killpg(proc.pid, signal.SIGKILL)
+        proc.wait()
+    except ProcessLookupError:
+        pass
+
+
+def _case_key(case):
+    return tuple(case[k] for k in CASE_KEYS)
+
+
+def load_results(path):
+    """ :return: {case key: last result of that case} from a results file
+    """
+    results = {}
+    with open(path) as f:
+        for line in f:
+            if line.strip():
+                r = json.loads(line)
+                results[_case_key(r["case"])] = r["result"]
+    return results
+
+
+def regressions(case, result, baseline):
+    """ :return: list of what got worse than the baseline result of the same case
+    """
+    found = []
+    if baseline.get("converged") and not result["converged"]:
+        found.append("no longer converges")
+    for key, limit in (("converge_s", REGRESSION_SEC),
+                       ("abs_error_percent", REGRESSION_PERCENT),
+                       ("jitter_percent", REGRESSION_PERCENT),
+                       ("mem_overshoot_percent", REGRESSION_PERCENT)):
+        old, new = baseline.get(key), result.get(key)
+        if old is not None and new is not None and new - old > limit:
+            found.append("{} {} -> {}".format(key, old, new))
+    return found
+
+
+def _fmt(value, spec="{:.2f}"):
+    return "-" if value is None else spec.format(value)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='BusyPy load accuracy benchmark')
+
+    parser.add_argument('--cpu', dest="cpu", action='store', default="10,50,90",
+                        help='Comma separated per core cpu targets, default=10,50,90.')
+    parser.add_argument('--cpus', dest="cpus", action='store', default="1",
+                        help='Comma separated core counts, default=1.')
+    parser.add_argument('--mem', dest="mem", action='store', default="0",
+                        help='Comma separated node memory targets, default=0.')
+    parser.add_argument('--engine', dest="engine", action='store', default="timeslice",
+                        help='Comma separated engines, from {}, default=timeslice.'.format(sorted(ENGINES)))
+    parser.add_argument('--controller', dest="controller", action='store', default="pid",
+                        help='Comma separated controllers, from {}, default=pid.'.format(sorted(CONTROLLERS)))
+    parser.add_argument('--workload', dest="workload", action='store', default="sort",
+                        choices=sorted(WORKLOADS), help='Busy loop workload, default=sort.')
+    parser.add_argument('--duration', dest="duration", action='store', type=float, default=DURATION_SEC,
+                        help='Seconds per run, after the workers are up, default={}.'.format(DURATION_SEC))
+    parser.add_argument('--repeat', dest="repeat", action='store', type=int, default=1,
+                        help='Runs per case, default=1.')
+    parser.add_argument('--out', dest="out", action='store', default=RESULTS,
+                        help='JSON lines results file, appended to, default={}.'.format(RESULTS))
+    parser.add_argument('--baseline', dest="baseline", action='store',
+                        help='Earlier results file, exit 1 if a case got worse than in it.')
+    parser.add_argument('--verbose', dest="verbose", action='store_true', default=False,
+                        help='Show the busypy client output.')
+
+    args = parser.parse_args()
+
+    try:
+        matrix = {
+            "engine": _list(args.engine),
+            "controller": _list(args.controller),
+            "workload": [args.workload],
+            "cpus": _list(args.cpus, int),
+            "cpu": _list(args.cpu, float),
+            "mem": _list(args.mem, int),
+        }
+    except ValueError as e:
+        print("Bad matrix: {}".format(e))
+        sys.exit(1)
+    unknown = [e for e in matrix["engine"] if e not in ENGINES] + [c for c in matrix["controller"] if c not in CONTROLLERS]
+    if unknown:
+        print("Unknown engine/controller {}".format(unknown))
+        sys.exit(1)
+
+    baseline = {}
+    if args.baseline:
+        try:
+            baseline = load_results(args.baseline)
+        except (IOError, OSError, ValueError, KeyError) as e:
+            print("Bad baseline {}: {}".format(args.baseline, e))
+            sys.exit(1)
+
+    host = host_info()
+    cases = [dict(zip(CASE_KEYS, values)) for values in itertools.product(*(matrix[k] for k in CASE_KEYS))]
+    print("{} cases x {} runs of {}s on {} ({} cpus)".format(len(cases), args.repeat, args.duration,
+                                                          host["cpu_model"], host["cpu_count"]))
+
+    failed = []
+    print("{:<10} {:<10} {:>4} {:>5} {:>4} | {:>8} {:>7} {:>7} {:>7} {:>8} {:>8}".format(
+        "engine", "controller", "cpus", "cpu", "mem", "conv s", "err %", "|err| %", "jitter", "mem s", "mem ovr"))
+    for case in cases:
+        for run in range(args.repeat):
+            result = run_case(case, args.duration, args.verbose)
+            if result is None:
+                failed.append("{} did not run".format(case))
+                continue
+            with open(args.out, "a") as f:
+                f.write(json.dumps({"time": time.time(), "host": host, "case": case, "run": run,
+                                    "duration_s": args.duration, "result": result}) + "\n")
+            print("{:<10} {:<10} {:>4} {:>5} {:>4} | {:>8} {:>7} {:>7} {:>7} {:>8} {:>8}".format(
+                case["engine"], case["controller"], case["cpus"], _fmt(case["cpu"], "{:g}"), case["mem"],
+                _fmt(result["converge_s"], "{:.1f}"), _fmt(result["error_percent"]),
+                _fmt(result["abs_error_percent"]), _fmt(result["jitter_percent"]),
+                _fmt(result["mem_converge_s"], "{:.1f}"), _fmt(result["mem_overshoot_percent"])))
+            if _case_key(case) in baseline:
+                failed += ["{}: {}".format(case, r) for r in regressions(case, result, baseline[_case_key(case)])]
+
+    print("Results in {}".format(args.out))
+    if failed:
+        print("{} regression(s)/failure(s):".format(len(failed)))
+        for f in failed:
+            print("  {}".format(f))
+        sys.exit(1)
@@ -0,0 +1,152 @@
+import os
+import json
+import math
+import time
+import platform
+
+# Per host calibration of the cpu target -> duty cycle mapping.
+# The duty cycle that hits a cpu target depends on the host (cpu model, cores),
+# the Python version and the workload/engine, e.g. interpreter overhead on top
+# of the duty cycle.  The controllers find it by feedback, which takes a number
+# of sample windows after every (re)target.  A calibration table keeps the duty
+# cycle the controllers settled on, per whole per core cpu percent 0..100, so
+# a restart or a retarget starts at the right operating point.
+#
+# The table is a flat sequence of CALIBRATION_POINTS duty cycles, NaN where not
+# known yet, e.g. a multiprocessing Array shared by the busy loop processes,
+# which refine it online while their controllers are settled.  It is kept in a
+# small JSON file, one table per calibration_key(), so one file serves several
+# hosts (a shared home) and workloads.
+
+CALIBRATION_FILE = os.path.join(os.path.expanduser("~"), ".cache", "busypy", "calibration.json")
+CALIBRATION_POINTS = 101     # per core cpu percent 0..100
+CALIBRATION_ALPHA = 0.1      # weight of a new settled duty cycle in the moving average of its point
+CALIBRATION_VERSION = 1
+
+
+def cpu_model():
+    """ cpu model name of the host, from /proc/cpuinfo, else platform
+    """
+    try:
+        with open("/proc/cpuinfo", "r") as f:
+            for line in f:
+                key, _, value = line.partition(":")
+                if key.strip() in ("model name", "Model", "cpu model", "Processor"):
+                    return value.strip()
+    except (IOError, OSError):
+        pass
+    return platform.processor() or platform.machine() or "unknown"
+
+
+def calibration_key(workload, engine, period_ms, threads=1):
+    """ What the duty cycle of a target depends on, cpu model, cores, Python, and the burn loop
+    """
+    return "{}|{} cores|{} {}|{}|{} {}ms|{} threads".format(cpu_model(), os.cpu_count() or 1,
+                                                         platform.python_implementation(),
+                                                         ".".join(platform.python_version_tuple()[:2]),
+                                                         workload, engine, period_ms, threads)
+
+
+def empty_table():
+    return [float("nan")] * CALIBRATION_POINTS
+
+
+def known_points(table):
+    return sum(1 for d in table if not math.isnan(d))
+
+
+def same_table(a, b):
+    """ Whether two tables hold the same points, NaN (not known) equals NaN
+    """
+    return [d if not math.isnan(d) else None for d in a] == [d if not math.isnan(d) else None for d in b]
+
+
+def lookup(table, target):
+    """ Calibrated duty cycle of a target, interpolated between the nearest known
+    points, or scaled from the nearest one on the side that is known
+    :param table: duty cycle per cpu percent
+    :param target: per core cpu percent
+    :return: duty cycle, None if nothing is known
+    """
+    values = list(table)
+    lower = upper = None
+    for p in range(int(math.floor(target)), -1, -1):
+        if p < len(values) and not math.isnan(values[p]):
+            lower = p
+            break
+    for p in range(max(0, int(math.ceil(target))), len(values)):
+        if not math.isnan(values[p]):
+            upper = p
+            break
+    if lower is not None and upper is not None:
+        if upper == lower:
+            return values[lower]
+        return values[lower] + (values[upper] - values[lower]) * (target - lower) / (upper - lower)
+    # one sided, the duty cycle is close to proportional to the target
+    known = lower if lower is not None else upper
+    if known is None or known == 0:
+        return None
+    return min(1.0, values[known] * target / known)
+
+
+def learn(table, target, duty, alpha=CALIBRATION_ALPHA):
+    """ Fold the duty cycle of a settled controller into the point of its target,
+    scaled to the whole percent, the duty cycle is close to proportional to the target
+    :param table: duty cycle per cpu percent, a multiprocessing Array is updated under its lock
+    """
+    point = int(round(target))
+    if not 0 < point < len(table) or target <= 0:
+        return
+    duty = min(1.0, duty * point / target)
+    lock = table.get_lock() if hasattr(table, "get_lock") else None
+    if lock is not None:
+        lock.acquire()
+    try:
+        old = table[point]
+        table[point] = duty if math.isnan(old) else old + alpha * (duty - old)
+    finally:
+        if lock is not None:
+            lock.release()
+
+
+def load(path, key):
+    """ The table of key from a calibration file
+    :return: table, None if the file or the key is not there
+    :raises ValueError: not a calibration file
+    """
+    try:
+        with open(path, "r") as f:
+            data = json.load(f)
+    except (IOError, OSError):
+        return None
+    entry = data.get("hosts", {}).get(key)
+    if entry is None:
+        return None
+    table = empty_table()
+    for point, duty in entry.get("duty", {}).items():
+        if 0 <= int(point) < CALIBRATION_POINTS:
+            table[int(point)] = float(duty)
+    return table
+
+
+def save(path, key, table):
+    """ Store the table of key in a calibration file, keeping the other keys,
+    written to a temporary file first, so a reader never sees half a file
+    """
+    try:
+        with open(path, "r") as f:
+            data = json.load(f)
+    except (IOError, OSError, ValueError):
+        data = {}
+    data["version"] = CALIBRATION_VERSION
+    data.setdefault("hosts", {})[key] = {
+        "updated": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "duty": {str(p): round(d, 5) for p, d in enumerate(table) if not math.isnan(d)},
+    }
+    directory = os.path.dirname(path)
+    if directory and not os.path.isdir(directory):
+        os.makedirs(directory)
+    tmp = "{}.{}.tmp".format(path, os.getpid())
+    with open(tmp, "w") as f:
+        json.dump(data, f, indent=1, sort_keys=True)
+    os.replace(tmp, path)
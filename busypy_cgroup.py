@@ -0,0 +1,172 @@
+import os
+import collections
+import psutil
+from busypy_sampler import PROC, read_cgroup_stat
+from busypy_affinity import allowed_cpus
+
+# cgroup (container) cpu and memory limits, Linux cgroup v1 and v2.
+# Inside a container limited to 2 cpus and 4 GiB on a 64 core host, a percent
+# of the host means little, and a memory target of the host can run into the
+# OOM killer.  CgroupLimits finds the cgroup of busypy and reads
+# - the cpu quota in cpus, v2 cpu.max, v1 cpu.cfs_quota_us / cpu.cfs_period_us,
+#   capped at the cpus busypy may run on (its cpuset)
+# - the memory limit, v2 memory.max, v1 memory.limit_in_bytes
+# - the throttling counters from cpu.stat, nr_periods, nr_throttled and the
+#   throttled time (v2 throttled_usec, v1 throttled_time in ns)
+# Limits of the parent cgroups apply too, so the lowest limit on the way up to
+# the root of the mount is used.  A limit of None is no limit.
+
+CgroupQuota = collections.namedtuple("CgroupQuota", ["cpus", "memory", "nr_periods", "nr_throttled", "throttled_sec"])
+
+
+def _read(path):
+    try:
+        with open(path, "r") as f:
+            return f.read().strip()
+    except (IOError, OSError):
+        return None
+
+
+def _mounts():
+    """ cgroup mounts from mountinfo, [(mount point, root, fs type, super options)]
+    """
+    mounts = []
+    try:
+        with open("{}/self/mountinfo".format(PROC), "r") as f:
+            for line in f:
+                fields, _, fs = line.partition(" - ")
+                fields, fs = fields.split(), fs.split()
+                if len(fields) >= 5 and len(fs) >= 3 and fs[0] in ("cgroup", "cgroup2"):
+                    mounts.append((fields[4], fields[3], fs[0], fs[2].split(",")))
+    except (IOError, OSError):
+        pass
+    return mounts
+
+
+def _cgroup_dir(mount, root, path, name):
+    """ Directory of cgroup 'path' under a mount, the mount itself when the path
+    is outside it, e.g. inside a container the namespace root is mounted
+    """
+    if path.startswith(root):
+        path = path[len(root):]
+    full = os.path.join(mount, path.lstrip("/"))
+    if os.path.exists(os.path.join(full, name)):
+        return full
+    if os.path.exists(os.path.join(mount, name)):
+        return mount
+    return None
+
+
+def _ancestors(directory, mount):
+    """ directory and its parents, up to the mount
+    """
+    directory = os.path.normpath(directory)
+    mount = os.path.normpath(mount)
+    while True:
+        yield directory
+        if directory == mount or not directory.startswith(mount):
+            return
+        directory = os.path.dirname(directory)
+
+
+class CgroupLimits(object):
+    """ The cpu and memory limits of the cgroup(s) of a process
+    """
+
+    def __init__(self, pid="self"):
+        self.version = None
+        self._cpu = None        # (directory, mount) of the cpu controller
+        self._memory = None     # (directory, mount) of the memory controller
+        self._host_memory = psutil.virtual_memory().total
+        paths = {}
+        try:
+            with open("{}/{}/cgroup".format(PROC, pid), "r") as f:
+                for line in f:
+                    hierarchy, controllers, path = line.strip().split(":", 2)
+                    paths[controllers] = path
+        except (IOError, OSError, ValueError):
+            return
+
+        for mount, root, fs, options in _mounts():
+            if fs == "cgroup2" and "" in paths and self._cpu is None:
+                cpu = _cgroup_dir(mount, root, paths[""], "cpu.max")
+                memory = _cgroup_dir(mount, root, paths[""], "memory.max")
+                if cpu or memory:
+                    self.version = 2
+                    self._cpu = (cpu, mount) if cpu else None
+                    self._memory = (memory, mount) if memory else None
+            elif fs == "cgroup":
+                for controllers, path in paths.items():
+                    names = controllers.split(",")
+                    if "cpu" in names and "cpu" in options and self.version != 2:
+                        cpu = _cgroup_dir(mount, root, path, "cpu.cfs_quota_us")
+                        if cpu:
+                            self.version, self._cpu = 1, (cpu, mount)
+                    if "memory" in names and "memory" in options and self.version != 2:
+                        memory = _cgroup_dir(mount, root, path, "memory.limit_in_bytes")
+                        if memory:
+                            self.version, self._memory = 1, (memory, mount)
+
+    @property
+    def found(self):
+        return self.version is not None
+
+    def _cpu_quota(self):
+        """ cpus of the lowest quota up the hierarchy, None if there is no quota
+        """
+        cpus = None
+        for directory in _ancestors(*self._cpu):
+            if self.version == 2:
+                text = _read(os.path.join(directory, "cpu.max"))
+                quota, _, period = (text or "max").partition(" ")
+            else:
+                quota = _read(os.path.join(directory, "cpu.cfs_quota_us"))
+                period = _read(os.path.join(directory, "cpu.cfs_period_us"))
+            try:
+                quota, period = int(quota), int(period)
+            except (TypeError, ValueError):
+                continue  # "max", or not readable
+            if quota > 0 and period > 0:
+                cpus = min(cpus or float("inf"), float(quota) / period)
+        return cpus
+
+    def _memory_limit(self):
+        """ bytes of the lowest limit up the hierarchy, None if there is none below the host memory
+        """
+        limit = None
+        for directory in _ancestors(*self._memory):
+            name = "memory.max" if self.version == 2 else "memory.limit_in_bytes"
+            try:
+                value = int(_read(os.path.join(directory, name)))
+            except (TypeError, ValueError):
+                continue  # "max", or not readable
+            if value < self._host_memory:  # v1 no limit is a huge number
+                limit = min(limit or value, value)
+        return limit
+
+    def read(self):
+        """ Read the limits and the throttling counters now
+        :return: CgroupQuota, cpus capped at the allowed cpus, None for no limit
+        """
+        allowed = len(allowed_cpus())
+        cpus = self._cpu_quota() if self._cpu else None
+        cpus = min(cpus, allowed) if cpus is not None else None
+        memory = self._memory_limit() if self._memory else None
+        stat = read_cgroup_stat(self._cpu[0], "cpu.stat") if self._cpu else {}
+        if "throttled_usec" in stat:
+            throttled = stat["throttled_usec"] / 1e6
+        else:
+            throttled = stat.get("throttled_time", 0) / 1e9
+        return CgroupQuota(cpus, memory, stat.get("nr_periods", 0), stat.get("nr_throttled", 0), throttled)
+
+    def capacity(self, quota):
+        """ cpus and memory bytes a percent of the cgroup is of, the host's where there is no limit
+        """
+        return (quota.cpus if quota.cpus is not None else float(len(allowed_cpus())),
+                quota.memory if quota.memory is not None else self._host_memory)
+
+
+def describe_quota(quota):
+    return "cpu quota {}, memory limit {}".format(
+        "{:g} cpus".format(quota.cpus) if quota.cpus is not None else "none",
+        "{:.0f} MB".format(quota.memory / 1024.0 / 1024.0) if quota.memory is not None else "none")
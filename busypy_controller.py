@@ -0,0 +1,245 @@
+import time
+
+# Controllers used by the busy loop to hit a CPU target.
+# A controller takes the target cpu percent and the measured cpu percent and
+# produces a duty cycle, the fraction (0..1) of each busy loop period that is
+# spent burning CPU.  The busy loop then turns the duty cycle into busy/sleep time.
+
+DUTY_MIN = 0.0
+DUTY_MAX = 1.0
+
+SETTLE_TOLERANCE_PERCENT = 2  # measured cpu within target +/- this is "settled"
+SETTLE_SAMPLES = 2            # number of consecutive in-band samples to declare settled
+
+# PID gains, these work in duty cycle units (error of 1.0 == 100% cpu)
+PID_KP = 0.1
+PID_KI = 0.25  # per second
+PID_KD = 0.0
+PID_FEEDFORWARD_GAIN = 1.0  # duty = target/100 * gain, before any correction
+
+# legacy step search, expressed in duty cycle terms
+STEP_DUTY_INC = 0.005
+STEP_FAST_FACTOR = 0.8         # idle fraction *= factor during the fast search
+STEP_INITIAL_DUTY = 0.05       # start from a low CPU usage and go higher
+STEP_FAST_SEARCH_COUNT = 20    # cycles to try idle *= STEP_FAST_FACTOR
+
+
+def _clamp(value, lo=DUTY_MIN, hi=DUTY_MAX):
+    return max(lo, min(hi, value))
+
+
+class Controller(object):
+    """ Base class for busy loop duty cycle controllers.
+    - reset() is called on every (re)target
+    - start_at() may follow reset(), to start from a known duty cycle, e.g. a calibration
+    - follow() is called for small target moves, like a ramping load profile
+    - update() is called once per measurement sample and returns the new duty cycle
+    - tracks settling time and steady state error for each target, so the load
+      that is produced can be trusted
+    """
+
+    name = None
+
+    def __init__(self, tolerance=SETTLE_TOLERANCE_PERCENT, settle_samples=SETTLE_SAMPLES):
+        self.tolerance = tolerance
+        self.settle_samples = settle_samples
+        self.target = 0
+        self.duty = DUTY_MIN
+        self.settling_time = None
+        self._retarget_time = time.time()
+        self._in_band = 0
+        self._in_band_since = None
+        self._err_sum = 0.0
+        self._err_count = 0
+
+    def reset(self, target):
+        """ Set a new cpu target, restarts the settling measurement
+        :param target: cpu percent
+        """
+        self.target = target
+        self.settling_time = None
+        self._retarget_time = time.time()
+        self._in_band = 0
+        self._in_band_since = None
+        self._err_sum = 0.0
+        self._err_count = 0
+
+    def follow(self, target):
+        """ Move the cpu target a little, without restarting the settling measurement
+        :param target: cpu percent
+        """
+        self.target = target
+
+    def start_at(self, duty):
+        """ Start the current target from this duty cycle, rather than search for it
+        :param duty: duty cycle, 0..1
+        """
+        self.duty = _clamp(duty)
+
+    def update(self, measured, dt):
+        """ Feed a new measurement to the controller
+        :param measured: measured cpu percent over the last sample window
+        :param dt: seconds since the last update
+        :return: new duty cycle, 0..1
+        """
+        self._track(measured)
+        self.duty = _clamp(self._step(measured, dt))
+        return self.duty
+
+    def _step(self, measured, dt):
+        raise NotImplementedError()
+
+    def _track(self, measured):
+        error = self.target - measured
+        now = time.time()
+
+        if abs(error) <= self.tolerance:
+            if self._in_band == 0:
+                self._in_band_since = now
+            self._in_band += 1
+        else:
+            self._in_band = 0
+
+        if self.settling_time is None:
+            if self._in_band >= self.settle_samples:
+                self.settling_time = self._in_band_since - self._retarget_time
+        else:
+            self._err_sum += error
+            self._err_count += 1
+
+    @property
+    def settled(self):
+        return self.settling_time is not None
+
+    @property
+    def steady_state_error(self):
+        """ Mean error (target - measured) in percent since settling, None if not settled
+        """
+        if not self._err_count: return None
+        return self._err_sum / self._err_count
+
+    def status(self):
+        """ Short human readable status string for the console
+        """
+        if not self.settled:
+            return "Duty: {:5.3f}, settling {:4.1f}s".format(self.duty, time.time() - self._retarget_time)
+        sse = self.steady_state_error
+        return "Duty: {:5.3f}, settled {:4.1f}s, err: {:+4.1f}%".format(self.duty,
+                                                                          self.settling_time,
+                                                                          sse if sse is not None else 0.0)
+
+
+class PIDController(Controller):
+    """ Feedforward + PID controller.
+    The feedforward term maps the target straight to a duty cycle (50% cpu is a
+    duty cycle of 0.5), which gets close on the first period.  The PID terms
+    then correct for what the feedforward can't know, like interpreter overhead
+    or other load on the core.
+    """
+
+    name = "pid"
+
+    def __init__(self, kp=PID_KP, ki=PID_KI, kd=PID_KD, ff_gain=PID_FEEDFORWARD_GAIN, **kwargs):
+        super(PIDController, self).__init__(**kwargs)
+        self.kp = kp
+        self.ki = ki
+        self.kd = kd
+        self.ff_gain = ff_gain
+        self._integral = 0.0
+        self._last_error = None
+
+    def reset(self, target):
+        super(PIDController, self).reset(target)
+        # keep the integral, it holds the learned correction for this host
+        self._last_error = None
+        self.duty = self._feedforward() + self.ki * self._integral
+        self.duty = _clamp(self.duty)
+
+    def start_at(self, duty):
+        super(PIDController, self).start_at(duty)
+        # the integral makes up the difference to the feedforward, so the first update carries on from duty
+        if self.ki:
+            self._integral = (self.duty - self._feedforward()) / self.ki
+
+    def follow(self, target):
+        # move the duty cycle with the feedforward, rather than wait for the error to show up
+        delta = (target - self.target) / 100.0 * self.ff_gain
+        super(PIDController, self).follow(target)
+        self.duty = _clamp(self.duty + delta)
+
+    def _feedforward(self):
+        return self.target / 100.0 * self.ff_gain
+
+    def _step(self, measured, dt):
+        error = (self.target - measured) / 100.0
+        ff = self._feedforward()
+
+        derivative = 0.0
+        if self._last_error is not None and dt > 0:
+            derivative = (error - self._last_error) / dt
+        self._last_error = error
+
+        integral = self._integral + error * dt
+        out = ff + self.kp * error + self.ki * integral + self.kd * derivative
+
+        # anti-windup, only accept the integral if the output is not saturated
+        # or the error is pulling the output back into range
+        if (DUTY_MIN < out < DUTY_MAX) or (out >= DUTY_MAX and error < 0) or (out <= DUTY_MIN and error > 0):
+            self._integral = integral
+
+        return ff + self.kp * error + self.ki * self._integral + self.kd * derivative
+
+
+class StepController(Controller):
+    """ The original busypy algorithm, in duty cycle terms.
+    A fast search shrinks the idle time by STEP_FAST_FACTOR until the target is
+    passed, then small fixed steps walk the duty cycle up and down.
+    """
+
+    name = "step"
+
+    def __init__(self, **kwargs):
+        super(StepController, self).__init__(**kwargs)
+        self._fast_search_count = STEP_FAST_SEARCH_COUNT
+
+    def reset(self, target):
+        super(StepController, self).reset(target)
+        self._fast_search_count = STEP_FAST_SEARCH_COUNT
+        self.duty = STEP_INITIAL_DUTY
+
+    def start_at(self, duty):
+        super(StepController, self).start_at(duty)
+        self._fast_search_count = 0  # already close, small steps only
+
+    def _step(self, measured, dt):
+        duty = self.duty
+
+        # initially use a binary like search to approach the desired usage
+        if self._fast_search_count > 0:
+            self._fast_search_count -= 1
+            if measured < self.target:
+                duty = 1.0 - (1.0 - duty) * STEP_FAST_FACTOR
+            else:
+                # cpu usage is now greater than target, stop fast search
+                self._fast_search_count = 0
+
+        # then finally use small increments to get to the usage
+        else:
+            if measured > self.target:
+                duty -= STEP_DUTY_INC
+            else:
+                duty += STEP_DUTY_INC
+
+        return duty
+
+
+CONTROLLERS = {c.name: c for c in (PIDController, StepController)}
+
+
+def make_controller(name, **kwargs):
+    """ Create a controller by name, see CONTROLLERS
+    """
+    try:
+        return CONTROLLERS[name](**kwargs)
+    except KeyError:
+        raise ValueError("unknown controller '{}', choose from {}".format(name, sorted(CONTROLLERS)))
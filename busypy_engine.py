@@ -0,0 +1,106 @@
+import time
+
+from busypy_workload import SortWork
+
+# Burn engines for the busy loop.
+# An engine runs one period of the busy loop at a given duty cycle (0..1),
+# burning CPU for the busy part of the period then sleeping for the rest.
+
+PERIOD_MS = 100            # default time slice period
+BUSY_ITERATIONS = 500      # iterations engine, sorts per period
+IDLE_SLEEP_SEC = 0.2       # sleep used when the duty cycle is zero
+
+
+class Engine(object):
+    """ Base class for burn engines
+    """
+
+    name = None
+
+    def __init__(self, work=None):
+        self.work = work or SortWork()
+        self.sleeps = 0         # sleeps done, and the total seconds they overshot their deadline
+        self.overshoot = 0.0
+
+    def cycle(self, duty):
+        """ Run one period of the busy loop
+        :param duty: fraction of the period to be busy, 0..1
+        """
+        raise NotImplementedError()
+
+
+class IterationEngine(Engine):
+    """ The original engine, does a fixed number of work iterations then
+    sleeps long enough to make busy / (busy + sleep) == duty.
+    The period depends on how fast this host runs the iterations.
+    """
+
+    name = "iterations"
+
+    def __init__(self, iterations=BUSY_ITERATIONS, **kwargs):
+        super(IterationEngine, self).__init__(**kwargs)
+        self.iterations = iterations
+
+    def cycle(self, duty):
+        if duty <= 0:
+            time.sleep(IDLE_SLEEP_SEC)
+            return
+
+        start = time.perf_counter()
+        for _ in range(self.iterations):
+            self.work()
+        busy = time.perf_counter() - start
+
+        if duty < 1:
+            time.sleep(busy * (1 - duty) / duty)
+
+
+class TimeSliceEngine(Engine):
+    """ Spins for an exact busy quantum (duty * period) measured with
+    time.perf_counter(), then sleeps for the rest of the period.
+    Periods are scheduled on absolute deadlines, so a late wake up from
+    sleep is taken out of the next busy quantum and the average duty cycle
+    stays exact.  The load is a function of the target only, not of how
+    fast the host is.
+    """
+
+    name = "timeslice"
+
+    def __init__(self, period_ms=PERIOD_MS, **kwargs):
+        super(TimeSliceEngine, self).__init__(**kwargs)
+        self.period = period_ms / 1000.0
+        self._next = None
+
+    def cycle(self, duty):
+        now = time.perf_counter()
+        if self._next is None or now - self._next > self.period:
+            # first period, or fell more than a period behind, resync
+            self._next = now
+        start = self._next
+        self._next = start + self.period
+
+        busy_end = start + duty * self.period
+        work = self.work
+        while time.perf_counter() < busy_end:
+            work()
+
+        remaining = self._next - time.perf_counter()
+        if remaining > 0:
+            time.sleep(remaining)
+            self.sleeps += 1
+            self.overshoot += time.perf_counter() - self._next
+
+
+ENGINES = {e.name: e for e in (TimeSliceEngine, IterationEngine)}
+
+
+def make_engine(name, period_ms=PERIOD_MS, work=None):
+    """ Create an engine by name, see ENGINES
+    :param period_ms: period of the timeslice engine, unused by the iterations engine
+    :param work: callable doing one small unit of busy work, default SortWork
+    """
+    if name == TimeSliceEngine.name:
+        return TimeSliceEngine(period_ms=period_ms, work=work)
+    if name == IterationEngine.name:
+        return IterationEngine(work=work)
+    raise ValueError("unknown engine '{}', choose from {}".format(name, sorted(ENGINES)))
@@ -0,0 +1,174 @@
+import os
+import mmap
+import time
+import random
+import tempfile
+from array import array
+
+# Disk I/O load.
+# An IOLoad owns a scratch file and issues block reads/writes on it, paced to
+# an op rate over periods on absolute deadlines, like the timeslice engine.
+# The I/O worker closes the loop on the achieved rate, see busypy.io_worker().
+# Modes follow fio: read, write, randread, randwrite, readwrite, randrw.
+# I/O goes through os.preadv/pwritev with a page aligned buffer, so O_DIRECT
+# works, or through an mmap of the file.  Without O_DIRECT reads are mostly
+# served from the page cache.
+
+IO_MODES = ("read", "write", "randread", "randwrite", "readwrite", "randrw")
+IO_BLOCK_KB = 64
+IO_FILE_MB = 256
+IO_FSYNC_EVERY = 0          # fsync after this many writes, 0=never
+IO_PERIOD_MS = 100
+IO_LATENCY_SAMPLES = 4096   # latencies kept for the percentiles
+IO_PERCENTILES = (50, 95, 99)
+IO_SLEEP_MIN_SEC = 0.001    # ops due sooner than this are issued right away, sleep is not that precise
+
+MB = 1024 * 1024
+
+
+class LatencyWindow(object):
+    """ The last 'size' op latencies, in a fixed size ring, for percentiles
+    """
+
+    def __init__(self, size=IO_LATENCY_SAMPLES):
+        self._ring = array('d', [0.0] * size)
+        self._count = 0
+
+    def add(self, seconds):
+        self._ring[self._count % len(self._ring)] = seconds
+        self._count += 1
+
+    def percentiles(self, ps=IO_PERCENTILES):
+        """ Latency percentiles in ms, zeros if there are no samples yet
+        """
+        n = min(self._count, len(self._ring))
+        if not n:
+            return [0.0 for _ in ps]
+        ordered = sorted(self._ring[:n])
+        return [1000.0 * ordered[min(n - 1, int(n * p / 100.0))] for p in ps]
+
+
+class IOLoad(object):
+    """ Block I/O against a scratch file, see IO_MODES
+    """
+
+    def __init__(self, directory=None, mode="randread", block_kb=IO_BLOCK_KB, file_mb=IO_FILE_MB,
+                 direct=False, fsync_every=IO_FSYNC_EVERY, use_mmap=False):
+        """
+        :param directory: where to create the scratch file, default the temp dir
+        :param direct: open the file O_DIRECT, bypassing the page cache
+        :param fsync_every: fsync (or msync) after this many writes, 0=never
+        :param use_mmap: read/write through an mmap of the file, rather than pread/pwrite
+        """
+        if mode not in IO_MODES:
+            raise ValueError("unknown io mode '{}', choose from {}".format(mode, IO_MODES))
+        if direct and use_mmap:
+            raise ValueError("O_DIRECT and mmap can not be used together")
+        self.mode = mode
+        self.block = max(1, int(block_kb * 1024 // mmap.PAGESIZE)) * mmap.PAGESIZE
+        self.blocks = max(1, int(file_mb * MB // self.block))
+        self.fsync_every = fsync_every
+        self.ops = 0                # ops done, the I/O worker turns these into rates
+        self.bytes = 0
+        self.latency = LatencyWindow()
+        self._random = mode.startswith("rand")
+        self._read_fraction = {"read": 1.0, "randread": 1.0, "write": 0.0, "randwrite": 0.0}.get(mode, 0.5)
+        self._offset = 0
+        self._writes = 0
+        self._next = None
+
+        # page aligned, as O_DIRECT needs
+        self._buffer = mmap.mmap(-1, self.block)
+        self._buffer.write(os.urandom(self.block))
+
+        if direct and not hasattr(os, "O_DIRECT"):
+            raise ValueError("O_DIRECT is not supported on this platform")
+        flags = os.O_RDWR | (os.O_DIRECT if direct else 0)
+        fd, self.path = tempfile.mkstemp(prefix="busypy-io-", suffix=".dat", dir=directory)
+        os.close(fd)
+        try:
+            self._fd = os.open(self.path, flags)
+            self._fill()
+            self._map = mmap.mmap(self._fd, self.blocks * self.block) if use_mmap else None
+        except OSError:
+            os.unlink(self.path)
+            raise
+
+    def _fill(self):
+        """ Write the whole file, so reads hit real blocks
+        """
+        for i in range(self.blocks):
+            os.pwritev(self._fd, [self._buffer], i * self.block)
+        os.fsync(self._fd)
+
+    def _next_offset(self):
+        if self._random:
+            return random.randrange(self.blocks) * self.block
+        offset = self._offset
+        self._offset = (offset + self.block) % (self.blocks * self.block)
+        return offset
+
+    def op(self):
+        """ Do one read or write of a block
+        :return: latency in seconds
+        """
+        offset = self._next_offset()
+        read = self._read_fraction >= 1.0 or (self._read_fraction > 0 and random.random() < self._read_fraction)
+        start = time.perf_counter()
+        if read:
+            if self._map is not None:
+                self._buffer[:] = self._map[offset:offset + self.block]
+            else:
+                os.preadv(self._fd, [self._buffer], offset)
+        else:
+            if self._map is not None:
+                self._map[offset:offset + self.block] = self._buffer
+            else:
+                os.pwritev(self._fd, [self._buffer], offset)
+            self._writes += 1
+            if self.fsync_every and self._writes % self.fsync_every == 0:
+                if self._map is not None:
+                    self._map.flush()
+                else:
+                    os.fsync(self._fd)
+        latency = time.perf_counter() - start
+        self.latency.add(latency)
+        self.ops += 1
+        self.bytes += self.block
+        return latency
+
+    def cycle(self, rate, period=IO_PERIOD_MS / 1000.0):
+        """ Run one period of I/O, ops are spread evenly at 'rate' per second.
+        Periods are on absolute deadlines, ops that fall behind are caught up
+        back to back within the period.
+        :param rate: ops per second
+        """
+        now = time.perf_counter()
+        if self._next is None or now - self._next > period:
+            self._next = now
+        start = self._next
+        self._next = start + period
+
+        count = int(rate * period + random.random())  # dither the fraction of an op
+        for i in range(count):
+            due = start + i / rate
+            delay = due - time.perf_counter()
+            if delay > IO_SLEEP_MIN_SEC:
+                time.sleep(delay)
+            if time.perf_counter() >= self._next:
+                break  # the device can not keep up, the rest of the budget is dropped
+            self.op()
+
+        remaining = self._next - time.perf_counter()
+        if remaining > 0:
+            time.sleep(remaining)
+
+    def close(self):
+        if self._map is not None:
+            self._map.close()
+        os.close(self._fd)
+        try:
+            os.unlink(self.path)
+        except OSError:
+            pass
+        self._buffer.close()
@@ -0,0 +1,100 @@
+import time
+
+# Memory bandwidth load.
+# Holding memory (busypy_memory) uses capacity but makes no memory bus
+# traffic.  A MemBandwidthLoad streams over arrays much larger than the
+# caches, the STREAM copy/scale/triad kernels, or reads random cache lines of
+# a large working set ("chase") so nearly every access is a last level cache
+# miss.  Each call moves one small chunk, so it can be run by a burn engine
+# at a duty cycle, and counts the bytes moved, so the duty cycle can be
+# steered to a GB/s target.
+#
+# Bytes are counted like STREAM, copy/scale 2 arrays and triad 3 arrays per
+# element, chase one 64 byte cache line per access, so for chase GB/s / 64 is
+# roughly the cache misses per second.
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+MEMBW_KERNELS = ("copy", "scale", "triad", "chase")
+MEMBW_WORKING_SET_MB = 256      # all the arrays together, should be well over the last level cache
+MEMBW_CHUNK_KB = 1024           # per array, per call
+CHASE_ACCESSES = 16384          # random cache line reads per call
+CHASE_INDEXES = 1 << 22         # random indexes, cycled through so the same lines are not re-read
+CACHE_LINE = 64
+CALIBRATE_SEC = 0.5
+
+MB = 1024 * 1024
+GB = 1e9
+_SCALAR = 3.0
+
+
+class MemBandwidthLoad(object):
+    """ Memory bandwidth kernel, see MEMBW_KERNELS, a callable doing one chunk per call
+    """
+
+    name = "membw"
+    releases_gil = True
+
+    def __init__(self, kernel="triad", working_set_mb=MEMBW_WORKING_SET_MB, chunk_kb=MEMBW_CHUNK_KB):
+        if numpy is None:
+            raise RuntimeError("memory bandwidth load requires numpy, pip3 install numpy")
+        if kernel not in MEMBW_KERNELS:
+            raise ValueError("unknown memory bandwidth kernel '{}', choose from {}".format(kernel, MEMBW_KERNELS))
+        self.kernel = kernel
+        self.bytes = 0  # bytes moved, turned into GB/s by the caller
+        self._offset = 0
+
+        working_set = int(working_set_mb * MB)
+        if kernel == "chase":
+            self._buffer = numpy.ones(working_set // 8)
+            rng = numpy.random.default_rng()
+            self._indexes = rng.integers(0, len(self._buffer), CHASE_INDEXES, dtype=numpy.int64)
+            self._out = numpy.empty(CHASE_ACCESSES)
+            self._chunk = CHASE_ACCESSES
+            self._size = CHASE_INDEXES
+            self._bytes_per_call = CHASE_ACCESSES * CACHE_LINE
+        else:
+            n = working_set // 3 // 8
+            self._a = numpy.ones(n)
+            self._b = numpy.full(n, 2.0)
+            self._c = numpy.zeros(n)
+            self._chunk = max(1, min(n, int(chunk_kb * 1024 // 8)))
+            self._size = n
+            self._bytes_per_call = self._chunk * 8 * (3 if kernel == "triad" else 2)
+        self._call = getattr(self, "_" + kernel)
+
+    def _copy(self, s):
+        self._c[s] = self._a[s]
+
+    def _scale(self, s):
+        numpy.multiply(self._c[s], _SCALAR, out=self._b[s])
+
+    def _triad(self, s):
+        numpy.multiply(self._c[s], _SCALAR, out=self._a[s])
+        numpy.add(self._a[s], self._b[s], out=self._a[s])
+
+    def _chase(self, s):
+        numpy.take(self._buffer, self._indexes[s], out=self._out, mode="clip")
+
+    def __call__(self):
+        start = self._offset
+        end = start + self._chunk
+        if end > self._size:
+            start, end = 0, self._chunk
+        self._offset = end
+        self._call(slice(start, end))
+        self.bytes += self._bytes_per_call
+
+    def calibrate(self, seconds=CALIBRATE_SEC):
+        """ Run flat out for a moment
+        :return: peak GB/s of this kernel on this host
+        """
+        start_bytes = self.bytes
+        start = time.perf_counter()
+        end = start + seconds
+        while time.perf_counter() < end:
+            self()
+        return (self.bytes - start_bytes) / (time.perf_counter() - start) / GB
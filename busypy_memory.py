@@ -0,0 +1,107 @@
+import mmap
+import psutil
+
+# Node level memory hog.
+# One MemoryManager, in the parent process, owns an arena of anonymous mmap
+# chunks and grows or shrinks it so that the memory used by busypy (parent
+# and all worker processes) hits a node wide percent target.
+
+MEMORY_INCREMENT_MB = 16        # arena grows/shrinks in chunks of this size
+MEMORY_TOLERANCE_PERCENT = 0.5  # +/- band around the target where nothing is done
+
+MB = 1024 * 1024
+
+
+class MemoryArena(object):
+    """ A list of page aligned anonymous mmap chunks of 'increment' bytes.
+    Chunks are written to when created so the pages are resident, and
+    unmapped when released so the memory goes straight back to the OS.
+    """
+
+    def __init__(self, increment_mb=MEMORY_INCREMENT_MB):
+        increment = max(1, int(increment_mb * MB))
+        # round up to a whole number of pages
+        self.increment = -(-increment // mmap.PAGESIZE) * mmap.PAGESIZE
+        self._chunks = []
+
+    @property
+    def size(self):
+        """ Size of the arena in bytes
+        """
+        return len(self._chunks) * self.increment
+
+    def resize(self, nbytes):
+        """ Grow or shrink the arena to the nearest number of chunks to nbytes
+        :param nbytes: requested size in bytes
+        :return: the new size in bytes
+        """
+        count = max(0, int(round(float(nbytes) / self.increment)))
+
+        while len(self._chunks) < count:
+            chunk = mmap.mmap(-1, self.increment)
+            # touch every page, one byte each, so the pages are resident without holding a chunk sized template
+            chunk[::mmap.PAGESIZE] = b"*" * (self.increment // mmap.PAGESIZE)
+            self._chunks.append(chunk)
+
+        while len(self._chunks) > count:
+            self._chunks.pop().close()
+
+        return self.size
+
+    def close(self):
+        self.resize(0)
+
+
+class MemoryManager(object):
+    """ Adjusts a MemoryArena so the resident memory of this process and its
+    children is the target percent of the node memory.
+    Only one of these should exist per node, otherwise they fight each other.
+    """
+
+    def __init__(self, arena=None, tolerance=MEMORY_TOLERANCE_PERCENT, total=None, limit=None, exclude=()):
+        """
+        :param total: bytes the percent is of, default the node memory, e.g. a cgroup memory limit
+        :param limit: bytes the resident memory is never grown past, None=no limit
+        :param exclude: pids of children that are not counted, e.g. workers with buffers of their own
+        """
+        self.arena = arena or MemoryArena()
+        self.tolerance = tolerance
+        self._proc = psutil.Process()
+        self.total = total or psutil.virtual_memory().total
+        self.limit = limit
+        self.exclude = set(exclude)
+
+    def used_bytes(self):
+        """ Resident memory of this process and all its children, but the excluded ones
+        """
+        used = self._proc.memory_info().rss
+        for child in self._proc.children(recursive=True):
+            if child.pid in self.exclude:
+                continue
+            try:
+                used += child.memory_info().rss
+            except psutil.Error:
+                pass  # child exited
+        return used
+
+    def percent(self):
+        """ Resident memory of this process and its children, as a percent of the node
+        """
+        return 100.0 * self.used_bytes() / self.total
+
+    def adjust(self, target_percent):
+        """ Resize the arena to hit the target, in one step
+        :param target_percent: node memory percent
+        :return: measured percent before the adjustment
+        """
+        used = self.used_bytes()
+        measured = 100.0 * used / self.total
+        if abs(target_percent - measured) > self.tolerance / 2:
+            target = target_percent / 100.0 * self.total
+            if self.limit is not None:
+                target = min(target, self.limit)
+            self.arena.resize(self.arena.size + target - used)
+        return measured
+
+    def close(self):
+        self.arena.close()
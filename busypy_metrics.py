@@ -0,0 +1,182 @@
+import math
+import bisect
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Prometheus text format metrics.
+# Metrics are plain dicts keyed by label values, updated without locks, so
+# updating one costs a dict lookup on the hot path.  Under the GIL a racing
+# update from another thread can at worst lose an increment, which is fine
+# for monitoring.  Collectors are called at scrape time, to copy values that
+# live elsewhere (like the busypy shared state) into gauges, so those cost
+# nothing until scraped.  A MetricsServer serves the text on /metrics.
+
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _format_value(value):
+    if math.isnan(value):
+        return "NaN"
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value))
+
+
+def _format_labels(names, values, extra=""):
+    pairs = ['{}="{}"'.format(n, str(v).replace("\\", "\\\\").replace('"', '\\"')) for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Metric(object):
+    """ Base class, a metric with optional labels, values keyed by the label values
+    """
+
+    kind = None
+
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._values = {}
+        if not self.labels and self.kind != "histogram":
+            self._values[()] = 0  # a metric without labels is always there
+
+    def _key(self, labels):
+        return tuple(labels[n] for n in self.labels)
+
+    def clear(self):
+        self._values = {}
+
+    def samples(self):
+        """ (suffix, label text, value) of every sample
+        """
+        for key, value in list(self._values.items()):
+            yield "", _format_labels(self.labels, key), value
+
+    def render(self):
+        lines = ["# HELP {} {}".format(self.name, self.help), "# TYPE {} {}".format(self.name, self.kind)]
+        for suffix, labels, value in self.samples():
+            lines.append("{}{}{} {}".format(self.name, suffix, labels, _format_value(value)))
+        return "\n".join(lines)
+
+
+class Gauge(Metric):
+    kind = "gauge"
+
+    def set(self, value, **labels):
+        self._values[self._key(labels)] = value
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        self._values[key] = self._values.get(key, 0) + amount
+
+
+class Histogram(Metric):
+    """ Fixed bucket histogram, the counts per bucket are not cumulative until rendered
+    """
+
+    kind = "histogram"
+
+    def __init__(self, name, help, labels=(), buckets=LATENCY_BUCKETS):
+        super(Histogram, self).__init__(name, help, labels)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        counts = self._values.get(key)
+        if counts is None:
+            # one count per bucket, then +Inf, sum
+            counts = self._values[key] = [0] * (len(self.buckets) + 1) + [0.0]
+        counts[bisect.bisect_left(self.buckets, value)] += 1
+        counts[-1] += value
+
+    def samples(self):
+        for key, counts in list(self._values.items()):
+            counts = list(counts)
+            total = 0
+            for le, count in zip(self.buckets + (float("inf"),), counts[:-1]):
+                total += count
+                le = "+Inf" if math.isinf(le) else repr(le)
+                yield "_bucket", _format_labels(self.labels, key, 'le="{}"'.format(le)), total
+            yield "_sum", _format_labels(self.labels, key), counts[-1]
+            yield "_count", _format_labels(self.labels, key), total
+
+
+class MetricsRegistry(object):
+    """ The metrics of a process, rendered in the Prometheus text format
+    """
+
+    def __init__(self):
+        self._metrics = []
+        self._collectors = []
+
+    def _add(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def gauge(self, name, help, labels=()):
+        return self._add(Gauge(name, help, labels))
+
+    def counter(self, name, help, labels=()):
+        return self._add(Counter(name, help, labels))
+
+    def histogram(self, name, help, labels=(), buckets=LATENCY_BUCKETS):
+        return self._add(Histogram(name, help, labels, buckets))
+
+    def collector(self, fn):
+        """ Call fn() before every scrape, to update gauges from elsewhere
+        """
+        self._collectors.append(fn)
+        return fn
+
+    def render(self):
+        for fn in self._collectors:
+            try:
+                fn()
+            except Exception as e:
+                print("metrics collector {} failed: {}".format(getattr(fn, "__name__", fn), e))
+        return "\n".join(m.render() for m in self._metrics) + "\n"
+
+
+class MetricsServer(object):
+    """ Serves a MetricsRegistry on http://<host>:<port>/metrics from a background thread
+    """
+
+    def __init__(self, registry, port, host=""):
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] not in ("/metrics", "/"):
+                    self.send_error(404)
+                    return
+                body = registry.render().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", CONTENT_TYPE)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass  # no access log on the console
+
+        self._httpd = ThreadingHTTPServer((host, port), Handler)
+        self._httpd.daemon_threads = True
+        self.port = self._httpd.server_address[1]
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name="MetricsServer")
+        self._thread.daemon = True
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
@@ -0,0 +1,144 @@
+import os
+import time
+import socket
+import tempfile
+import threading
+
+# Network bandwidth load.
+# Every node runs a NetSink, a TCP server that reads and throws away whatever
+# it is sent, and a NetSender streams to one peer's sink at a paced rate.  The
+# server hands out the peers (see busypyserver), with no peer a node sends to
+# its own sink over loopback.
+# The sender sends from a memoryview of a preallocated buffer, or with
+# socket.sendfile() from a scratch file, which skips the copy into the kernel.
+
+NET_PORT = 50061
+NET_CHUNK_KB = 64           # bytes per send
+NET_SENDFILE_MB = 4         # sendfile scratch file, sent round and round
+NET_PERIOD_MS = 100
+NET_TIMEOUT_SEC = 2
+MBIT = 1000 * 1000 / 8      # bytes per Mbit
+
+
+def parse_peer(peer, default_port=NET_PORT):
+    """ 'host[:port]' into (host, port)
+    """
+    host, sep, port = peer.rpartition(":")
+    if not sep:
+        return peer, default_port
+    return host, int(port)
+
+
+class NetSink(object):
+    """ TCP server that receives and discards, counting the bytes, a thread per connection
+    """
+
+    def __init__(self, port=NET_PORT, chunk_kb=NET_CHUNK_KB):
+        self.bytes = 0
+        self._chunk = int(chunk_kb * 1024)
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self._sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        try:
+            self._sock.bind(("", port))
+            self._sock.listen(16)
+        except OSError:
+            self._sock.close()
+            raise
+        self._sock.settimeout(0.5)
+        self.port = self._sock.getsockname()[1]
+        self._thread = None
+
+    def _receive(self, conn):
+        view = memoryview(bytearray(self._chunk))
+        with conn:
+            while not self._stop.is_set():
+                try:
+                    n = conn.recv_into(view)
+                except socket.timeout:
+                    continue
+                except OSError:
+                    return
+                if not n:
+                    return
+                with self._lock:
+                    self.bytes += n
+
+    def _accept(self):
+        while not self._stop.is_set():
+            try:
+                conn, _ = self._sock.accept()
+            except socket.timeout:
+                continue
+            except OSError:
+                return
+            conn.settimeout(0.5)
+            t = threading.Thread(target=self._receive, args=(conn,), name="NetSink")
+            t.daemon = True
+            t.start()
+
+    def start(self):
+        self._thread = threading.Thread(target=self._accept, name="NetSink")
+        self._thread.daemon = True
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._sock.close()
+
+
+class NetSender(object):
+    """ One TCP stream to a sink, sent at a paced rate
+    """
+
+    def __init__(self, host, port, use_sendfile=False, chunk_kb=NET_CHUNK_KB):
+        self.peer = (host, port)
+        self.bytes = 0
+        self._chunk = int(chunk_kb * 1024)
+        self._view = memoryview(os.urandom(self._chunk))
+        self._file = None
+        self._offset = 0
+        self._next = None
+        self._sock = socket.create_connection(self.peer, timeout=NET_TIMEOUT_SEC)
+        if use_sendfile:
+            self._file = tempfile.TemporaryFile(prefix="busypy-net-")
+            for _ in range(int(NET_SENDFILE_MB * 1024 * 1024 // self._chunk)):
+                self._file.write(self._view)
+            self._file.flush()
+            self._size = self._file.tell()
+
+    def _send(self, count):
+        if self._file is not None:
+            count = min(count, self._size - self._offset)
+            sent = self._sock.sendfile(self._file, self._offset, count)
+            self._offset = (self._offset + sent) % self._size
+            return sent
+        return self._sock.send(self._view[:count])
+
+    def cycle(self, rate, period=NET_PERIOD_MS / 1000.0):
+        """ Send rate * period bytes, then sleep for the rest of the period.
+        Periods are on absolute deadlines like the timeslice engine.
+        :param rate: bytes per second
+        :raises OSError: the connection failed
+        """
+        now = time.perf_counter()
+        if self._next is None or now - self._next > period:
+            self._next = now
+        self._next += period
+
+        budget = int(rate * period)
+        while budget > 0 and time.perf_counter() < self._next:
+            sent = self._send(min(budget, self._chunk))
+            budget -= sent
+            self.bytes += sent
+
+        remaining = self._next - time.perf_counter()
+        if remaining > 0:
+            time.sleep(remaining)
+
+    def close(self):
+        self._sock.close()
+        if self._file is not None:
+            self._file.close()
@@ -1,12 +1,12 @@
+# -*- coding: utf-8 -*-
 # Generated by the protocol buffer compiler.  DO NOT EDIT!
 # source: busypy.proto
-
-import sys
-_b=sys.version_info[0]<3 and (lambda x:x) or (lambda x:x.encode('latin1'))
+# Protobuf Python Version: 4.25.1
+"""Generated protocol buffer code."""
 from google.protobuf import descriptor as _descriptor
-from google.protobuf import message as _message
-from google.protobuf import reflection as _reflection
+from google.protobuf import descriptor_pool as _descriptor_pool
 from google.protobuf import symbol_database as _symbol_database
+from google.protobuf.internal import builder as _builder
 # @@protoc_insertion_point(imports)
 
 _sym_db = _symbol_database.Default()
@@ -14,101 +14,53 @@ _sym_db = _symbol_database.Default()
 
 
 
-DESCRIPTOR = _descriptor.FileDescriptor(
-  name='busypy.proto',
-  package='busypy',
-  syntax='proto3',
-  serialized_options=None,
-  serialized_pb=_b('\n\x0c\x62usypy.proto\x12\x06\x62usypy\"c\n\x0e\x42usyPySettings\x12\x16\n\x0e\x63puLoadPercent\x18\x01 \x01(\x05\x12\x15\n\rmemoryPercent\x18\x02 \x01(\x05\x12\x12\n\nclientExit\x18\x03 \x01(\x08\x12\x0e\n\x06update\x18\x04 \x01(\x08\x32P\n\rBusyPyService\x12?\n\x0bGetSettings\x12\x16.busypy.BusyPySettings\x1a\x16.busypy.BusyPySettings\"\x00\x62\x06proto3')
-)
-
-
-
-
-_BUSYPYSETTINGS = _descriptor.Descriptor(
-  name='BusyPySettings',
-  full_name='busypy.BusyPySettings',
-  filename=None,
-  file=DESCRIPTOR,
-  containing_type=None,
-  fields=[
-    _descriptor.FieldDescriptor(
-      name='cpuLoadPercent', full_name='busypy.BusyPySettings.cpuLoadPercent', index=0,
-      number=1, type=5, cpp_type=1, label=1,
-      has_default_value=False, default_value=0,
-      message_type=None, enum_type=None, containing_type=None,
-      is_extension=False, extension_scope=None,
-      serialized_options=None, file=DESCRIPTOR),
-    _descriptor.FieldDescriptor(
-      name='memoryPercent', full_name='busypy.BusyPySettings.memoryPercent', index=1,
-      number=2, type=5, cpp_type=1, label=1,
-      has_default_value=False, default_value=0,
-      message_type=None, enum_type=None, containing_type=None,
-      is_extension=False, extension_scope=None,
-      serialized_options=None, file=DESCRIPTOR),
-    _descriptor.FieldDescriptor(
-      name='clientExit', full_name='busypy.BusyPySettings.clientExit', index=2,
-      number=3, type=8, cpp_type=7, label=1,
-      has_default_value=False, default_value=False,
-      message_type=None, enum_type=None, containing_type=None,
-      is_extension=False, extension_scope=None,
-      serialized_options=None, file=DESCRIPTOR),
-    _descriptor.FieldDescriptor(
-      name='update', full_name='busypy.BusyPySettings.update', index=3,
-      number=4, type=8, cpp_type=7, label=1,
-      has_default_value=False, default_value=False,
-      message_type=None, enum_type=None, containing_type=None,
-      is_extension=False, extension_scope=None,
-      serialized_options=None, file=DESCRIPTOR),
-  ],
-  extensions=[
-  ],
-  nested_types=[],
-  enum_types=[
-  ],
-  serialized_options=None,
-  is_extendable=False,
-  syntax='proto3',
-  extension_ranges=[],
-  oneofs=[
-  ],
-  serialized_start=24,
-  serialized_end=123,
-)
-
-DESCRIPTOR.message_types_by_name['BusyPySettings'] = _BUSYPYSETTINGS
-_sym_db.RegisterFileDescriptor(DESCRIPTOR)
-
-BusyPySettings = _reflection.GeneratedProtocolMessageType('BusyPySettings', (_message.Message,), dict(
-  DESCRIPTOR = _BUSYPYSETTINGS,
-  __module__ = 'busypy_pb2'
-  # @@protoc_insertion_point(class_scope:busypy.BusyPySettings)
-  ))
-_sym_db.RegisterMessage(BusyPySettings)
-
-
-
-_BUSYPYSERVICE = _descriptor.ServiceDescriptor(
-  name='BusyPyService',
-  full_name='busypy.BusyPyService',
-  file=DESCRIPTOR,
-  index=0,
-  serialized_options=None,
-  serialized_start=125,
-  serialized_end=205,
-  methods=[
-  _descriptor.MethodDescriptor(
-    name='GetSettings',
-    full_name='busypy.BusyPyService.GetSettings',
-    index=0,
-    containing_service=None,
-    input_type=_BUSYPYSETTINGS,
-    output_type=_BUSYPYSETTINGS,
-    serialized_options=None,
-  ),
-])
-_sym_db.RegisterServiceDescriptor(_BUSYPYSERVICE)
-
-DESCRIPTOR.services_by_name['BusyPyService'] = _BUSYPYSERVICE
-
+DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n\x0c\x62usypy.proto\x12\x06\x62usypy\"\xa5\x02\n\x07Targets\x12\x1b\n\x0e\x63puLoadPercent\x18\x01 \x01(\x05H\x00\x88\x01\x01\x12\x1a\n\rmemoryPercent\x18\x02 \x01(\x05H\x01\x88\x01\x01\x12\x17\n\nclientExit\x18\x03 \x01(\x08H\x02\x88\x01\x01\x12\x13\n\x06ioMBps\x18\x04 \x01(\x05H\x03\x88\x01\x01\x12\x13\n\x06ioIOPS\x18\x05 \x01(\x05H\x04\x88\x01\x01\x12\x1d\n\x10memBandwidthGBps\x18\x06 \x01(\x02H\x05\x88\x01\x01\x12\x14\n\x07netMbps\x18\x07 \x01(\x02H\x06\x88\x01\x01\x42\x11\n\x0f_cpuLoadPercentB\x10\n\x0e_memoryPercentB\r\n\x0b_clientExitB\t\n\x07_ioMBpsB\t\n\x07_ioIOPSB\x13\n\x11_memBandwidthGBpsB\n\n\x08_netMbps\"9\n\x0eTargetSelector\x12\x0b\n\x03\x61ll\x18\x01 \x01(\x08\x12\r\n\x05group\x18\x02 \x01(\t\x12\x0b\n\x03ips\x18\x03 \x03(\t\"Z\n\x0cTargetChange\x12(\n\x08selector\x18\x01 \x01(\x0b\x32\x16.busypy.TargetSelector\x12 \n\x07targets\x18\x02 \x01(\x0b\x32\x0f.busypy.Targets\".\n\nAdminReply\x12\x0f\n\x07\x63lients\x18\x01 \x01(\x05\x12\x0f\n\x07version\x18\x02 \x01(\x03\"K\n\x0bStatusQuery\x12\x12\n\nmaxClients\x18\x01 \x01(\x05\x12(\n\x08selector\x18\x02 \x01(\x0b\x32\x16.busypy.TargetSelector\"D\n\x0eTargetOverride\x12\x10\n\x08selector\x18\x01 \x01(\t\x12 \n\x07targets\x18\x02 \x01(\x0b\x32\x0f.busypy.Targets\"\x93\x01\n\nClientInfo\x12\n\n\x02ip\x18\x01 \x01(\t\x12\x0c\n\x04pids\x18\x02 \x03(\t\x12\r\n\x05group\x18\x03 \x01(\t\x12\x10\n\x08lastSeen\x18\x04 \x01(\x01\x12\x0b\n\x03\x63pu\x18\x05 \x01(\x01\x12\x0b\n\x03mem\x18\x06 \x01(\x01\x12 \n\x07targets\x18\x07 \x01(\x0b\x32\x0f.busypy.Targets\x12\x0e\n\x06update\x18\x08 \x01(\x08\"\xee\x01\n\x0cServerStatus\x12 \n\x07targets\x18\x01 \x01(\x0b\x32\x0f.busypy.Targets\x12)\n\toverrides\x18\x02 \x03(\x0b\x32\x16.busypy.TargetOverride\x12\x0f\n\x07\x63lients\x18\x03 \x01(\x05\x12\x11\n\tprocesses\x18\x04 \x01(\x05\x12\x13\n\x0bsubscribers\x18\x05 \x01(\x05\x12\x0f\n\x07version\x18\x06 \x01(\x03\x12\x0e\n\x06uptime\x18\x07 \x01(\x01\x12\x13\n\x0blistedTotal\x18\x08 \x01(\x05\x12\"\n\x06listed\x18\t \x03(\x0b\x32\x12.busypy.ClientInfo\"\x8a\x03\n\x0e\x42usyPySettings\x12\x16\n\x0e\x63puLoadPercent\x18\x01 \x01(\x05\x12\x15\n\rmemoryPercent\x18\x02 \x01(\x05\x12\x12\n\nclientExit\x18\x03 \x01(\x08\x12\x0e\n\x06update\x18\x04 \x01(\x08\x12%\n\x07workers\x18\x05 \x03(\x0b\x32\x14.busypy.WorkerStatus\x12$\n\x07profile\x18\x06 \x01(\x0b\x32\x13.busypy.LoadProfile\x12\x0e\n\x06ioMBps\x18\x07 \x01(\x05\x12\x0e\n\x06ioIOPS\x18\x08 \x01(\x05\x12\x1c\n\x02io\x18\t \x01(\x0b\x32\x10.busypy.IOStatus\x12\x18\n\x10memBandwidthGBps\x18\n \x01(\x02\x12\x0f\n\x07netMbps\x18\x0b \x01(\x02\x12\x0f\n\x07netPeer\x18\x0c \x01(\t\x12\x0f\n\x07netPort\x18\r \x01(\x05\x12\x11\n\tnetRxMbps\x18\x0e \x01(\x02\x12\x14\n\x0cpollInterval\x18\x0f \x01(\x02\x12$\n\x06\x63group\x18\x10 \x01(\x0b\x32\x14.busypy.CgroupStatus\"s\n\x0c\x43groupStatus\x12\x10\n\x08\x63puQuota\x18\x01 \x01(\x01\x12\x13\n\x0bmemoryLimit\x18\x02 \x01(\x03\x12\x11\n\tnrPeriods\x18\x03 \x01(\x03\x12\x13\n\x0bnrThrottled\x18\x04 \x01(\x03\x12\x14\n\x0cthrottledSec\x18\x05 \x01(\x01\"h\n\x08IOStatus\x12\x0c\n\x04mbps\x18\x01 \x01(\x01\x12\x0c\n\x04iops\x18\x02 \x01(\x01\x12\x14\n\x0clatencyP50Ms\x18\x03 \x01(\x01\x12\x14\n\x0clatencyP95Ms\x18\x04 \x01(\x01\x12\x14\n\x0clatencyP99Ms\x18\x05 \x01(\x01\"3\n\x0cWorkerStatus\x12\x0b\n\x03pid\x18\x01 \x01(\x05\x12\x16\n\x0e\x63puLoadPercent\x18\x02 \x01(\x05\"X\n\x0bLoadProfile\x12(\n\x08segments\x18\x01 \x03(\x0b\x32\x16.busypy.ProfileSegment\x12\x11\n\tstartTime\x18\x02 \x01(\x01\x12\x0c\n\x04loop\x18\x03 \x01(\x08\"\x8d\x02\n\x0eProfileSegment\x12+\n\x05shape\x18\x01 \x01(\x0e\x32\x1c.busypy.ProfileSegment.Shape\x12\x10\n\x08\x64uration\x18\x02 \x01(\x01\x12\x0f\n\x07\x63puFrom\x18\x03 \x01(\x01\x12\r\n\x05\x63puTo\x18\x04 \x01(\x01\x12\x0e\n\x06hasMem\x18\x05 \x01(\x08\x12\x0f\n\x07memFrom\x18\x06 \x01(\x01\x12\r\n\x05memTo\x18\x07 \x01(\x01\x12\x0e\n\x06period\x18\x08 \x01(\x01\x12\x0c\n\x04rate\x18\t \x01(\x01\x12\x0e\n\x06length\x18\n \x01(\x01\x12\x0c\n\x04seed\x18\x0b \x01(\x03\"0\n\x05Shape\x12\x08\n\x04STEP\x10\x00\x12\x08\n\x04RAMP\x10\x01\x12\x08\n\x04SINE\x10\x02\x12\t\n\x05\x42URST\x10\x03\"D\n\nFleetQuery\x12\x0e\n\x06recent\x18\x01 \x01(\x05\x12\x12\n\nlagPercent\x18\x02 \x01(\x02\x12\x12\n\nmaxLagging\x18\x03 \x01(\x05\"C\n\x0c\x44istribution\x12\x0b\n\x03p50\x18\x01 \x01(\x01\x12\x0b\n\x03p95\x18\x02 \x01(\x01\x12\x0b\n\x03max\x18\x03 \x01(\x01\x12\x0c\n\x04mean\x18\x04 \x01(\x01\"h\n\rLaggingClient\x12\n\n\x02ip\x18\x01 \x01(\t\x12\x0b\n\x03pid\x18\x02 \x01(\x05\x12\x0b\n\x03\x63pu\x18\x03 \x01(\x01\x12\x11\n\tcpuTarget\x18\x04 \x01(\x01\x12\x0b\n\x03mem\x18\x05 \x01(\x01\x12\x11\n\tmemTarget\x18\x06 \x01(\x01\"\xf1\x01\n\nFleetStats\x12\x0f\n\x07\x63lients\x18\x01 \x01(\x05\x12\x11\n\tprocesses\x18\x02 \x01(\x05\x12!\n\x03\x63pu\x18\x03 \x01(\x0b\x32\x14.busypy.Distribution\x12!\n\x03mem\x18\x04 \x01(\x0b\x32\x14.busypy.Distribution\x12\x14\n\x0c\x63puDeviation\x18\x05 \x01(\x01\x12\x14\n\x0cmemDeviation\x18\x06 \x01(\x01\x12\x14\n\x0claggingTotal\x18\x07 \x01(\x05\x12&\n\x07lagging\x18\x08 \x03(\x0b\x32\x15.busypy.LaggingClient\x12\x0f\n\x07samples\x18\t \x01(\x05\x32\xcb\x01\n\rBusyPyService\x12?\n\x0bGetSettings\x12\x16.busypy.BusyPySettings\x1a\x16.busypy.BusyPySettings\"\x00\x12\x41\n\tSubscribe\x12\x16.busypy.BusyPySettings\x1a\x16.busypy.BusyPySettings\"\x00(\x01\x30\x01\x12\x36\n\nQueryFleet\x12\x12.busypy.FleetQuery\x1a\x12.busypy.FleetStats\"\x00\x32\xbf\x01\n\x0b\x42usyPyAdmin\x12\x38\n\nSetTargets\x12\x14.busypy.TargetChange\x1a\x12.busypy.AdminReply\"\x00\x12<\n\x0c\x43learTargets\x12\x16.busypy.TargetSelector\x1a\x12.busypy.AdminReply\"\x00\x12\x38\n\tGetStatus\x12\x13.busypy.StatusQuery\x1a\x14.busypy.ServerStatus\"\x00\x62\x06proto3')
+
+_globals = globals()
+_builder.BuildMessageAndEnumDescriptors(DESCRIPTOR, _globals)
+_builder.BuildTopDescriptorsAndMessages(DESCRIPTOR, 'busypy_pb2', _globals)
+if _descriptor._USE_C_DESCRIPTORS == False:
+  DESCRIPTOR._options = None
+  _globals['_TARGETS']._serialized_start=25
+  _globals['_TARGETS']._serialized_end=318
+  _globals['_TARGETSELECTOR']._serialized_start=320
+  _globals['_TARGETSELECTOR']._serialized_end=377
+  _globals['_TARGETCHANGE']._serialized_start=379
+  _globals['_TARGETCHANGE']._serialized_end=469
+  _globals['_ADMINREPLY']._serialized_start=471
+  _globals['_ADMINREPLY']._serialized_end=517
+  _globals['_STATUSQUERY']._serialized_start=519
+  _globals['_STATUSQUERY']._serialized_end=594
+  _globals['_TARGETOVERRIDE']._serialized_start=596
+  _globals['_TARGETOVERRIDE']._serialized_end=664
+  _globals['_CLIENTINFO']._serialized_start=667
+  _globals['_CLIENTINFO']._serialized_end=814
+  _globals['_SERVERSTATUS']._serialized_start=817
+  _globals['_SERVERSTATUS']._serialized_end=1055
+  _globals['_BUSYPYSETTINGS']._serialized_start=1058
+  _globals['_BUSYPYSETTINGS']._serialized_end=1452
+  _globals['_CGROUPSTATUS']._serialized_start=1454
+  _globals['_CGROUPSTATUS']._serialized_end=1569
+  _globals['_IOSTATUS']._serialized_start=1571
+  _globals['_IOSTATUS']._serialized_end=1675
+  _globals['_WORKERSTATUS']._serialized_start=1677
+  _globals['_WORKERSTATUS']._serialized_end=1728
+  _globals['_LOADPROFILE']._serialized_start=1730
+  _globals['_LOADPROFILE']._serialized_end=1818
+  _globals['_PROFILESEGMENT']._serialized_start=1821
+  _globals['_PROFILESEGMENT']._serialized_end=2090
+  _globals['_PROFILESEGMENT_SHAPE']._serialized_start=2042
+  _globals['_PROFILESEGMENT_SHAPE']._serialized_end=2090
+  _globals['_FLEETQUERY']._serialized_start=2092
+  _globals['_FLEETQUERY']._serialized_end=2160
+  _globals['_DISTRIBUTION']._serialized_start=2162
+  _globals['_DISTRIBUTION']._serialized_end=2229
+  _globals['_LAGGINGCLIENT']._serialized_start=2231
+  _globals['_LAGGINGCLIENT']._serialized_end=2335
+  _globals['_FLEETSTATS']._serialized_start=2338
+  _globals['_FLEETSTATS']._serialized_end=2579
+  _globals['_BUSYPYSERVICE']._serialized_start=2582
+  _globals['_BUSYPYSERVICE']._serialized_end=2785
+  _globals['_BUSYPYADMIN']._serialized_start=2788
+  _globals['_BUSYPYADMIN']._serialized_end=2979
 # @@protoc_insertion_point(module_scope)
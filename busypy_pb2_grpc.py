@@ -1,46 +1,267 @@
 # Generated by the gRPC Python protocol compiler plugin. DO NOT EDIT!
+"""Client and server classes corresponding to protobuf-defined services."""
 import grpc
 
 import busypy_pb2 as busypy__pb2
 
 
 class BusyPyServiceStub(object):
-  # missing associated documentation comment in .proto file
-  pass
+    """Missing associated documentation comment in .proto file."""
 
-  def __init__(self, channel):
-    """Constructor.
+    def __init__(self, channel):
+        """Constructor.
 
-    Args:
-      channel: A grpc.Channel.
-    """
-    self.GetSettings = channel.unary_unary(
-        '/busypy.BusyPyService/GetSettings',
-        request_serializer=busypy__pb2.BusyPySettings.SerializeToString,
-        response_deserializer=busypy__pb2.BusyPySettings.FromString,
-        )
+        Args:
+            channel: A grpc.Channel.
+        """
+        self.GetSettings = channel.unary_unary(
+                '/busypy.BusyPyService/GetSettings',
+                request_serializer=busypy__pb2.BusyPySettings.SerializeToString,
+                response_deserializer=busypy__pb2.BusyPySettings.FromString,
+                )
+        self.Subscribe = channel.stream_stream(
+                '/busypy.BusyPyService/Subscribe',
+                request_serializer=busypy__pb2.BusyPySettings.SerializeToString,
+                response_deserializer=busypy__pb2.BusyPySettings.FromString,
+                )
+        self.QueryFleet = channel.unary_unary(
+                '/busypy.BusyPyService/QueryFleet',
+                request_serializer=busypy__pb2.FleetQuery.SerializeToString,
+                response_deserializer=busypy__pb2.FleetStats.FromString,
+                )
 
 
 class BusyPyServiceServicer(object):
-  # missing associated documentation comment in .proto file
-  pass
+    """Missing associated documentation comment in .proto file."""
+
+    def GetSettings(self, request, context):
+        """Missing associated documentation comment in .proto file."""
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
 
-  def GetSettings(self, request, context):
-    # missing associated documentation comment in .proto file
-    pass
-    context.set_code(grpc.StatusCode.UNIMPLEMENTED)
-    context.set_details('Method not implemented!')
-    raise NotImplementedError('Method not implemented!')
+    def Subscribe(self, request_iterator, context):
+        """clients send their status (see GetSettings) on the request stream, and the
+        server pushes new settings on the response stream as soon as they change
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def QueryFleet(self, request, context):
+        """fleet statistics from the server's telemetry, see busypy_telemetry.py
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
 
 
 def add_BusyPyServiceServicer_to_server(servicer, server):
-  rpc_method_handlers = {
-      'GetSettings': grpc.unary_unary_rpc_method_handler(
-          servicer.GetSettings,
-          request_deserializer=busypy__pb2.BusyPySettings.FromString,
-          response_serializer=busypy__pb2.BusyPySettings.SerializeToString,
-      ),
-  }
-  generic_handler = grpc.method_handlers_generic_handler(
-      'busypy.BusyPyService', rpc_method_handlers)
-  server.add_generic_rpc_handlers((generic_handler,))
+    rpc_method_handlers = {
+            'GetSettings': grpc.unary_unary_rpc_method_handler(
+                    servicer.GetSettings,
+                    request_deserializer=busypy__pb2.BusyPySettings.FromString,
+                    response_serializer=busypy__pb2.BusyPySettings.SerializeToString,
+            ),
+            'Subscribe': grpc.stream_stream_rpc_method_handler(
+                    servicer.Subscribe,
+                    request_deserializer=busypy__pb2.BusyPySettings.FromString,
+                    response_serializer=busypy__pb2.BusyPySettings.SerializeToString,
+            ),
+            'QueryFleet': grpc.unary_unary_rpc_method_handler(
+                    servicer.QueryFleet,
+                    request_deserializer=busypy__pb2.FleetQuery.FromString,
+                    response_serializer=busypy__pb2.FleetStats.SerializeToString,
+            ),
+    }
+    generic_handler = grpc.method_handlers_generic_handler(
+            'busypy.BusyPyService', rpc_method_handlers)
+    server.add_generic_rpc_handlers((generic_handler,))
+
+
+ # This class is part of an EXPERIMENTAL API.
+class BusyPyService(object):
+    """Missing associated documentation comment in .proto file."""
+
+    @staticmethod
+    def GetSettings(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(request, target, '/busypy.BusyPyService/GetSettings',
+            busypy__pb2.BusyPySettings.SerializeToString,
+            busypy__pb2.BusyPySettings.FromString,
+            options, channel_credentials,
+            insecure, call_credentials, compression, wait_for_ready, timeout, metadata)
+
+    @staticmethod
+    def Subscribe(request_iterator,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.stream_stream(request_iterator, target, '/busypy.BusyPyService/Subscribe',
+            busypy__pb2.BusyPySettings.SerializeToString,
+            busypy__pb2.BusyPySettings.FromString,
+            options, channel_credentials,
+            insecure, call_credentials, compression, wait_for_ready, timeout, metadata)
+
+    @staticmethod
+    def QueryFleet(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(request, target, '/busypy.BusyPyService/QueryFleet',
+            busypy__pb2.FleetQuery.SerializeToString,
+            busypy__pb2.FleetStats.FromString,
+            options, channel_credentials,
+            insecure, call_credentials, compression, wait_for_ready, timeout, metadata)
+
+
+class BusyPyAdminStub(object):
+    """live control of a running server, see busypy_admin.py and busypyctl.py
+    """
+
+    def __init__(self, channel):
+        """Constructor.
+
+        Args:
+            channel: A grpc.Channel.
+        """
+        self.SetTargets = channel.unary_unary(
+                '/busypy.BusyPyAdmin/SetTargets',
+                request_serializer=busypy__pb2.TargetChange.SerializeToString,
+                response_deserializer=busypy__pb2.AdminReply.FromString,
+                )
+        self.ClearTargets = channel.unary_unary(
+                '/busypy.BusyPyAdmin/ClearTargets',
+                request_serializer=busypy__pb2.TargetSelector.SerializeToString,
+                response_deserializer=busypy__pb2.AdminReply.FromString,
+                )
+        self.GetStatus = channel.unary_unary(
+                '/busypy.BusyPyAdmin/GetStatus',
+                request_serializer=busypy__pb2.StatusQuery.SerializeToString,
+                response_deserializer=busypy__pb2.ServerStatus.FromString,
+                )
+
+
+class BusyPyAdminServicer(object):
+    """live control of a running server, see busypy_admin.py and busypyctl.py
+    """
+
+    def SetTargets(self, request, context):
+        """set targets of all the clients, a group, or client ips/networks, only the fields that are set change
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def ClearTargets(self, request, context):
+        """drop the targets set for all the clients, a group, or client ips/networks
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def GetStatus(self, request, context):
+        """Missing associated documentation comment in .proto file."""
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+
+def add_BusyPyAdminServicer_to_server(servicer, server):
+    rpc_method_handlers = {
+            'SetTargets': grpc.unary_unary_rpc_method_handler(
+                    servicer.SetTargets,
+                    request_deserializer=busypy__pb2.TargetChange.FromString,
+                    response_serializer=busypy__pb2.AdminReply.SerializeToString,
+            ),
+            'ClearTargets': grpc.unary_unary_rpc_method_handler(
+                    servicer.ClearTargets,
+                    request_deserializer=busypy__pb2.TargetSelector.FromString,
+                    response_serializer=busypy__pb2.AdminReply.SerializeToString,
+            ),
+            'GetStatus': grpc.unary_unary_rpc_method_handler(
+                    servicer.GetStatus,
+                    request_deserializer=busypy__pb2.StatusQuery.FromString,
+                    response_serializer=busypy__pb2.ServerStatus.SerializeToString,
+            ),
+    }
+    generic_handler = grpc.method_handlers_generic_handler(
+            'busypy.BusyPyAdmin', rpc_method_handlers)
+    server.add_generic_rpc_handlers((generic_handler,))
+
+
+ # This class is part of an EXPERIMENTAL API.
+class BusyPyAdmin(object):
+    """live control of a running server, see busypy_admin.py and busypyctl.py
+    """
+
+    @staticmethod
+    def SetTargets(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(request, target, '/busypy.BusyPyAdmin/SetTargets',
+            busypy__pb2.TargetChange.SerializeToString,
+            busypy__pb2.AdminReply.FromString,
+            options, channel_credentials,
+            insecure, call_credentials, compression, wait_for_ready, timeout, metadata)
+
+    @staticmethod
+    def ClearTargets(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(request, target, '/busypy.BusyPyAdmin/ClearTargets',
+            busypy__pb2.TargetSelector.SerializeToString,
+            busypy__pb2.AdminReply.FromString,
+            options, channel_credentials,
+            insecure, call_credentials, compression, wait_for_ready, timeout, metadata)
+
+    @staticmethod
+    def GetStatus(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(request, target, '/busypy.BusyPyAdmin/GetStatus',
+            busypy__pb2.StatusQuery.SerializeToString,
+            busypy__pb2.ServerStatus.FromString,
+            options, channel_credentials,
+            insecure, call_credentials, compression, wait_for_ready, timeout, metadata)
@@ -0,0 +1,178 @@
+import json
+import math
+import random
+import busypy_pb2 as busypy_pb2
+
+# Time varying load profiles.
+# A profile is a list of segments, each one shapes the cpu (and optionally
+# memory) target for its duration.  Clients play the profile against their
+# own clock, so the server only has to send it once, and the load shape has
+# the resolution of the client's control loop rather than of server restarts.
+#
+# JSON format, see LoadProfile.from_dict(),
+#   {"start": 0, "loop": true, "segments": [
+#       {"shape": "step", "duration": 30, "cpu": 50},
+#       {"shape": "ramp", "duration": 60, "cpu": [10, 80], "mem": [5, 10]},
+#       {"shape": "sine", "duration": 120, "cpu": [20, 60], "period": 30},
+#       {"shape": "burst", "duration": 60, "cpu": [10, 90], "rate": 0.1, "length": 2, "seed": 1}]}
+#
+# - cpu/mem are a number, or a [from, to] pair: ramp from->to, sine low..high,
+#   burst base..peak, step uses from
+# - start is the wall clock (epoch) time the profile starts, 0 starts it when
+#   received, a common start aligns the whole fleet (with synchronized clocks)
+# - burst splits the segment into slots of 'length' seconds, each slot bursts
+#   with probability rate * length, the same seed gives the same bursts on every node
+
+SHAPES = {
+    "step": busypy_pb2.ProfileSegment.STEP,
+    "ramp": busypy_pb2.ProfileSegment.RAMP,
+    "sine": busypy_pb2.ProfileSegment.SINE,
+    "burst": busypy_pb2.ProfileSegment.BURST,
+}
+SHAPE_NAMES = {v: k for k, v in SHAPES.items()}
+
+BURST_LENGTH_SEC = 1.0
+SINE_PERIOD_SEC = 60.0
+
+
+def _range(value, name):
+    """ A number or [from, to] pair into a (from, to) tuple
+    """
+    if isinstance(value, (int, float)):
+        return float(value), float(value)
+    try:
+        lo, hi = value
+        return float(lo), float(hi)
+    except (TypeError, ValueError):
+        raise ValueError("profile '{}' must be a number or [from, to], got {!r}".format(name, value))
+
+
+class Segment(object):
+    """ One piece of a load profile
+    """
+
+    def __init__(self, shape, duration, cpu, mem=None, period=SINE_PERIOD_SEC,
+                 rate=0.0, length=BURST_LENGTH_SEC, seed=0):
+        if shape not in SHAPES:
+            raise ValueError("unknown profile shape '{}', choose from {}".format(shape, sorted(SHAPES)))
+        if duration <= 0:
+            raise ValueError("profile segment duration must be > 0")
+        self.shape = shape
+        self.duration = float(duration)
+        self.cpu = _range(cpu, "cpu")
+        self.mem = _range(mem, "mem") if mem is not None else None
+        self.period = float(period) if period > 0 else SINE_PERIOD_SEC
+        self.rate = float(rate)
+        self.length = float(length) if length > 0 else BURST_LENGTH_SEC
+        self.seed = int(seed)
+
+    def _value(self, lo_hi, tau):
+        lo, hi = lo_hi
+        if self.shape == "step":
+            return lo
+        if self.shape == "ramp":
+            return lo + (hi - lo) * min(1.0, tau / self.duration)
+        if self.shape == "sine":
+            return (lo + hi) / 2.0 + (hi - lo) / 2.0 * math.sin(2 * math.pi * tau / self.period)
+        # burst, deterministic per slot so it only depends on the clock
+        slot = int(tau / self.length)
+        bursting = random.Random(self.seed * 1000003 + slot).random() < self.rate * self.length
+        return hi if bursting else lo
+
+    def at(self, tau):
+        """ Targets tau seconds into the segment
+        :return: (cpu, mem), mem is None if the segment does not set it
+        """
+        cpu = self._value(self.cpu, tau)
+        mem = self._value(self.mem, tau) if self.mem is not None else None
+        return cpu, mem
+
+    def to_proto(self):
+        mem = self.mem or (0.0, 0.0)
+        return busypy_pb2.ProfileSegment(shape=SHAPES[self.shape], duration=self.duration,
+                                         cpuFrom=self.cpu[0], cpuTo=self.cpu[1],
+                                         hasMem=self.mem is not None, memFrom=mem[0], memTo=mem[1],
+                                         period=self.period, rate=self.rate, length=self.length, seed=self.seed)
+
+    @classmethod
+    def from_proto(cls, msg):
+        return cls(SHAPE_NAMES[msg.shape], msg.duration, (msg.cpuFrom, msg.cpuTo),
+                   mem=(msg.memFrom, msg.memTo) if msg.hasMem else None,
+                   period=msg.period, rate=msg.rate, length=msg.length, seed=msg.seed)
+
+
+class LoadProfile(object):
+    """ A list of segments played back to back from 'start', optionally looped
+    """
+
+    def __init__(self, segments, start=0.0, loop=False):
+        if not segments:
+            raise ValueError("profile has no segments")
+        self.segments = segments
+        self.start = float(start)
+        self.loop = loop
+        self.duration = sum(s.duration for s in segments)
+
+    def at(self, elapsed):
+        """ Targets 'elapsed' seconds after the start of the profile, before the
+        start the first segment holds, after the end (not looped) the last one does
+        :return: (cpu, mem), mem is None if the segment does not set it
+        """
+        if elapsed < 0:
+            return self.segments[0].at(0)
+        if self.loop:
+            elapsed %= self.duration
+        for segment in self.segments:
+            if elapsed < segment.duration:
+                return segment.at(elapsed)
+            elapsed -= segment.duration
+        last = self.segments[-1]
+        return last.at(last.duration)
+
+    @classmethod
+    def from_dict(cls, spec):
+        segments = []
+        for s in spec.get("segments", []):
+            s = dict(s)
+            try:
+                segments.append(Segment(s.pop("shape"), s.pop("duration"), s.pop("cpu"), **s))
+            except (KeyError, TypeError) as e:
+                raise ValueError("bad profile segment {!r}: {}".format(s, e))
+        return cls(segments, start=spec.get("start", 0.0), loop=spec.get("loop", False))
+
+    @classmethod
+    def load(cls, path):
+        """ Load a JSON profile file
+        """
+        with open(path, "r") as f:
+            return cls.from_dict(json.load(f))
+
+    def to_proto(self):
+        return busypy_pb2.LoadProfile(segments=[s.to_proto() for s in self.segments],
+                                      startTime=self.start, loop=self.loop)
+
+    @classmethod
+    def from_proto(cls, msg):
+        return cls([Segment.from_proto(s) for s in msg.segments], start=msg.startTime, loop=msg.loop)
+
+
+class ProfilePlayer(object):
+    """ Plays a LoadProfile against the local clock
+    """
+
+    def __init__(self, profile, now, scale=1.0):
+        """
+        :param profile: LoadProfile
+        :param now: wall clock time the profile was received, used if it has no start time
+        :param scale: cpu targets are multiplied by this, e.g. to split a node total per core
+        """
+        self.profile = profile
+        self.start = profile.start or now
+        self.scale = scale
+
+    def targets(self, now):
+        """ cpu/mem targets at wall clock time now
+        :return: (cpu, mem), mem is None if the profile does not set it
+        """
+        cpu, mem = self.profile.at(now - self.start)
+        return max(0.0, cpu * self.scale), (max(0.0, mem) if mem is not None else None)
@@ -0,0 +1,75 @@
+import math
+import random
+
+# Staggered rollouts.
+# When a server starts with new targets, every client would pick them up on
+# its next status, all within a couple of seconds, so the whole fleet grows
+# its memory and resets its controllers at once.  A RolloutPolicy admits the
+# clients gradually instead, either
+# - rate: N client nodes per second, a token bucket holding up to a second's worth
+# - waves: P percent of the fleet every interval seconds, by wave k, (k+1)*P
+#   percent of the fleet known at the time are admitted, so the waves keep up
+#   with clients that are still checking in
+# An admitted client gets its new targets after a random delay of up to
+# 'jitter' seconds, so a wave is spread out too.  Clients are admitted as they
+# report in, the server tracks who was admitted and updated in its registry.
+
+ROLLOUT_WAVE_SEC = 10
+
+
+class RolloutPolicy(object):
+    """ Decides when the next client may be admitted to the rollout
+    """
+
+    def __init__(self, rate=0, wave_percent=0, wave_interval=ROLLOUT_WAVE_SEC, jitter=0, start=0.0):
+        """
+        :param rate: client nodes per second, 0=use waves
+        :param wave_percent: percent of the fleet per wave
+        :param wave_interval: seconds between waves
+        :param jitter: admitted clients are updated after a random delay of up to this many seconds
+        :param start: time the rollout starts
+        """
+        if (rate > 0) == (wave_percent > 0):
+            raise ValueError("a rollout needs one of a rate or a wave percent")
+        if wave_percent > 100 or wave_interval <= 0 or jitter < 0:
+            raise ValueError("bad rollout wave percent/interval or jitter")
+        self.rate = rate
+        self.wave_percent = wave_percent
+        self.wave_interval = wave_interval
+        self.jitter = jitter
+        self._start = start
+        self._last = start
+        self._tokens = 1.0  # rate: start with one, not a second's worth at once
+        self._admitted = 0
+
+    def describe(self):
+        spread = ", jitter {}s".format(self.jitter) if self.jitter else ""
+        if self.rate:
+            return "{} clients/s{}".format(self.rate, spread)
+        return "{}% of the clients every {}s{}".format(self.wave_percent, self.wave_interval, spread)
+
+    def take(self, now, fleet):
+        """ Admit one client, if the policy allows one now
+        :param now: time
+        :param fleet: # of client nodes known, for waves
+        :return: True if admitted
+        """
+        if not self.rate:
+            wave = int(max(0.0, now - self._start) // self.wave_interval)
+            percent = (wave + 1) * self.wave_percent
+            # after the last wave everyone is admitted, also clients that join later
+            if percent < 100 and self._admitted >= math.ceil(fleet * percent / 100.0):
+                return False
+            self._admitted += 1
+            return True
+        self._tokens = min(max(1.0, self.rate), self._tokens + (now - self._last) * self.rate)
+        self._last = now
+        if self._tokens < 1.0:
+            return False
+        self._tokens -= 1.0
+        return True
+
+    def delay(self):
+        """ :return: seconds an admitted client waits for its update
+        """
+        return random.uniform(0, self.jitter) if self.jitter else 0.0
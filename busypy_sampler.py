@@ -0,0 +1,152 @@
+import os
+import time
+import threading
+import collections
+import psutil
+
+# Non blocking cpu usage sampling.
+# A UsageSampler thread reads /proc stat files at a fixed rate and keeps a
+# moving window of samples, so usage can be read at any time without the
+# blocking sleep of psutil cpu_percent(interval=...).
+# On hosts without /proc, psutil cpu_times() (also non blocking) is used.
+# cgroup limits and throttling are read by busypy_cgroup, see read_cgroup_stat().
+
+SAMPLE_HZ = 20
+WINDOW_SEC = 1.0
+
+PROC = "/proc"
+
+_CLK_TCK = os.sysconf("SC_CLK_TCK") if hasattr(os, "sysconf") else 100
+
+Sample = collections.namedtuple("Sample", ["t", "proc_cpu", "node_busy", "node_total"])
+
+
+def _read_first_line(path):
+    try:
+        with open(path, "r") as f:
+            return f.readline()
+    except (IOError, OSError):
+        return None
+
+
+def read_proc_cpu(pid):
+    """ user + system cpu seconds of a process from /proc/<pid>/stat
+    """
+    line = _read_first_line("{}/{}/stat".format(PROC, pid))
+    if line is None:
+        return None
+    # the process name (field 2) may contain spaces, so split after the last ')'
+    fields = line[line.rfind(")") + 2:].split()
+    utime, stime = int(fields[11]), int(fields[12])
+    return float(utime + stime) / _CLK_TCK
+
+
+def read_node_cpu():
+    """ (busy, total) cpu seconds of the node from /proc/stat
+    """
+    line = _read_first_line("{}/stat".format(PROC))
+    if line is None or not line.startswith("cpu "):
+        return None, None
+    ticks = [int(v) for v in line.split()[1:]]
+    total = sum(ticks[:8])  # user nice system idle iowait irq softirq steal, guest is in user
+    idle = ticks[3] + (ticks[4] if len(ticks) > 4 else 0)
+    return float(total - idle) / _CLK_TCK, float(total) / _CLK_TCK
+
+
+def read_cgroup_stat(cgroup, name):
+    """ Read a 'key value' per line cgroup stat file into a dict, e.g. cpu.stat
+    """
+    stats = {}
+    try:
+        with open(os.path.join(cgroup, name), "r") as f:
+            for line in f:
+                key, value = line.split()
+                stats[key] = int(value)
+    except (IOError, OSError, ValueError):
+        pass
+    return stats
+
+
+class UsageSampler(object):
+    """ Samples process and node cpu usage at 'hz' on a background
+    thread and keeps 'window' seconds of samples.  All the getters are non
+    blocking and return the average over the window.
+    """
+
+    def __init__(self, pid=None, hz=SAMPLE_HZ, window=WINDOW_SEC):
+        self.pid = pid or os.getpid()
+        self.interval = 1.0 / hz
+        self.window = window
+        self._samples = collections.deque(maxlen=max(2, int(round(window * hz)) + 1))
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._proc = psutil.Process(self.pid)
+        self._use_proc = os.path.exists("{}/{}/stat".format(PROC, self.pid))
+
+    def _proc_cpu(self):
+        if self._use_proc:
+            return read_proc_cpu(self.pid)
+        t = self._proc.cpu_times()
+        return t.user + t.system
+
+    def sample(self):
+        """ Take one sample now, normally called by the sampler thread.
+        A failed read is not a sample, the window keeps the good ones.
+        :return: True if a sample was taken
+        """
+        proc_cpu = self._proc_cpu()
+        if proc_cpu is None:
+            return False
+        if self._use_proc:
+            node_busy, node_total = read_node_cpu()
+        else:
+            node_busy, node_total = None, None
+        s = Sample(time.perf_counter(), proc_cpu, node_busy, node_total)
+        with self._lock:
+            self._samples.append(s)
+        return True
+
+    def _run(self):
+        next_sample = time.perf_counter()
+        while not self._stop.is_set():
+            try:
+                self.sample()
+            except (psutil.Error, IOError, OSError):
+                pass  # process gone or /proc unreadable, keep the old samples
+            next_sample += self.interval
+            self._stop.wait(max(0, next_sample - time.perf_counter()))
+
+    def start(self):
+        self.sample()
+        self._thread = threading.Thread(target=self._run, name="UsageSampler")
+        self._thread.daemon = True
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def _ends(self):
+        with self._lock:
+            if len(self._samples) < 2:
+                return None, None
+            return self._samples[0], self._samples[-1]
+
+    def cpu_percent(self):
+        """ Process cpu usage over the window, 100% == one core
+        """
+        first, last = self._ends()
+        if first is None or last.t <= first.t:
+            return 0.0
+        return 100.0 * (last.proc_cpu - first.proc_cpu) / (last.t - first.t)
+
+    def node_cpu_percent(self):
+        """ Node cpu usage over the window, 100% == all cores busy, None if unknown
+        """
+        first, last = self._ends()
+        if first is None or None in (first.node_total, last.node_total) or last.node_total <= first.node_total:
+            return None
+        return 100.0 * (last.node_busy - first.node_busy) / (last.node_total - first.node_total)
@@ -0,0 +1,126 @@
+import os
+import math
+import time
+import zlib
+import struct
+
+# Server state snapshot.
+# busypyserver is restarted often, with new targets each time, and would then
+# wait for every client to check in again before it acts.  A snapshot of the
+# client registry, every client ip:pid with its last seen time and its last
+# cpu/memory, and the group of every client ip, is saved to a compact file
+# at intervals and on exit, and loaded on start, so the server knows its
+# fleet right away.  Entries not seen for too long are pruned on load.
+# The last seen times are kept, the registry restores them moved on by the
+# time the server was down (clients can not check in to a stopped server),
+# so a restored client has the rest of its ttl to check in, and the oldest
+# are still evicted first, see busypyserver.clientIPs.restore().
+#
+# File: MAGIC, uint16 version, float64 time saved, uint32 number of client
+# ips, then zlib compressed, per ip a uint8 length + utf-8 ip, a uint8
+# length + utf-8 group ("" for none, not in version 1) and a uint16 number
+# of pids, per pid a uint8 length + utf-8 pid, float64 last seen, float32
+# cpu, float32 memory (NaN if not known), all little endian.
+
+MAGIC = b"BPYSNAP\0"
+VERSION = 2
+VERSIONS = (1, 2)   # versions that can be loaded
+SNAPSHOT_INTERVAL_SEC = 60
+SNAPSHOT_MAX_AGE_SEC = 600
+
+_HEADER = struct.Struct("<8sHdI")
+_STRING = struct.Struct("<B")
+_PIDS = struct.Struct("<H")
+_ENTRY = struct.Struct("<dff")
+
+
+def _pack_string(value):
+    data = value.encode("utf-8")[:255]
+    return _STRING.pack(len(data)) + data
+
+
+def save_snapshot(path, clients, groups=None, now=None):
+    """ Save client entries, written to a temporary file first, so a reader never sees half a file
+    :param clients: {ip: [(pid, last seen, cpu, mem)]}, cpu/mem None if not known
+    :param groups: {ip: group} of the client ips that have one
+    :return: bytes written
+    """
+    nan = float("nan")
+    groups = groups or {}
+    parts = []
+    for ip, entries in clients.items():
+        entries = entries[:0xffff]
+        parts.append(_pack_string(ip) + _pack_string(groups.get(ip, "")) + _PIDS.pack(len(entries)))
+        for pid, last_seen, cpu, mem in entries:
+            parts.append(_pack_string(str(pid)) + _ENTRY.pack(last_seen, nan if cpu is None else cpu,
+                                                              nan if mem is None else mem))
+    data = _HEADER.pack(MAGIC, VERSION, now or time.time(), len(clients)) + zlib.compress(b"".join(parts))
+
+    directory = os.path.dirname(path)
+    if directory and not os.path.isdir(directory):
+        os.makedirs(directory)
+    tmp = "{}.{}.tmp".format(path, os.getpid())
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+    return len(data)
+
+
+def _unpack_string(body, pos):
+    """ :return: (string, position after it)
+    """
+    (length,) = _STRING.unpack_from(body, pos)
+    end = pos + 1 + length
+    if end > len(body):
+        raise struct.error("string past the end")
+    return body[pos + 1:end].decode("utf-8"), end
+
+
+def load_snapshot(path, max_age=SNAPSHOT_MAX_AGE_SEC, now=None):
+    """ Load client entries, without the ones not seen for max_age seconds
+    :param max_age: seconds, 0=keep all
+    :return: (time saved, {ip: [(pid, last seen, cpu, mem)]}, {ip: group}, # of entries pruned), None if there is no file
+    :raises ValueError: not a snapshot, or a damaged one
+    """
+    try:
+        with open(path, "rb") as f:
+            data = f.read()
+    except (IOError, OSError):
+        return None
+    if len(data) < _HEADER.size:
+        raise ValueError("{} is not a busypy snapshot".format(path))
+    magic, version, saved, count = _HEADER.unpack_from(data)
+    if magic != MAGIC or version not in VERSIONS:
+        raise ValueError("{} is not a busypy snapshot version {}".format(path, VERSION))
+    try:
+        body = zlib.decompress(data[_HEADER.size:])
+    except zlib.error as e:
+        raise ValueError("{} is damaged: {}".format(path, e))
+
+    deadline = (now or time.time()) - max_age if max_age else None
+    clients = {}
+    groups = {}
+    pruned = 0
+    pos = 0
+    try:
+        for _ in range(count):
+            ip, pos = _unpack_string(body, pos)
+            group, pos = _unpack_string(body, pos) if version > 1 else ("", pos)
+            (pids,) = _PIDS.unpack_from(body, pos)
+            pos += _PIDS.size
+            entries = []
+            for _ in range(pids):
+                pid, pos = _unpack_string(body, pos)
+                last_seen, cpu, mem = _ENTRY.unpack_from(body, pos)
+                pos += _ENTRY.size
+                if deadline is not None and last_seen < deadline:
+                    pruned += 1
+                    continue
+                entries.append((pid, last_seen, None if math.isnan(cpu) else cpu, None if math.isnan(mem) else mem))
+            if entries:
+                clients[ip] = entries
+                if group:
+                    groups[ip] = group
+    except (struct.error, UnicodeDecodeError) as e:
+        raise ValueError("{} is damaged: {}".format(path, e))
+    return saved, clients, groups, pruned
@@ -0,0 +1,254 @@
+import sys
+import time
+import random
+import asyncio
+import argparse
+import ipaddress
+from array import array
+import grpc
+import busypy_pb2 as busypy_pb2
+import busypy_pb2_grpc as busypy_pb2_grpc
+from busypy import gRPCClient, REPORT_INTERVAL_SEC
+
+# Virtual client swarm, a load generator for busypyserver.
+# Thousands of virtual clients run as asyncio tasks in one process.  Each one
+# has its own ip (counting up from --ip-base) and pids, and calls GetSettings
+# every --interval seconds, +/- --jitter, with the busypy client's timeout, like
+# a real node, reporting that it hit the targets it was last sent.  Clients
+# share --channels channels, a real node has its own.
+#
+# Clients are started at --ramp per second, a burst of thousands of first calls
+# at once makes the swarm (not the server) fail them with CANCELLED/INTERNAL.
+#
+# Every --report seconds the RPC rate, errors and latency percentiles are
+# printed, and at the end the totals and the rollout times:
+# - first/all update: when clients first got update=True, e.g. for --client-ip
+#   only that client gets it
+# - server exit: when the server stopped answering, a --wait-for or
+#   --client-ip server exits once its rollout is done
+# Times are seconds after the last client was started, the server waits
+# gRPCServer.CLIENT_POLLING_TIME after the last new client before a rollout.
+# With --groups N the clients are spread over groups g0..gN-1, like busypy
+# --group, to try out targets set per group with busypyctl.
+
+SWARM_CLIENTS = 1000
+SWARM_RAMP_PER_SEC = 200
+SWARM_CHANNELS = 8
+SWARM_IP_BASE = "10.0.0.1"
+SWARM_REPORT_SEC = 5
+SWARM_JITTER = 0.1          # +/- fraction of the interval
+PERCENTILES = (50, 95, 99)
+
+
+def percentiles(values, ps=PERCENTILES):
+    """ Latency percentiles in ms, zeros if there are no values
+    """
+    n = len(values)
+    if not n:
+        return [0.0 for _ in ps]
+    ordered = sorted(values)
+    return [1000.0 * ordered[min(n - 1, int(n * p / 100.0))] for p in ps]
+
+
+class Swarm(object):
+    """ The virtual clients, and what they measured
+    """
+
+    def __init__(self, server, clients=SWARM_CLIENTS, workers=1, interval=REPORT_INTERVAL_SEC, jitter=SWARM_JITTER,
+                 ramp=SWARM_RAMP_PER_SEC, channels=SWARM_CHANNELS, ip_base=SWARM_IP_BASE,
+                 timeout=gRPCClient.GRPC_TIMEOUT, groups=0):
+        self.server = server
+        self.clients = clients
+        self.workers = workers
+        self.interval = interval
+        self.jitter = jitter
+        self.ramp = ramp
+        self.timeout = timeout
+        self.groups = groups
+        self.ip_base = ipaddress.ip_address(ip_base)
+        self._channels = [grpc.aio.insecure_channel(server, options=gRPCClient.CHANNEL_OPTIONS) for _ in range(channels)]
+        self._stubs = [busypy_pb2_grpc.BusyPyServiceStub(c) for c in self._channels]
+        self._stop = asyncio.Event()
+
+        self.started = 0
+        self.ramped = None          # time the last client was started
+        self.calls = 0
+        self.errors = {}            # status code name -> count
+        self.latency = array('d')   # seconds, of every successful call
+        self.updated = {}           # ip -> time it first got update=True
+        self.answered = False       # the server answered at least once
+        self.server_exit = None     # time the server stopped answering, after it had answered
+        self._interval_latency = []
+        self._interval_calls = 0
+        self._interval_errors = 0
+
+    def ip(self, n):
+        return str(self.ip_base + n)
+
+    def _error(self, e):
+        code = e.code().name if isinstance(e, grpc.RpcError) and e.code() is not None else type(e).__name__
+        self.errors[code] = self.errors.get(code, 0) + 1
+        self._interval_errors += 1
+        if code == "UNAVAILABLE" and self.answered and self.server_exit is None:
+            self.server_exit = time.time()
+
+    async def _client(self, n):
+        """ One virtual client, calls GetSettings every interval until stopped
+        """
+        ip = self.ip(n)
+        stub = self._stubs[n % len(self._stubs)]
+        metadata = (('ip', ip), ('pid', str(1000 + n * self.workers)))
+        if self.groups:
+            metadata += (('group', "g{}".format(n % self.groups)),)
+        pids = [1000 + n * self.workers + w for w in range(self.workers)]
+        cpu = mem = 0
+        while not self._stop.is_set():
+            status = busypy_pb2.BusyPySettings(cpuLoadPercent=cpu, memoryPercent=mem,
+                                               workers=[busypy_pb2.WorkerStatus(pid=pid, cpuLoadPercent=cpu)
+                                                        for pid in pids])
+            start = time.perf_counter()
+            try:
+                reply = await stub.GetSettings(status, metadata=metadata, timeout=self.timeout)
+            except (grpc.RpcError, asyncio.TimeoutError) as e:
+                self._error(e)
+            else:
+                latency = time.perf_counter() - start
+                self.answered = True
+                self.latency.append(latency)
+                self._interval_latency.append(latency)
+                if reply.update:
+                    # a real node hits the targets it is sent
+                    cpu, mem = reply.cpuLoadPercent, reply.memoryPercent
+                    if ip not in self.updated:
+                        self.updated[ip] = time.time()
+            self.calls += 1
+            self._interval_calls += 1
+
+            delay = self.interval * (1 + random.uniform(-self.jitter, self.jitter))
+            try:
+                await asyncio.wait_for(self._stop.wait(), delay)
+            except asyncio.TimeoutError:
+                pass
+
+    def report(self, elapsed):
+        p50, p95, p99 = percentiles(self._interval_latency)
+        rate = self._interval_calls / elapsed if elapsed else 0.0
+        print("{:6d} clients, {:8.1f} calls/s, {:5d} errors, latency p50/p95/p99: {:.1f}/{:.1f}/{:.1f} ms, "
+              "{} updated".format(self.started, rate, self._interval_errors, p50, p95, p99, len(self.updated)))
+        self._interval_latency = []
+        self._interval_calls = 0
+        self._interval_errors = 0
+
+    async def run(self, duration, report=SWARM_REPORT_SEC, until_exit=False):
+        """ Ramp up the clients, run for duration seconds, or until the server exits
+        """
+        tasks = []
+        start = time.time()
+        last_report = start
+        next_start = time.perf_counter()
+        while not self._stop.is_set():
+            now = time.time()
+            if self.started < self.clients:
+                # start the clients that are due, at the ramp rate
+                while self.started < self.clients and time.perf_counter() >= next_start:
+                    tasks.append(asyncio.ensure_future(self._client(self.started)))
+                    self.started += 1
+                    next_start += 1.0 / self.ramp
+                if self.started == self.clients:
+                    self.ramped = time.time()
+                    print("{} clients started in {:.1f}s".format(self.clients, self.ramped - start))
+            if now - last_report >= report:
+                self.report(now - last_report)
+                last_report = now
+            if duration and now - start >= duration:
+                break
+            if until_exit and self.server_exit is not None:
+                print("Server exited")
+                break
+            await asyncio.sleep(min(0.1, 1.0 / self.ramp))
+
+        self._stop.set()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        for channel in self._channels:
+            await channel.close()
+
+    def summary(self):
+        """ Totals and rollout times, as a dict
+        """
+        p50, p95, p99 = percentiles(self.latency)
+        since = self.ramped or time.time()
+        updates = sorted(self.updated.values())
+        return {
+            "clients": self.started,
+            "calls": self.calls,
+            "ok": len(self.latency),
+            "errors": dict(self.errors),
+            "latency_p50_ms": round(p50, 3),
+            "latency_p95_ms": round(p95, 3),
+            "latency_p99_ms": round(p99, 3),
+            "latency_max_ms": round(1000.0 * max(self.latency), 3) if self.latency else 0.0,
+            "updated": len(updates),
+            "first_update_s": round(updates[0] - since, 3) if updates else None,
+            "all_updated_s": round(updates[-1] - since, 3) if len(updates) == self.started else None,
+            "server_exit_s": round(self.server_exit - since, 3) if self.server_exit else None,
+        }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='BusyPy virtual client swarm, load tests busypyserver')
+
+    parser.add_argument('--server', dest="server", action='store', default="localhost",
+                        help='busypyserver host, default=localhost.')
+    parser.add_argument('--port', dest="port", action='store', default="50051",
+                        help='busypyserver port, default=50051.')
+    parser.add_argument('--clients', dest="clients", action='store', type=int, default=SWARM_CLIENTS,
+                        help='Number of virtual client nodes, default={}.'.format(SWARM_CLIENTS))
+    parser.add_argument('--workers', dest="workers", action='store', type=int, default=1,
+                        help='Busy loop processes (pids) per client, default=1.')
+    parser.add_argument('--interval', dest="interval", action='store', type=float, default=REPORT_INTERVAL_SEC,
+                        help='Seconds between GetSettings calls of a client, default={}.'.format(REPORT_INTERVAL_SEC))
+    parser.add_argument('--jitter', dest="jitter", action='store', type=float, default=SWARM_JITTER,
+                        help='+/- fraction of the interval, default={}.'.format(SWARM_JITTER))
+    parser.add_argument('--ramp', dest="ramp", action='store', type=float, default=SWARM_RAMP_PER_SEC,
+                        help='Clients started per second, default={}.'.format(SWARM_RAMP_PER_SEC))
+    parser.add_argument('--channels', dest="channels", action='store', type=int, default=SWARM_CHANNELS,
+                        help='gRPC channels shared by the clients, default={}.'.format(SWARM_CHANNELS))
+    parser.add_argument('--ip-base', dest="ip_base", action='store', default=SWARM_IP_BASE,
+                        help='ip of the first client, the others count up from it, default={}.'.format(SWARM_IP_BASE))
+    parser.add_argument('--timeout', dest="timeout", action='store', type=float, default=gRPCClient.GRPC_TIMEOUT,
+                        help='GetSettings timeout, default={} like the client.'.format(gRPCClient.GRPC_TIMEOUT))
+    parser.add_argument('--duration', dest="duration", action='store', type=float, default=60,
+                        help='Seconds to run, 0=until stopped, default=60.')
+    parser.add_argument('--until-exit', dest="until_exit", action='store_true', default=False,
+                        help='Stop when the server exits, e.g. a --wait-for or --client-ip server.')
+    parser.add_argument('--groups', dest="groups", action='store', type=int, default=0,
+                        help='Spread the clients over this many groups, g0, g1, ..., 0=no groups, default=0.')
+    parser.add_argument('--report', dest="report", action='store', type=float, default=SWARM_REPORT_SEC,
+                        help='Seconds between progress lines, default={}.'.format(SWARM_REPORT_SEC))
+
+    args = parser.parse_args()
+
+    if args.clients < 1 or args.ramp <= 0 or args.channels < 1 or args.interval <= 0:
+        print("--clients, --ramp, --channels and --interval must be > 0")
+        sys.exit(1)
+
+    async def main():
+        swarm = Swarm("{}:{}".format(args.server, args.port), clients=args.clients, workers=args.workers,
+                      interval=args.interval, jitter=args.jitter, ramp=args.ramp, channels=args.channels,
+                      ip_base=args.ip_base, timeout=args.timeout, groups=max(0, args.groups))
+        print("{} clients {}..{} to {}, every {}s".format(args.clients, swarm.ip(0), swarm.ip(args.clients - 1),
+                                                        swarm.server, args.interval))
+        await swarm.run(args.duration, args.report, args.until_exit)
+        return swarm.summary()
+
+    try:
+        summary = asyncio.run(main())
+    except KeyboardInterrupt:
+        sys.exit(1)
+
+    print("Calls: {calls}, ok: {ok}, errors: {errors}".format(**summary))
+    print("Latency p50/p95/p99/max: {latency_p50_ms}/{latency_p95_ms}/{latency_p99_ms}/{latency_max_ms} ms".format(**summary))
+    seconds = {k: "-" if summary[k] is None else "{}s".format(summary[k])
+               for k in ("first_update_s", "all_updated_s", "server_exit_s")}
+    print("Rollout, after the last client started: first update {first_update_s}, all updated {all_updated_s}, "
+          "server exit {server_exit_s}, {updated} of {clients} updated".format(**dict(summary, **seconds)))
@@ -0,0 +1,189 @@
+# Fleet telemetry.
+# The server keeps the last TELEMETRY_SAMPLES cpu/memory samples of every
+# client process (ip:pid) in a TelemetryStore, fixed memory per client.  All
+# the clients share a few 2-D numpy arrays, one row per client, with a ring
+# position per row, so a query over the whole fleet is a handful of numpy
+# reductions, rather than a Python loop over tens of thousands of clients.
+# Rows of clients that are gone are reused, the arrays grow (doubling) only
+# when all rows are in use.
+#
+# Memory is reported per node, so it is kept in every row of the node, and the
+# memory distribution is over the processes, like cpu.
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+TELEMETRY_SAMPLES = 60      # samples kept per client, at the client report interval of 2s this is 2 minutes
+TELEMETRY_RECENT = 5        # recent samples per client averaged for the deviation from target
+LAG_PERCENT = 5.0           # |recent average - target| that makes a client lagging
+MAX_LAGGING = 10            # lagging clients returned by a query, worst first
+INITIAL_ROWS = 1024
+
+
+class TelemetryStore(object):
+    """ Ring buffers of recent cpu/memory samples, one row per client ip:pid
+    """
+
+    def __init__(self, samples=TELEMETRY_SAMPLES, rows=INITIAL_ROWS):
+        if numpy is None:
+            raise RuntimeError("fleet telemetry requires numpy, pip3 install numpy")
+        if samples < 1:
+            raise ValueError("telemetry needs at least one sample per client")
+        self.samples = samples
+        self._rows = {}     # (ip, pid) -> row
+        self._keys = []     # row -> (ip, pid), None if free
+        self._free = []     # free rows
+        self._ips = {}      # ip -> # of rows
+        self._allocate(rows)
+
+    def _allocate(self, rows):
+        self._cpu = numpy.full((rows, self.samples), numpy.nan, dtype=numpy.float32)
+        self._mem = numpy.full((rows, self.samples), numpy.nan, dtype=numpy.float32)
+        self._cpu_target = numpy.full(rows, numpy.nan, dtype=numpy.float32)
+        self._mem_target = numpy.full(rows, numpy.nan, dtype=numpy.float32)
+        self._pos = numpy.zeros(rows, dtype=numpy.int32)       # next write position in the ring
+        self._used = numpy.zeros(rows, dtype=bool)
+        self._keys = [None] * rows
+        self._free = list(range(rows - 1, -1, -1))
+
+    def _grow(self):
+        old = len(self._keys)
+        cpu, mem, cpu_target, mem_target = self._cpu, self._mem, self._cpu_target, self._mem_target
+        pos, used, keys = self._pos, self._used, self._keys
+        self._allocate(old * 2)
+        self._cpu[:old], self._mem[:old] = cpu, mem
+        self._cpu_target[:old], self._mem_target[:old] = cpu_target, mem_target
+        self._pos[:old], self._used[:old] = pos, used
+        self._keys[:old] = keys
+        self._free = list(range(old * 2 - 1, old - 1, -1))
+
+    def __len__(self):
+        return len(self._rows)
+
+    def _row(self, ip, pid):
+        row = self._rows.get((ip, pid))
+        if row is None:
+            if not self._free:
+                self._grow()
+            row = self._free.pop()
+            self._rows[(ip, pid)] = row
+            self._keys[row] = (ip, pid)
+            self._used[row] = True
+            self._ips[ip] = self._ips.get(ip, 0) + 1
+        return row
+
+    def record(self, ip, pid, cpu, mem, cpu_target=None, mem_target=None):
+        """ Add a sample of a client
+        :param cpu: reported cpu percent of the process
+        :param mem: reported memory percent of the node
+        :param cpu_target: target the client was sent, None keeps the last one, NaN if not known
+        :param mem_target: like cpu_target
+        """
+        row = self._row(ip, pid)
+        pos = self._pos[row]
+        self._cpu[row, pos] = cpu
+        self._mem[row, pos] = mem
+        self._pos[row] = (pos + 1) % self.samples
+        if cpu_target is not None:
+            self._cpu_target[row] = cpu_target
+        if mem_target is not None:
+            self._mem_target[row] = mem_target
+
+    def remove(self, ip, pid):
+        row = self._rows.pop((ip, pid), None)
+        if row is None:
+            return False
+        self._cpu[row] = numpy.nan
+        self._mem[row] = numpy.nan
+        self._cpu_target[row] = numpy.nan
+        self._mem_target[row] = numpy.nan
+        self._pos[row] = 0
+        self._used[row] = False
+        self._keys[row] = None
+        self._free.append(row)
+        if self._ips[ip] > 1:
+            self._ips[ip] -= 1
+        else:
+            del self._ips[ip]
+        return True
+
+    def _recent(self, values, rows, count):
+        """ The last 'count' samples of rows, newest first, shape (rows, count)
+        """
+        columns = (self._pos[rows, None] - 1 - numpy.arange(count)[None, :]) % self.samples
+        return values[rows[:, None], columns]
+
+    @staticmethod
+    def _mean(values):
+        """ Row means ignoring NaN, NaN for rows without samples, without the all-NaN warnings
+        """
+        valid = ~numpy.isnan(values)
+        count = valid.sum(axis=1)
+        with numpy.errstate(invalid="ignore", divide="ignore"):
+            return numpy.where(count > 0, numpy.where(valid, values, 0).sum(axis=1) / count, numpy.nan)
+
+    @staticmethod
+    def _distribution(values):
+        values = values[~numpy.isnan(values)]
+        if not len(values):
+            return {"p50": 0.0, "p95": 0.0, "max": 0.0, "mean": 0.0}
+        p50, p95 = numpy.percentile(values, (50, 95))
+        return {"p50": float(p50), "p95": float(p95), "max": float(values.max()), "mean": float(values.mean())}
+
+    @staticmethod
+    def _abs_mean(values):
+        values = numpy.abs(values[~numpy.isnan(values)])
+        return float(values.mean()) if len(values) else 0.0
+
+    def query(self, recent=TELEMETRY_RECENT, lag_percent=LAG_PERCENT, max_lagging=MAX_LAGGING):
+        """ Fleet statistics
+        - cpu/mem: distribution of the latest sample of every client
+        - cpu/mem_deviation: mean |average of the recent samples - target| of the clients with a target
+        - lagging: the clients whose recent average is more than lag_percent off their target, worst first
+        :return: dict
+        """
+        rows = numpy.flatnonzero(self._used)
+        recent = max(1, min(recent, self.samples))
+        stats = {"processes": int(len(rows)), "clients": len(self._ips),
+                 "samples": self.samples, "lagging_total": 0, "lagging": []}
+        if not len(rows):
+            stats.update(cpu=self._distribution(numpy.empty(0)), mem=self._distribution(numpy.empty(0)),
+                         cpu_deviation=0.0, mem_deviation=0.0)
+            return stats
+
+        recent_cpu = self._recent(self._cpu, rows, recent)
+        recent_mem = self._recent(self._mem, rows, recent)
+        cpu_dev = self._mean(recent_cpu) - self._cpu_target[rows]
+        mem_dev = self._mean(recent_mem) - self._mem_target[rows]
+        stats["cpu"] = self._distribution(recent_cpu[:, 0])
+        stats["mem"] = self._distribution(recent_mem[:, 0])
+        stats["cpu_deviation"] = self._abs_mean(cpu_dev)
+        stats["mem_deviation"] = self._abs_mean(mem_dev)
+
+        worst = numpy.fmax(numpy.abs(cpu_dev), numpy.abs(mem_dev))  # NaN only if both are
+        lagging = numpy.flatnonzero(worst > lag_percent)
+        stats["lagging_total"] = int(len(lagging))
+        for i in lagging[numpy.argsort(-worst[lagging], kind="stable")][:max_lagging]:
+            row = rows[i]
+            ip, pid = self._keys[row]
+            stats["lagging"].append({"ip": ip, "pid": pid,
+                                     "cpu": float(recent_cpu[i, 0]), "cpu_target": float(self._cpu_target[row]),
+                                     "mem": float(recent_mem[i, 0]), "mem_target": float(self._mem_target[row])})
+        return stats
+
+
+def format_stats(stats):
+    """ Fleet statistics as console lines
+    """
+    lines = ["Fleet: {} clients, {} processes, cpu p50/p95/max: {:.0f}/{:.0f}/{:.0f}%, "
+             "mem p50/p95/max: {:.0f}/{:.0f}/{:.0f}%".format(stats["clients"], stats["processes"],
+                                                           stats["cpu"]["p50"], stats["cpu"]["p95"], stats["cpu"]["max"],
+                                                           stats["mem"]["p50"], stats["mem"]["p95"], stats["mem"]["max"]),
+             "Fleet: deviation from target cpu {:.1f}%, mem {:.1f}%, {} lagging".format(
+                 stats["cpu_deviation"], stats["mem_deviation"], stats["lagging_total"])]
+    for c in stats["lagging"]:
+        lines.append("  lagging {}:{} cpu {:.0f}% (target {:.0f}%), mem {:.0f}% (target {:.0f}%)".format(
+            c["ip"], c["pid"], c["cpu"], c["cpu_target"], c["mem"], c["mem_target"]))
+    return lines
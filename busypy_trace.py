@@ -0,0 +1,254 @@
+import os
+import csv
+import sys
+import math
+import time
+import struct
+import argparse
+import threading
+from datetime import datetime
+
+# Recorded utilization trace replay.
+# A trace is a time column plus value columns (cpu/mem percent), one row per
+# sample, as CSV or as a compact binary file.  Traces are streamed a row at a
+# time, so they can be much larger than memory.  A TracePlayer thread plays
+# the rows back at their recorded times, optionally compressed by a speed
+# factor, and hands the selected columns to a callback that sets the targets.
+#
+# CSV: a header row, the time column is the first column named one of
+# TIME_COLUMNS, else the first column.  Times are seconds (epoch or relative)
+# or ISO 8601 timestamps, values may have a '%' suffix (docker stats), empty
+# values hold the previous value.
+#
+# Binary: MAGIC, uint16 version, uint16 number of columns, then per column a
+# uint16 length + utf-8 name, then records of float64 time + float32 per
+# column, all little endian.  Empty CSV values are stored as NaN.
+# Convert a CSV with: python3 busypy_trace.py trace.csv trace.bpt
+#
+# TracePlayer.validate() reads the whole trace once before it is played, so a
+# bad row is reported at start rather than half way through the replay.
+
+MAGIC = b"BPYTRACE"
+VERSION = 1
+TIME_COLUMNS = ("time", "t", "timestamp", "ts")
+READ_RECORDS = 4096     # binary records read per block
+
+_HEADER = struct.Struct("<HH")
+_NAME_LEN = struct.Struct("<H")
+
+
+def _parse_time(value):
+    try:
+        return float(value)
+    except ValueError:
+        return datetime.fromisoformat(value.strip().replace("Z", "+00:00")).timestamp()
+
+
+def _parse_value(value):
+    value = value.strip().rstrip("%")
+    return float(value) if value else float("nan")
+
+
+class CSVTrace(object):
+    """ A CSV trace, read one row at a time
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, "r", newline="") as f:
+            header = [c.strip() for c in next(csv.reader(f), [])]
+        if len(header) < 2:
+            raise ValueError("trace {} needs a header with a time column and value columns".format(path))
+        lower = [c.lower() for c in header]
+        self._time_index = next((lower.index(c) for c in TIME_COLUMNS if c in lower), 0)
+        self._value_index = [i for i in range(len(header)) if i != self._time_index]
+        self.columns = [header[i] for i in self._value_index]
+
+    def rows(self):
+        """ Generator of (time, [value per column]), values are NaN where empty
+        """
+        with open(self.path, "r", newline="") as f:
+            reader = csv.reader(f)
+            next(reader, None)  # header
+            for line_num, row in enumerate(reader, 2):
+                if not row:
+                    continue
+                try:
+                    if self._time_index >= len(row):
+                        raise ValueError("no time value")
+                    t = _parse_time(row[self._time_index])
+                    values = [_parse_value(row[i]) if i < len(row) else float("nan") for i in self._value_index]
+                except ValueError as e:
+                    raise ValueError("trace {} line {}: {}".format(self.path, line_num, e))
+                yield t, values
+
+
+class BinaryTrace(object):
+    """ A binary trace, see MAGIC, read a block of records at a time
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            self.columns = self._read_header(f)
+            self._data_offset = f.tell()
+        self._record = struct.Struct("<d{}f".format(len(self.columns)))
+
+    def _read_header(self, f):
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError("{} is not a busypy binary trace".format(self.path))
+        version, count = _HEADER.unpack(f.read(_HEADER.size))
+        if version != VERSION:
+            raise ValueError("{} is trace version {}, expected {}".format(self.path, version, VERSION))
+        columns = []
+        for _ in range(count):
+            length, = _NAME_LEN.unpack(f.read(_NAME_LEN.size))
+            columns.append(f.read(length).decode("utf-8"))
+        return columns
+
+    def rows(self):
+        """ Generator of (time, [value per column]), values are NaN where empty
+        """
+        size = self._record.size
+        with open(self.path, "rb") as f:
+            f.seek(self._data_offset)
+            while True:
+                block = f.read(size * READ_RECORDS)
+                whole = len(block) - len(block) % size
+                for record in self._record.iter_unpack(block[:whole]):
+                    yield record[0], list(record[1:])
+                if len(block) < size * READ_RECORDS:
+                    return
+
+
+def open_trace(path):
+    """ Open a CSV or binary trace, binary traces are recognized by MAGIC
+    """
+    with open(path, "rb") as f:
+        binary = f.read(len(MAGIC)) == MAGIC
+    return BinaryTrace(path) if binary else CSVTrace(path)
+
+
+def convert(csv_path, out_path):
+    """ Convert a CSV trace to the binary format
+    :return: number of records written
+    """
+    trace = CSVTrace(csv_path)
+    record = struct.Struct("<d{}f".format(len(trace.columns)))
+    count = 0
+    with open(out_path, "wb") as f:
+        f.write(MAGIC)
+        f.write(_HEADER.pack(VERSION, len(trace.columns)))
+        for name in trace.columns:
+            encoded = name.encode("utf-8")
+            f.write(_NAME_LEN.pack(len(encoded)))
+            f.write(encoded)
+        for t, values in trace.rows():
+            f.write(record.pack(t, *values))
+            count += 1
+    return count
+
+
+def expand_columns(spec, host=None):
+    """ Split a comma separated column list, '{host}' is replaced by the host
+    name, so the same command line picks a different column on each node
+    """
+    host = host or os.uname()[1]
+    return [c.strip().replace("{host}", host) for c in spec.split(",") if c.strip()]
+
+
+class TracePlayer(object):
+    """ Plays the rows of a trace at their recorded times, on a background
+    thread, and calls apply(cpu_values, mem_value) for every row.
+    - cpu_values has one value per cpu column, mem_value is None without a mem column
+    - empty (NaN) values hold the previous value of the column
+    - speed > 1 compresses time, e.g. 60 plays an hour in a minute
+    """
+
+    def __init__(self, trace, apply, cpu_columns, mem_column=None, speed=1.0, loop=False):
+        missing = [c for c in cpu_columns + ([mem_column] if mem_column else []) if c not in trace.columns]
+        if missing:
+            raise ValueError("trace {} has no column(s) {}, it has {}".format(trace.path, missing, trace.columns))
+        if speed <= 0:
+            raise ValueError("trace speed must be > 0")
+        self.trace = trace
+        self.apply = apply
+        self.speed = float(speed)
+        self.loop = loop
+        self.rows_played = 0
+        self._cpu_index = [trace.columns.index(c) for c in cpu_columns]
+        self._mem_index = trace.columns.index(mem_column) if mem_column else None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def validate(self):
+        """ Read the whole trace once, a row at a time, so bad rows show up before playback
+        :return: number of rows
+        :raises ValueError: a bad row, or no rows
+        """
+        rows = sum(1 for _ in self.trace.rows())
+        if not rows:
+            raise ValueError("trace {} has no rows".format(self.trace.path))
+        return rows
+
+    def _play_once(self, last):
+        """ Play the trace once
+        :param last: last values, updated in place, so NaN holds across loops
+        :return: trace duration in seconds, None if stopped
+        """
+        start = time.perf_counter()
+        t0 = None
+        t = 0.0
+        for t, values in self.trace.rows():
+            if t0 is None:
+                t0 = t
+            self._stop.wait(max(0, start + (t - t0) / self.speed - time.perf_counter()))
+            if self._stop.is_set():
+                return None
+            for i, v in enumerate(values):
+                if not math.isnan(v):
+                    last[i] = v
+            self.apply([last.get(i, 0.0) for i in self._cpu_index],
+                       last.get(self._mem_index) if self._mem_index is not None else None)
+            self.rows_played += 1
+        return t - t0 if t0 is not None else 0.0
+
+    def _run(self):
+        last = {}
+        while not self._stop.is_set():
+            try:
+                duration = self._play_once(last)
+            except (IOError, OSError, ValueError) as e:
+                # e.g. the file changed since it was validated
+                print("trace replay stopped after {} rows, holding the last targets: {}".format(self.rows_played, e))
+                break
+            if duration is None:
+                break
+            if not self.loop or not duration:
+                print("trace {} finished after {} rows, holding the last targets".format(self.trace.path, self.rows_played))
+                break
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="TracePlayer")
+        self._thread.daemon = True
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Convert a CSV utilization trace to the busypy binary trace format')
+    parser.add_argument('csv', help='CSV trace')
+    parser.add_argument('out', help='binary trace to write')
+    args = parser.parse_args()
+
+    try:
+        n = convert(args.csv, args.out)
+    except (IOError, OSError, ValueError) as e:
+        print(e)
+        sys.exit(1)
+    print("{} records written to {}".format(n, args.out))
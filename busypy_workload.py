@@ -0,0 +1,124 @@
+import os
+import zlib
+import random
+import string
+import hashlib
+
+# Compute kernels for the busy loop.
+# Each kernel is a callable that does one small unit of work (well under a
+# millisecond) so the engine can fill a time slice accurately.  Apart from
+# "sort", the kernels spend their time in C code that releases the GIL, so
+# several burn threads in one process can drive several cores.
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+GEMM_SIZE = 96                  # matrix is GEMM_SIZE x GEMM_SIZE float64
+FFT_SIZE = 4096                 # complex128 points
+HASH_BUFFER_SIZE = 64 * 1024    # bytes hashed per call
+HASH_ALGORITHM = "sha256"
+ZLIB_BUFFER_SIZE = 16 * 1024    # bytes compressed per call
+ZLIB_LEVEL = 6
+
+
+def _require_numpy(name):
+    if numpy is None:
+        raise RuntimeError("workload '{}' requires numpy, pip3 install numpy".format(name))
+
+
+class SortWork(object):
+    """ The original unit of busy work, sorting a short string back and forth.
+    Runs in the interpreter and holds the GIL.
+    """
+
+    name = "sort"
+    releases_gil = False
+
+    def __init__(self):
+        self._sortme = ''.join(random.choice(string.ascii_uppercase) for _ in range(100))
+        self._reversed = False
+
+    def __call__(self):
+        self._sortme = sorted(self._sortme, reverse=self._reversed)
+        self._reversed = not self._reversed
+
+
+class GemmWork(object):
+    """ Dense matrix multiply, stresses the FPU/SIMD units and the caches.
+    """
+
+    name = "gemm"
+    releases_gil = True
+
+    def __init__(self, size=GEMM_SIZE):
+        _require_numpy(self.name)
+        rng = numpy.random.default_rng()
+        self._a = rng.random((size, size))
+        self._b = rng.random((size, size))
+        self._c = numpy.empty((size, size))
+
+    def __call__(self):
+        numpy.matmul(self._a, self._b, out=self._c)
+
+
+class FFTWork(object):
+    """ Complex FFT, a mix of floating point and strided memory access.
+    """
+
+    name = "fft"
+    releases_gil = True
+
+    def __init__(self, size=FFT_SIZE):
+        _require_numpy(self.name)
+        rng = numpy.random.default_rng()
+        self._x = rng.random(size) + 1j * rng.random(size)
+
+    def __call__(self):
+        numpy.fft.fft(self._x)
+
+
+class HashWork(object):
+    """ Cryptographic digest over a large buffer, integer ALU and streaming
+    reads.  hashlib releases the GIL for buffers over 2KB.
+    """
+
+    name = "hash"
+    releases_gil = True
+
+    def __init__(self, size=HASH_BUFFER_SIZE, algorithm=HASH_ALGORITHM):
+        self._buffer = os.urandom(size)
+        self._algorithm = algorithm
+
+    def __call__(self):
+        hashlib.new(self._algorithm, self._buffer).digest()
+
+
+class ZlibWork(object):
+    """ zlib compression, branchy integer code with a working set in the caches.
+    """
+
+    name = "zlib"
+    releases_gil = True
+
+    def __init__(self, size=ZLIB_BUFFER_SIZE, level=ZLIB_LEVEL):
+        # half random, half repeated, so the compressor has some work to do
+        half = size // 2
+        self._buffer = os.urandom(half) + b"busypy" * (half // 6)
+        self._level = level
+
+    def __call__(self):
+        zlib.compress(self._buffer, self._level)
+
+
+WORKLOADS = {w.name: w for w in (SortWork, GemmWork, FFTWork, HashWork, ZlibWork)}
+
+
+def make_workload(name):
+    """ Create a workload kernel by name, see WORKLOADS
+    """
+    try:
+        return WORKLOADS[name]()
+    except KeyError:
+        raise ValueError("unknown workload '{}', choose from {}".format(name, sorted(WORKLOADS)))
@@ -0,0 +1,196 @@
+import sys
+import json
+import math
+import argparse
+import grpc
+import busypy_pb2 as busypy_pb2
+import busypy_pb2_grpc as busypy_pb2_grpc
+from busypy_telemetry import format_stats
+from busypy_admin import TARGET_FIELDS, targets_from_proto
+
+# Command line tool for a running busypyserver.
+#   python3 busypyctl.py fleet              fleet statistics, see busypy_telemetry.py
+#   python3 busypyctl.py set --cpu 50 ...   set targets of all the clients, a group, or ips, see busypy_admin.py
+#   python3 busypyctl.py clear ...          drop targets set with set/exit, the clients go back to the server targets
+#   python3 busypyctl.py exit ...           tell the clients running now to exit, once
+#   python3 busypyctl.py status             server targets, targets set, and the clients
+
+GRPC_SERVER = "localhost"
+GRPC_SERVER_PORT = "50051"
+GRPC_TIMEOUT = 5
+
+
+def _distribution(d):
+    return {"p50": d.p50, "p95": d.p95, "max": d.max, "mean": d.mean}
+
+
+def stats_from_proto(reply):
+    """ FleetStats into the dict of TelemetryStore.query()
+    """
+    return {
+        "clients": reply.clients,
+        "processes": reply.processes,
+        "samples": reply.samples,
+        "cpu": _distribution(reply.cpu),
+        "mem": _distribution(reply.mem),
+        "cpu_deviation": reply.cpuDeviation,
+        "mem_deviation": reply.memDeviation,
+        "lagging_total": reply.laggingTotal,
+        "lagging": [{"ip": c.ip, "pid": c.pid, "cpu": c.cpu, "cpu_target": c.cpuTarget,
+                     "mem": c.mem, "mem_target": c.memTarget} for c in reply.lagging],
+    }
+
+
+def fleet(stub, args):
+    reply = stub.QueryFleet(busypy_pb2.FleetQuery(recent=args.recent, lagPercent=args.lag_percent,
+                                                  maxLagging=args.max_lagging), timeout=GRPC_TIMEOUT)
+    stats = stats_from_proto(reply)
+    if args.json:
+        print(json.dumps(stats, indent=2))
+    else:
+        for line in format_stats(stats):
+            print(line)
+
+
+def _selector(args):
+    return busypy_pb2.TargetSelector(all=args.all, group=args.group or "", ips=args.ips or [])
+
+
+def _targets(targets):
+    """ dict of targets into "cpu=50 mem=10", without the targets that are off (0)
+    """
+    return " ".join("{}={}".format(key, "{:g}".format(targets[key]) if isinstance(targets[key], float) else targets[key])
+                    for key, _ in TARGET_FIELDS if key in targets and (targets[key] or key in ("cpu", "mem"))) or "-"
+
+
+def set_targets(stub, args):
+    targets = {field: getattr(args, key) for key, field in TARGET_FIELDS if getattr(args, key, None) is not None}
+    if not targets:
+        print("Nothing to set, give one or more of --cpu, --mem, --io-mbps, --io-iops, --membw, --net-mbps")
+        sys.exit(1)
+    reply = stub.SetTargets(busypy_pb2.TargetChange(selector=_selector(args), targets=busypy_pb2.Targets(**targets)),
+                            timeout=GRPC_TIMEOUT)
+    print("Set for {} known clients, change {}".format(reply.clients, reply.version))
+
+
+def clear_targets(stub, args):
+    reply = stub.ClearTargets(_selector(args), timeout=GRPC_TIMEOUT)
+    print("Cleared for {} known clients, change {}".format(reply.clients, reply.version))
+
+
+def exit_clients(stub, args):
+    reply = stub.SetTargets(busypy_pb2.TargetChange(selector=_selector(args),
+                                                    targets=busypy_pb2.Targets(clientExit=True)), timeout=GRPC_TIMEOUT)
+    print("Exit sent to {} known clients, change {}, clients (re)started later are not told".format(reply.clients,
+                                                                                                  reply.version))
+
+
+def status_from_proto(reply):
+    """ ServerStatus into a dict
+    """
+    nan = lambda v: None if math.isnan(v) else round(v, 1)
+    return {
+        "targets": targets_from_proto(reply.targets),
+        "overrides": [{"selector": o.selector, "targets": targets_from_proto(o.targets)} for o in reply.overrides],
+        "clients": reply.clients,
+        "processes": reply.processes,
+        "subscribers": reply.subscribers,
+        "version": reply.version,
+        "uptime": round(reply.uptime, 1),
+        "listed_total": reply.listedTotal,
+        "listed": [{"ip": c.ip, "pids": list(c.pids), "group": c.group, "last_seen": round(c.lastSeen, 1),
+                    "cpu": nan(c.cpu), "mem": nan(c.mem), "targets": targets_from_proto(c.targets),
+                    "update": c.update} for c in reply.listed],
+    }
+
+
+def status(stub, args):
+    reply = stub.GetStatus(busypy_pb2.StatusQuery(maxClients=args.max_clients, selector=_selector(args)),
+                           timeout=GRPC_TIMEOUT)
+    status = status_from_proto(reply)
+    if args.json:
+        print(json.dumps(status, indent=2))
+        return
+    print("Up {:.0f}s, {} clients, {} processes, {} subscribed, {} changes".format(
+        status["uptime"], status["clients"], status["processes"], status["subscribers"], status["version"]))
+    print("Server targets: {}".format(_targets(status["targets"])))
+    for o in status["overrides"]:
+        print("Set for {}: {}".format(o["selector"], _targets(o["targets"])))
+    if status["listed"]:
+        print("{:15s} {:10s} {:>5s} {:>6s} {:>5s} {:>5s}  {}".format("IP", "Group", "Pids", "Seen", "CPU", "MEM",
+                                                                    "Targets"))
+    for c in status["listed"]:
+        print("{:15s} {:10s} {:5d} {:5.1f}s {:>5s} {:>5s}  {}{}".format(
+            c["ip"], c["group"] or "-", len(c["pids"]), c["last_seen"],
+            "-" if c["cpu"] is None else "{:.0f}%".format(c["cpu"]),
+            "-" if c["mem"] is None else "{:.0f}%".format(c["mem"]),
+            _targets(c["targets"]), "" if c["update"] else " (not updated)"))
+    if status["listed_total"] > len(status["listed"]):
+        print("... {} more, see --clients".format(status["listed_total"] - len(status["listed"])))
+
+
+def _add_selector(p, required=True):
+    s = p.add_mutually_exclusive_group(required=required)
+    s.add_argument('--all', dest="all", action='store_true', default=False, help='All the clients.')
+    s.add_argument('--group', dest="group", action='store', help='The clients started with busypy --group GROUP.')
+    s.add_argument('--ip', dest="ips", action='append',
+                   help='A client ip, or network like 10.0.1.0/24, can be repeated.')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='BusyPy server control')
+
+    parser.add_argument('--server', dest="grpc_server", action='store', default=GRPC_SERVER,
+                        help='busypyserver host, default={}.'.format(GRPC_SERVER))
+    parser.add_argument('--port', dest="grpc_port", action='store', default=GRPC_SERVER_PORT,
+                        help='busypyserver port, default={}.'.format(GRPC_SERVER_PORT))
+    commands = parser.add_subparsers(dest="command", metavar="command")
+    commands.required = True
+
+    p = commands.add_parser('fleet', help='Fleet cpu/memory statistics and lagging clients')
+    p.add_argument('--recent', dest="recent", action='store', type=int, default=0,
+                   help='Recent samples per client averaged for the deviation from target, 0=server default.')
+    p.add_argument('--lag-percent', dest="lag_percent", action='store', type=float, default=0,
+                   help='Deviation from target that makes a client lagging, 0=server default.')
+    p.add_argument('--max-lagging', dest="max_lagging", action='store', type=int, default=0,
+                   help='Lagging clients listed, worst first, 0=server default.')
+    p.add_argument('--json', dest="json", action='store_true', default=False, help='Print JSON.')
+    p.set_defaults(run=fleet, stub=busypy_pb2_grpc.BusyPyServiceStub)
+
+    p = commands.add_parser('set', help='Set targets of the clients on the running server, only the ones given change')
+    _add_selector(p)
+    p.add_argument('--cpu', dest="cpu", action='store', type=int, help='Percent usage of the CPU(s).')
+    p.add_argument('--mem', dest="mem", action='store', type=int, help='Percent usage of the memory.')
+    p.add_argument('--io-mbps', dest="io_mbps", action='store', type=int, help='Disk I/O MB/s, 0=none.')
+    p.add_argument('--io-iops', dest="io_iops", action='store', type=int, help='Disk I/O operations per second, 0=none.')
+    p.add_argument('--membw', dest="membw", action='store', type=float, help='Memory bandwidth GB/s, 0=none.')
+    p.add_argument('--net-mbps', dest="net_mbps", action='store', type=float, help='Network Mbit/s, 0=none.')
+    p.set_defaults(run=set_targets, stub=busypy_pb2_grpc.BusyPyAdminStub)
+
+    p = commands.add_parser('clear', help='Drop the targets set for the clients, they go back to the server targets, '
+                                          'and cancel exits not yet sent')
+    _add_selector(p)
+    p.set_defaults(run=clear_targets, stub=busypy_pb2_grpc.BusyPyAdminStub)
+
+    p = commands.add_parser('exit', help='Tell the clients running now to exit, once, clients (re)started later are '
+                                         'not told')
+    _add_selector(p)
+    p.set_defaults(run=exit_clients, stub=busypy_pb2_grpc.BusyPyAdminStub)
+
+    p = commands.add_parser('status', help='Server targets, the targets set on it, and the clients')
+    _add_selector(p, required=False)
+    p.add_argument('--clients', dest="max_clients", action='store', type=int, default=20,
+                   help='Client nodes listed, 0=none, default=20.')
+    p.add_argument('--json', dest="json", action='store_true', default=False, help='Print JSON.')
+    p.set_defaults(run=status, stub=busypy_pb2_grpc.BusyPyAdminStub)
+
+    args = parser.parse_args()
+
+    channel = grpc.insecure_channel('{}:{}'.format(args.grpc_server, args.grpc_port))
+    try:
+        args.run(args.stub(channel), args)
+    except grpc.RpcError as e:
+        print("{}: {}".format(e.code().name, e.details()))
+        sys.exit(1)
+    finally:
+        channel.close()
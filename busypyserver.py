@@ -1,15 +1,32 @@
 import sys
+import signal
 import argparse
 import time
+import asyncio
+import bisect
+import heapq
 import grpc
+from collections import OrderedDict
 import socket
 import busypy_pb2 as busypy_pb2
 import busypy_pb2_grpc as busypy_pb2_grpc
-from concurrent import futures
+from busypy_profile import LoadProfile
+from busypy_metrics import MetricsRegistry, MetricsServer
+from busypy_rollout import ROLLOUT_WAVE_SEC, RolloutPolicy
+from busypy_telemetry import TELEMETRY_SAMPLES, TELEMETRY_RECENT, LAG_PERCENT, MAX_LAGGING, TelemetryStore, format_stats
+from busypy_snapshot import SNAPSHOT_INTERVAL_SEC, SNAPSHOT_MAX_AGE_SEC, load_snapshot, save_snapshot
+from busypy_admin import TargetOverrides, targets_from_proto, targets_to_proto, parse_networks, selects, ip_key
 
 # code based on https://alexandreesl.com/tag/grpc/
+# The server runs on grpc.aio, all the RPCs and the client registry run on
+# one asyncio event loop, so the registry needs no locking.
 
 GRPC_SERVER_PORT = "50051"
+SERVER_TICK_SEC = 0.1
+SERVER_STOP_GRACE_SEC = 1
+
+# fail to start, rather than silently share the port with another busypyserver
+SERVER_OPTIONS = [('grpc.so_reuseport', 0)]
 
 
 # defaults that can be overridden from command line
@@ -18,6 +35,11 @@ BusyPySettings = {
     "cpu": 27,
     "mem": 7,
     "exit": False,
+    "profile": None,  # busypy_pb2.LoadProfile, clients play it instead of cpu/mem
+    "io_mbps": 0,     # disk I/O targets, 0=none
+    "io_iops": 0,
+    "membw": 0.0,     # memory bandwidth target GB/s, 0=none
+    "net_mbps": 0.0,  # network target Mbit/s, 0=none
 }
 
 
@@ -25,6 +47,32 @@ wait_for_num_clients = 0  # # of clients to wait for, after all seen, exit
 run_server = True         # control infinite loop of server
 target_client_ip = None   # set to affect only one client by ip address
 monitor_only = False
+verbose = False           # print every client status, always done when monitoring
+client_ttl = 30           # seconds, clients not seen for this long are forgotten, 0=never
+metrics_port = 0          # Prometheus metrics http port, 0=none
+telemetry_samples = TELEMETRY_SAMPLES  # samples kept per client process
+lag_percent = LAG_PERCENT # deviation from target that makes a client lagging
+telemetry = None          # TelemetryStore of the client samples, None without numpy, see serve()
+rollout = None            # RolloutPolicy, None updates all the clients at once
+poll_interval = 0         # suggested seconds between client status reports, 0=client default
+snapshot_file = None      # client registry snapshot, see busypy_snapshot.py, None=no snapshot
+snapshot_interval = SNAPSHOT_INTERVAL_SEC  # seconds between snapshots, and one on exit
+snapshot_max_age = SNAPSHOT_MAX_AGE_SEC    # snapshot entries not seen for this long are not restored, 0=all
+overrides = TargetOverrides()  # targets set on the running server with busypyctl, see busypy_admin.py
+
+# server metrics, see --metrics-port
+metrics = MetricsRegistry()
+rpc_total = metrics.counter("busypy_server_rpc_total",
+                            "Client statuses handled, GetSettings calls and Subscribe stream messages", ("method",))
+rpc_seconds = metrics.histogram("busypy_server_rpc_seconds", "Time spent handling a client status", ("method",))
+push_total = metrics.counter("busypy_server_push_total", "Settings pushed to clients on Subscribe streams")
+evicted_total = metrics.counter("busypy_server_evicted_total", "Clients (ip:pid) forgotten after --client-ttl")
+_clients_gauge = metrics.gauge("busypy_server_clients", "Client nodes (ips) in the registry")
+_pids_gauge = metrics.gauge("busypy_server_client_processes", "Client processes (ip:pid) in the registry")
+_pending_gauge = metrics.gauge("busypy_server_pending_updates", "Targeted client nodes still waiting for their update")
+_subscribers_gauge = metrics.gauge("busypy_server_subscribers", "Open Subscribe streams")
+_rollout_gauge = metrics.gauge("busypy_server_rollout_clients", "Client nodes of the rollout", ("state",))
+admin_total = metrics.counter("busypy_server_admin_total", "Admin target changes", ("method",))
 
 
 def set_run_server(enable=True):
@@ -32,29 +80,80 @@ def set_run_server(enable=True):
     run_server = enable
 
 
+class clientEntry(object):
+    """ What is known about one client ip:pid
+    """
+
+    __slots__ = ("ip", "pid", "last_seen", "cpu", "mem")
+
+    def __init__(self, ip, pid):
+        self.ip = ip
+        self.pid = pid
+        self.last_seen = 0.0
+        self.cpu = None
+        self.mem = None
+
+
 class clientIPs(object):
     """ Keeps track of clients via ip and pid
+    - clients are indexed by ip then pid, each with its last seen time and usage
+    - clients not seen for a while can be evicted, see evict_stale()
+    - targeted (updated) clients are tracked with an incremental count of the
+      pids still pending an update, so the completion checks are O(1)
+    - a staggered rollout tracks when each client ip is due its update, and
+      which ips got it, see RolloutPolicy
+    - the clients can be saved to and restored from a snapshot, restored ips
+      are known, not new, until they check in, see confirm()
+    - the group of each client ip, clients started with --group, for targets set per group
     """
 
     def __init__(self):
-        self._clients = {}
-        self._clients_updated = {}
-
-    def add_ip(self, ip, pid):
-        """ Add ip:pid only once
+        self._clients = {}                        # ip -> {pid: clientEntry}
+        self._clients_updated = {}                # ip -> set(pid), targeted clients that were updated
+        self._by_last_seen = OrderedDict()        # (ip, pid) -> clientEntry, oldest first
+        self._pending = {}                        # targeted ip -> # of its pids not yet updated
+        self._incomplete = 0                      # # of targeted ips with pending pids
+        self._rollout = {}                        # ip -> time its rollout update is due
+        self._rollout_due = []                    # heap of (due time, ip), of ips not yet updated
+        self._rollout_updated = set()             # ips that got their rollout update
+        self._restored = set()                    # ips restored from a snapshot that did not check in yet
+        self._groups = {}                         # ip -> group, of the clients that have one
+
+    def _set_pending(self, ip, pending):
+        was = self._pending.get(ip, 0)
+        self._pending[ip] = pending
+        self._incomplete += (pending > 0) - (was > 0)
+
+    def add_ip(self, ip, pid, cpu=None, mem=None, group=None):
+        """ Add ip:pid only once, every call records the last seen time and usage
         :param ip:
         :param pid:
+        :param cpu: reported cpu percent
+        :param mem: reported memory percent
+        :param group: group of the client ip, "" for none, None to leave it
         :return: True if added, False if not added (already present)
         """
-        if not ip in self._clients:
-            self._clients[ip] = [pid]
-            return True
+        pids = self._clients.get(ip)
+        if pids is None:
+            pids = self._clients[ip] = {}
+
+        entry = pids.get(pid)
+        added = entry is None
+        if added:
+            entry = pids[pid] = clientEntry(ip, pid)
+            self._by_last_seen[(ip, pid)] = entry
+            if ip in self._clients_updated:
+                # a new pid of an already targeted client also needs the update
+                self._set_pending(ip, self._pending[ip] + 1)
         else:
-            if not pid in self._clients[ip]:
-                self._clients[ip].append(pid)
-                return True
+            self._by_last_seen.move_to_end((ip, pid))
 
-        return False
+        entry.last_seen = time.time()
+        if cpu is not None: entry.cpu = cpu
+        if mem is not None: entry.mem = mem
+        if group: self._groups[ip] = group
+        elif group is not None: self._groups.pop(ip, None)
+        return added
 
     def is_ip_active(self, ip):
         """ Checks if ip is active
@@ -69,37 +168,160 @@ class clientIPs(object):
         :param pid:
         :return: True ip:pid was removed, False otherwise
         """
-        if not ip in self._clients: return False
-        if not pid in self._clients[ip]: return False
-
-        self._clients[ip].remove(pid)
+        pids = self._clients.get(ip)
+        if pids is None: return False
+        if pids.pop(pid, None) is None: return False
+        self._by_last_seen.pop((ip, pid), None)
+
+        updated = self._clients_updated.get(ip)
+        if updated is not None:
+            if pid in updated:
+                updated.discard(pid)
+            else:
+                self._set_pending(ip, self._pending[ip] - 1)
 
-        # if the list of pids is empty, delete the key
-        if not self._clients[ip]:
+        # if there are no pids left, delete the key, a client that is gone
+        # can't hold up the targeted clients
+        if not pids:
             self._clients.pop(ip, None)
+            self._restored.discard(ip)
+            self._groups.pop(ip, None)
+            self._rollout.pop(ip, None)  # its heap entry is skipped when due
+            self._rollout_updated.discard(ip)
+            if updated is not None:
+                self._set_pending(ip, 0)
+                self._pending.pop(ip, None)
+                self._clients_updated.pop(ip, None)
         return True
 
+    def evict_stale(self, ttl, now=None):
+        """ Remove clients not seen for ttl seconds
+        - only looks at the stale clients, the oldest are kept first
+        :param ttl: seconds
+        :return: list of (ip, pid) evicted
+        """
+        deadline = (now or time.time()) - ttl
+        evicted = []
+        while self._by_last_seen:
+            key, entry = next(iter(self._by_last_seen.items()))
+            if entry.last_seen > deadline:
+                break
+            self.remove_ip_pid(*key)
+            evicted.append(key)
+        return evicted
+
+    def snapshot(self):
+        """ :return: {ip: [(pid, last seen, cpu, mem)]}, see busypy_snapshot.save_snapshot()
+        """
+        return {ip: [(pid, e.last_seen, e.cpu, e.mem) for pid, e in pids.items()] for ip, pids in self._clients.items()}
+
+    def groups(self):
+        """ :return: {ip: group} of the client ips that have one
+        """
+        return dict(self._groups)
+
+    def restore(self, snapshot, groups=None, saved=None, now=None):
+        """ Add the clients of a snapshot.  Their last seen times are moved on by the time since the
+        snapshot was saved, the server was down, so they get the rest of their ttl to check in
+        :param snapshot: {ip: [(pid, last seen, cpu, mem)]}, see busypy_snapshot.load_snapshot()
+        :param groups: {ip: group} of the snapshot
+        :param saved: time the snapshot was saved, default now
+        :return: # of ip:pid restored
+        """
+        now = now or time.time()
+        downtime = max(0.0, now - (saved or now))
+        groups = groups or {}
+        restored = 0
+        for ip, entries in snapshot.items():
+            if ip in self._clients:
+                continue
+            pids = self._clients[ip] = {}
+            for pid, last_seen, cpu, mem in entries:
+                entry = pids[pid] = clientEntry(ip, pid)
+                entry.last_seen, entry.cpu, entry.mem = min(now, last_seen + downtime), cpu, mem
+                self._by_last_seen[(ip, pid)] = entry
+                restored += 1
+            if groups.get(ip):
+                self._groups[ip] = groups[ip]
+            self._restored.add(ip)
+        if restored:
+            # keep the oldest first, for evict_stale()
+            self._by_last_seen = OrderedDict(sorted(self._by_last_seen.items(), key=lambda i: i[1].last_seen))
+        return restored
+
+    def confirm(self, ip, pids=None):
+        """ A client ip checked in, if it was restored from a snapshot, its pids
+        that are not running any more are removed, so they can't hold up an update
+        :param pids: all the pids of the node, None if not known (older clients)
+        :return: True if the ip was restored, and this is its first check in
+        """
+        if ip not in self._restored:
+            return False
+        self._restored.discard(ip)
+        if pids is not None:
+            for pid in [pid for pid in self._clients.get(ip, ()) if pid not in pids]:
+                self.remove_ip_pid(ip, pid)
+        return True
+
+    def restored_total(self):
+        """ # of client ips restored from a snapshot that did not check in yet
+        """
+        return len(self._restored)
+
     def total(self):
         return len(self._clients)
 
+    def group(self, ip):
+        """ :return: group of the client ip, "" for none
+        """
+        return self._groups.get(ip, "")
+
+    def nodes(self):
+        """ :return: [(ip, {pid: clientEntry})] of all the client ips
+        """
+        return list(self._clients.items())
+
+    def total_pids(self):
+        return len(self._by_last_seen)
+
+    def entries(self):
+        """ All clientEntry, oldest seen first
+        """
+        return list(self._by_last_seen.values())
+
     def targeted_client_add(self, ip, pid):
         """ Add ip:pid only once
         :param ip:
         :param pid:
         :return: True if added, False if not added (already present)
         """
-        if not ip in self._clients_updated:
-            self._clients_updated[ip] = [pid]
-            return True
-        else:
-            if not pid in self._clients_updated[ip]:
-                self._clients_updated[ip].append(pid)
-                return True
-        return False
+        updated = self._clients_updated.get(ip)
+        if updated is None:
+            updated = self._clients_updated[ip] = set()
+            self._set_pending(ip, len(self._clients.get(ip, ())))
+        elif pid in updated:
+            return False
+
+        updated.add(pid)
+        if pid in self._clients.get(ip, ()):
+            self._set_pending(ip, self._pending[ip] - 1)
+        return True
+
+    def is_targeted(self, ip):
+        """ Check if a client ip has been targeted
+        :param ip:
+        :return: True or False
+        """
+        return ip in self._clients_updated
 
     def targeted_total(self):
         return len(self._clients_updated)
 
+    def pending_total(self):
+        """ # of targeted client ips that still have pids to update
+        """
+        return self._incomplete
+
     def is_targeted_updated(self, ip):
         """ Check if a specific client ip has been updated
         :param ip:
@@ -107,18 +329,42 @@ class clientIPs(object):
         """
         if not ip in self._clients_updated: return False
         if not ip in self._clients: return False
-
-        l1 = self._clients_updated[ip]
-        l2 = self._clients[ip]
-        return set(l1) == set(l2)
+        return self._pending[ip] == 0
 
     def is_all_targeted_updated(self):
         """ Check to see if all targets (IP:PID) have been updated
         :return: True or False
         """
-        for ip in self._clients_updated:
-            if not self.is_targeted_updated(ip): return False
-        return True
+        return self._incomplete == 0
+
+    def rollout_schedule(self, ip, due):
+        """ Admit a client ip to the rollout, it gets its update at time due
+        """
+        self._rollout[ip] = due
+        heapq.heappush(self._rollout_due, (due, ip))
+
+    def rollout_due_time(self, ip):
+        """ :return: time the client ip is due its update, None if not admitted yet
+        """
+        return self._rollout.get(ip)
+
+    def rollout_set_updated(self, ip):
+        self._rollout_updated.add(ip)
+
+    def rollout_due(self, now):
+        """ Client ips that came due by now and were not updated yet, each one is returned once
+        """
+        due = []
+        while self._rollout_due and self._rollout_due[0][0] <= now:
+            t, ip = heapq.heappop(self._rollout_due)
+            if self._rollout.get(ip) == t and ip not in self._rollout_updated:
+                due.append(ip)
+        return due
+
+    def rollout_progress(self):
+        """ :return: (# of client ips updated, # admitted)
+        """
+        return len(self._rollout_updated), len(self._rollout)
 
 
 clients = clientIPs()
@@ -127,9 +373,26 @@ clients = clientIPs()
 class gRPCServer(busypy_pb2_grpc.BusyPyServiceServicer):
 
     CLIENT_POLLING_TIME = 5
+    EVICT_INTERVAL = 1  # seconds between evictions of stale clients
+    NET_REPORT_INTERVAL = 5  # seconds between network fleet totals, when monitoring
+    FLEET_REPORT_INTERVAL = 5  # seconds between fleet statistics, when monitoring
+    ROLLOUT_REPORT_INTERVAL = 5  # seconds between rollout progress lines
 
     def __init__(self):
+        self.started = time.time()
         self._start = time.time()
+        self._window_was_open = False
+        self._last_evict = time.time()
+        self._last_net_report = time.time()
+        self._last_fleet_report = time.time()
+        self._last_rollout_report = time.time()
+        self._last_snapshot = time.time()
+        self._rollout_reported = None  # last progress printed
+        # ip -> [sink port, Mbit/s sent, Mbit/s received] of the nodes running a network sink
+        self._net_nodes = {}
+        self._net_ring = None  # sorted ips of _net_nodes, None when it needs a rebuild
+        # (ip, pid) -> subscriber dict of the clients connected with Subscribe
+        self._subscribers = {}
 
     def __map_kv_dict(self, context):
         """ Map gRPC context invocation_metadata into a python dict
@@ -144,26 +407,44 @@ class gRPCServer(busypy_pb2_grpc.BusyPyServiceServicer):
             ctx[item.key] = item.value
         return ctx
 
-    def GetSettings(self, request, context):
-        """ Clients call this method to get their target settings.
-        - when client calls, they also send their current state
+    def _handle_status(self, ctx, request, report=True):
+        """ Process the status of a client, and work out its target settings
+        - this is the common part of GetSettings and Subscribe
+        - a client node sends one status for all its busy loop processes (workers),
+          each worker is tracked as ip:pid, older clients send one status per process
 
+        :param ctx: client metadata dict, see __map_kv_dict
         :param request: client current state, see BusyPySettings for structure
-        :param context: gRPC context
-        :return: gRPC handler
+        :param report: print the client status, if verbose or monitoring
+        :return: BusyPySettings for the client
         """
-        # print(dir(context))
-        # [..., '_abc_cache', '_abc_negative_cache', '_abc_negative_cache_version', '_abc_registry', '_request_deserializer',
-        # '_rpc_event', '_state', 'abort', 'add_callback', 'auth_context', 'cancel', 'disable_next_message_compression',
-        # 'invocation_metadata', 'is_active', 'peer', 'peer_identities', 'peer_identity_key', 'send_initial_metadata',
-        # 'set_code', 'set_details', 'set_trailing_metadata', 'time_remaining']
-
-        ctx = self.__map_kv_dict(context)
-
-        print("IP: {:12s}, PID:{:>7s}, CPU: {:3d}%, MEM: {:3d}%, Exit: {}".format(ctx['ip'], ctx['pid'],
-                                                                              request.cpuLoadPercent,
-                                                                              request.memoryPercent,
-                                                                              request.clientExit))
+        ip = ctx['ip']
+        group = ctx.get('group', '')
+        workers = [(str(w.pid), w.cpuLoadPercent) for w in request.workers] or [(ctx['pid'], request.cpuLoadPercent)]
+        pids = [pid for pid, _ in workers]
+
+        # monitoring prints the fleet statistics, see tick(), every status only when verbose
+        if report and (verbose or (monitor_only and telemetry is None)):
+            for pid, cpu in workers:
+                print("IP: {:12s}, PID:{:>7s}, CPU: {:3d}%, MEM: {:3d}%, Exit: {}".format(ip, pid,
+                                                                                      cpu,
+                                                                                      request.memoryPercent,
+                                                                                      request.clientExit))
+            if request.netMbps or request.netRxMbps:
+                print("IP: {:12s}, Net: sent {:7.1f} Mbit/s, received {:7.1f} Mbit/s".format(ip, request.netMbps,
+                                                                                           request.netRxMbps))
+            if request.memBandwidthGBps:
+                print("IP: {:12s}, MemBW: {:5.2f} GB/s".format(ip, request.memBandwidthGBps))
+            if request.HasField("io"):
+                io = request.io
+                print("IP: {:12s}, IO: {:6.1f} MB/s, {:6.0f} IOPS, lat p50/p95/p99: {:.2f}/{:.2f}/{:.2f} ms".format(
+                    ip, io.mbps, io.iops, io.latencyP50Ms, io.latencyP95Ms, io.latencyP99Ms))
+            if request.HasField("cgroup"):
+                cg = request.cgroup
+                print("IP: {:12s}, cgroup: cpu quota {}, memory limit {}, throttled {} of {} periods, {:.1f}s".format(
+                    ip, "{:g} cpus".format(cg.cpuQuota) if cg.cpuQuota else "none",
+                    "{:.0f} MB".format(cg.memoryLimit / 1024.0 / 1024.0) if cg.memoryLimit else "none",
+                    cg.nrThrottled, cg.nrPeriods, cg.throttledSec))
 
         if target_client_ip is not None:
             BusyPySettings["update"] = False
@@ -172,61 +453,550 @@ class gRPCServer(busypy_pb2_grpc.BusyPyServiceServicer):
             BusyPySettings["update"] = False
             self._start = time.time()  # Never open window for other actions
 
-        if clients.add_ip(ctx['ip'], ctx['pid']):
+        self._net_update(ip, request)
+
+        # a status lists all the pids of the node, older clients send one status per pid
+        restored = clients.confirm(ip, pids if request.workers else None)
+        added = [pid for pid, cpu in workers if clients.add_ip(ip, pid, cpu, request.memoryPercent, group)]
+        admitted = self._rollout_admit(ip)
+        if added:
             # new client was added
             if wait_for_num_clients:
                 print("{} of {} clients have checked in".format(clients.total(), wait_for_num_clients))
             else:
                 print("{} clients have checked in".format(clients.total()))
 
-            # every time we see a new client, reset the clock
-            self._start = time.time()
+            # every time we see a new client, reset the clock, a client known from the snapshot
+            # that restarted (new pids) is not new
+            if not restored:
+                self._start = time.time()
 
         else:
-            if (time.time() - self._start) > self.CLIENT_POLLING_TIME:
-                #print("window open: wait_for_num_clients: {}, target_client_ip: {}, BusyPySettings: {}, client: {}:{}".format(wait_for_num_clients, target_client_ip, BusyPySettings, ctx['ip'], ctx['pid']))
+            if self.window_open():
+                #print("window open: wait_for_num_clients: {}, target_client_ip: {}, BusyPySettings: {}, client: {}:{}".format(wait_for_num_clients, target_client_ip, BusyPySettings, ip, pids))
                 # if no new clients have been added during this polling window, then operations
                 # can be done - we have seen all the clients by now
 
                 if wait_for_num_clients:
-                    if clients.targeted_total() < wait_for_num_clients:
-                        clients.targeted_client_add(ctx['ip'], ctx['pid'])
-
-                    if clients.is_all_targeted_updated():
+                    for pid in pids:
+                        # once a client ip is targeted, all of its pids are, clients are
+                        # only targeted when the rollout lets them have the update
+                        if admitted and (clients.targeted_total() < wait_for_num_clients or clients.is_targeted(ip)):
+                            clients.targeted_client_add(ip, pid)
+
+                    # clients known from a snapshot are updated when they check in, or forgotten after the ttl
+                    if clients.targeted_total() and clients.is_all_targeted_updated() and self._rollout_done() \
+                            and not clients.restored_total():
                         # this IMPLIES that all clients have received their new targets, so we can exit
                         print("Expected number ({}) of clients checked in, exiting server...".format(wait_for_num_clients))
                         set_run_server(False)
 
-                if target_client_ip is not None and ctx['ip'] == target_client_ip:
-                    if clients.targeted_client_add(ctx['ip'], ctx['pid']):
+                if target_client_ip is not None and ip == target_client_ip:
+                    newly_targeted = [pid for pid in pids if clients.targeted_client_add(ip, pid)]
+                    if newly_targeted:
                         # first time we see the client, update it
                         BusyPySettings["update"] = True
-                        print("target {}:{} -> {}".format(ctx['ip'], ctx['pid'], BusyPySettings))
+                        print("target {}:{} -> {}".format(ip, ",".join(newly_targeted), {k: v for k, v in BusyPySettings.items() if k != "profile"}))
 
                         # once client, all PIDs have been updated, we can exit
-                        if clients.is_targeted_updated(ctx['ip']):
+                        if clients.is_targeted_updated(ip):
                             print("Targeted client updated, exiting server...")
                             set_run_server(False)
 
-        return busypy_pb2.BusyPySettings(cpuLoadPercent=BusyPySettings["cpu"],
-                                         memoryPercent=BusyPySettings["mem"],
-                                         clientExit=BusyPySettings["exit"],
-                                         update=BusyPySettings["update"])
+        # targets set with busypyctl go to their clients right away, past --client-ip, --monitor and the rollout
+        targets, overridden = self._targets(ip, group)
+        if overrides.take_exit(ip, pids):
+            targets, overridden = dict(targets, exit=True), True
+        update = (BusyPySettings["update"] and admitted) or overridden
+        if telemetry is not None:
+            # the targets are known only when the client is told to update, and not playing a profile
+            cpu_target = mem_target = None
+            if update:
+                nan = float("nan")
+                cpu_target = nan if targets["profile"] is not None else targets["cpu"]
+                mem_target = nan if targets["profile"] is not None else targets["mem"]
+            for pid, cpu in workers:
+                telemetry.record(ip, pid, cpu, request.memoryPercent, cpu_target, mem_target)
+
+        return busypy_pb2.BusyPySettings(cpuLoadPercent=targets["cpu"],
+                                         memoryPercent=targets["mem"],
+                                         clientExit=targets["exit"],
+                                         update=update,
+                                         profile=targets["profile"],
+                                         ioMBps=targets["io_mbps"],
+                                         ioIOPS=targets["io_iops"],
+                                         memBandwidthGBps=targets["membw"],
+                                         netMbps=targets["net_mbps"],
+                                         netPeer=self._net_peer(ip, targets["net_mbps"]),
+                                         pollInterval=poll_interval)
+
+    def _targets(self, ip, group):
+        """ Targets of a client, the server targets with the ones set for it with busypyctl on top
+        :return: (targets, like BusyPySettings, True if any were set for the client)
+        """
+        override = overrides.resolve(ip, group)
+        if not override:
+            return BusyPySettings, False
+        targets = dict(BusyPySettings, **override)
+        if "cpu" in override or "mem" in override:
+            targets["profile"] = None  # the client plays a profile instead of cpu/mem
+        return targets, True
+
+    def _will_update(self, ip, overridden):
+        """ Whether a client gets its targets on its next status, without admitting it, see _handle_status()
+        """
+        if overridden:
+            return True
+        if monitor_only:
+            return False
+        if target_client_ip is not None:
+            return ip == target_client_ip and clients.is_targeted(ip)
+        if rollout is None:
+            return True
+        due = clients.rollout_due_time(ip)
+        return due is not None and due <= time.time()
+
+    def _rollout_admit(self, ip):
+        """ Staggered rollout, admit the client when the policy has room for it
+        :return: True if the client may have the new targets now
+        """
+        if rollout is None or target_client_ip is not None or monitor_only:
+            return True
+        now = time.time()
+        due = clients.rollout_due_time(ip)
+        if due is None:
+            if not rollout.take(now, clients.total()):
+                return False
+            due = now + rollout.delay()
+            clients.rollout_schedule(ip, due)
+        if due > now:
+            return False
+        clients.rollout_set_updated(ip)
+        return True
 
+    def _rollout_done(self):
+        return rollout is None or clients.rollout_progress()[0] >= clients.total()
 
-def serve():
-    server = grpc.server(futures.ThreadPoolExecutor(max_workers=10))
-    busypy_pb2_grpc.add_BusyPyServiceServicer_to_server(gRPCServer(), server)
+    def _rollout_tick(self, now):
+        """ Push the update to subscribed clients whose jittered turn came, and print the progress
+        """
+        due = set(clients.rollout_due(now))
+        if due:
+            for sub in list(self._subscribers.values()):
+                if sub["ctx"]['ip'] in due and sub["last_status"] is not None:
+                    self._push(sub, self._handle_status(sub["ctx"], sub["last_status"], report=False))
+
+        progress = clients.rollout_progress() + (clients.total(),)
+        if progress != self._rollout_reported and now - self._last_rollout_report > self.ROLLOUT_REPORT_INTERVAL:
+            self._last_rollout_report = now
+            self._rollout_reported = progress
+            updated, admitted, total = progress
+            if total and updated >= total:
+                print("Rollout: complete, {} clients updated".format(updated))
+            else:
+                print("Rollout: {} of {} clients updated, {} waiting for their turn".format(updated, total,
+                                                                                           admitted - updated))
+
+    def _net_update(self, ip, request):
+        """ Track the network sink and throughput of a node
+        """
+        if request.netPort:
+            node = self._net_nodes.get(ip)
+            if node is None or node[0] != request.netPort:
+                self._net_ring = None
+            self._net_nodes[ip] = [request.netPort, request.netMbps, request.netRxMbps]
+        elif ip in self._net_nodes:
+            self._net_nodes.pop(ip)
+            self._net_ring = None
+
+    def _net_peer(self, ip, net_mbps):
+        """ The network sink a node sends to, the sink of the next node by ip,
+        so the nodes send in a ring and each one receives from one other node
+        :param net_mbps: network target of the node, 0=none
+        :return: "host:port", empty if the node has no other node to send to
+        """
+        if not net_mbps or ip not in self._net_nodes:
+            return ""
+        if self._net_ring is None:
+            self._net_ring = sorted(self._net_nodes)
+        ring = self._net_ring
+        if len(ring) < 2:
+            return ""
+        peer = ring[(bisect.bisect_left(ring, ip) + 1) % len(ring)]
+        return "{}:{}".format(peer, self._net_nodes[peer][0])
+
+    def warm_start(self):
+        """ The clients are known from a snapshot, open the window now, rather than wait for them all to check in
+        """
+        self._start = time.time() - self.CLIENT_POLLING_TIME
+
+    def save_snapshot(self):
+        """ Save the client registry to the snapshot file
+        :return: True if saved
+        """
+        start = time.perf_counter()
+        try:
+            size = save_snapshot(snapshot_file, clients.snapshot(), clients.groups())
+        except (IOError, OSError) as e:
+            print("Snapshot not saved to {}: {}".format(snapshot_file, e))
+            return False
+        if verbose:
+            print("Snapshot: {} clients, {} bytes, saved in {:.1f} ms".format(clients.total(), size,
+                                                                             1000 * (time.perf_counter() - start)))
+        return True
+
+    def window_open(self):
+        """ The window opens when no new clients have been seen for CLIENT_POLLING_TIME
+        """
+        return (time.time() - self._start) > self.CLIENT_POLLING_TIME
+
+    async def GetSettings(self, request, context):
+        """ Clients call this method to get their target settings.
+        - when client calls, they also send their current state
+
+        :param request: client current state, see BusyPySettings for structure
+        :param context: gRPC context
+        :return: gRPC handler
+        """
+        # print(dir(context))
+        # [..., '_abc_cache', '_abc_negative_cache', '_abc_negative_cache_version', '_abc_registry', '_request_deserializer',
+        # '_rpc_event', '_state', 'abort', 'add_callback', 'auth_context', 'cancel', 'disable_next_message_compression',
+        # 'invocation_metadata', 'is_active', 'peer', 'peer_identities', 'peer_identity_key', 'send_initial_metadata',
+        # 'set_code', 'set_details', 'set_trailing_metadata', 'time_remaining']
+
+        ctx = self.__map_kv_dict(context)
+        start = time.perf_counter()
+        reply = self._handle_status(ctx, request)
+        rpc_seconds.observe(time.perf_counter() - start, method="GetSettings")
+        rpc_total.inc(method="GetSettings")
+        return reply
+
+    async def QueryFleet(self, request, context):
+        """ Fleet statistics from the telemetry of the clients
+
+        :param request: FleetQuery, zero values use the server defaults
+        :param context: gRPC context
+        :return: FleetStats
+        """
+        if telemetry is None:
+            await context.abort(grpc.StatusCode.UNAVAILABLE, "fleet telemetry is disabled, it requires numpy")
+        start = time.perf_counter()
+        stats = telemetry.query(recent=request.recent or TELEMETRY_RECENT,
+                                lag_percent=request.lagPercent or lag_percent,
+                                max_lagging=request.maxLagging or MAX_LAGGING)
+        reply = busypy_pb2.FleetStats(clients=stats["clients"],
+                                      processes=stats["processes"],
+                                      cpu=busypy_pb2.Distribution(**stats["cpu"]),
+                                      mem=busypy_pb2.Distribution(**stats["mem"]),
+                                      cpuDeviation=stats["cpu_deviation"],
+                                      memDeviation=stats["mem_deviation"],
+                                      laggingTotal=stats["lagging_total"],
+                                      lagging=[busypy_pb2.LaggingClient(ip=c["ip"], pid=int(c["pid"]),
+                                                                        cpu=c["cpu"], cpuTarget=c["cpu_target"],
+                                                                        mem=c["mem"], memTarget=c["mem_target"])
+                                               for c in stats["lagging"]],
+                                      samples=stats["samples"])
+        rpc_seconds.observe(time.perf_counter() - start, method="QueryFleet")
+        rpc_total.inc(method="QueryFleet")
+        return reply
+
+    def _push(self, sub, reply):
+        """ Queue settings for a subscriber, only if they tell the client to change,
+        or change how often it reports
+        """
+        last = sub["last_sent"]
+        if not reply.update and reply.pollInterval == (last.pollInterval if last is not None else 0):
+            return
+        if last == reply:
+            return
+        sub["last_sent"] = reply
+        sub["queue"].put_nowait(reply)
+        push_total.inc()
+
+    async def Subscribe(self, request_iterator, context):
+        """ Clients subscribe once, then
+        - send their status on the request stream, every status is handled like GetSettings
+        - get new settings pushed on the response stream as soon as they change
+
+        :param request_iterator: client status stream
+        :param context: gRPC context
+        :return: async generator of BusyPySettings
+        """
+        ctx = self.__map_kv_dict(context)
+        key = (ctx['ip'], ctx['pid'])
+        sub = {"ctx": ctx, "queue": asyncio.Queue(), "last_status": None, "last_sent": None}
+        self._subscribers[key] = sub
+
+        async def read_status():
+            try:
+                async for request in request_iterator:
+                    sub["last_status"] = request
+                    start = time.perf_counter()
+                    self._push(sub, self._handle_status(ctx, request))
+                    rpc_seconds.observe(time.perf_counter() - start, method="Subscribe")
+                    rpc_total.inc(method="Subscribe")
+            except grpc.RpcError:
+                pass  # client went away
+            finally:
+                sub["queue"].put_nowait(None)
+
+        reader = asyncio.ensure_future(read_status())
+        # headers go out now, rather than with the first push, clients time the stream open with them
+        await context.send_initial_metadata(())
+
+        try:
+            while True:
+                reply = await sub["queue"].get()
+                if reply is None:
+                    break
+                yield reply
+        finally:
+            reader.cancel()
+            if self._subscribers.get(key) is sub:
+                self._subscribers.pop(key)
+
+    def close(self):
+        """ End all the Subscribe streams, after anything already queued is sent
+        """
+        for sub in list(self._subscribers.values()):
+            sub["queue"].put_nowait(None)
+
+    def tick(self):
+        """ Called periodically by the server loop.  When the polling window
+        opens, subscribed clients are re-evaluated with their last status so
+        their new targets are pushed right away, instead of on their next status.
+        """
+        now = time.time()
+        if client_ttl and now - self._last_evict > self.EVICT_INTERVAL:
+            self._last_evict = now
+            for ip, pid in clients.evict_stale(client_ttl, now):
+                print("client {}:{} not seen for {}s, removed".format(ip, pid, client_ttl))
+                evicted_total.inc()
+                if telemetry is not None:
+                    telemetry.remove(ip, pid)
+                if not clients.is_ip_active(ip):
+                    overrides.forget([ip])
+                if ip in self._net_nodes and not clients.is_ip_active(ip):
+                    self._net_nodes.pop(ip)
+                    self._net_ring = None
+
+        if (verbose or monitor_only) and self._net_nodes and now - self._last_net_report > self.NET_REPORT_INTERVAL:
+            self._last_net_report = now
+            sent = sum(n[1] for n in self._net_nodes.values())
+            received = sum(n[2] for n in self._net_nodes.values())
+            print("Network: {} nodes, sent {:.1f} Mbit/s, received {:.1f} Mbit/s".format(len(self._net_nodes),
+                                                                                       sent, received))
+
+        if rollout is not None and target_client_ip is None and not monitor_only:
+            self._rollout_tick(now)
+
+        if snapshot_file and now - self._last_snapshot > snapshot_interval:
+            self._last_snapshot = now
+            self.save_snapshot()
+
+        if monitor_only and telemetry is not None and now - self._last_fleet_report > self.FLEET_REPORT_INTERVAL:
+            self._last_fleet_report = now
+            for line in format_stats(telemetry.query(lag_percent=lag_percent)):
+                print(line)
+
+        window_open = self.window_open()
+        opened = window_open and not self._window_was_open
+        self._window_was_open = window_open
+        if not opened:
+            return
+        for sub in list(self._subscribers.values()):
+            if sub["last_status"] is not None:
+                self._push(sub, self._handle_status(sub["ctx"], sub["last_status"], report=False))
+
+
+class AdminServicer(busypy_pb2_grpc.BusyPyAdminServicer):
+    """ Live control of the running server, see busypy_admin.py
+    - a change applies to the known clients and the clients checking in later,
+      the subscribed clients get it pushed right away, the others on their next status
+    - an exit is one-shot, only the client processes known now are told, once
+    """
+
+    def __init__(self, servicer):
+        self._servicer = servicer
+
+    async def _selector(self, selector, context):
+        """ TargetSelector into (all, group, networks), aborts the call on a bad ip/network
+        """
+        try:
+            return selector.all, selector.group, parse_networks(selector.ips)
+        except ValueError as e:
+            await context.abort(grpc.StatusCode.INVALID_ARGUMENT, str(e))
+
+    def _apply(self, selector):
+        """ Re-evaluate the selected subscribed clients with their last status, so they get the change now
+        :return: # of known client ips selected
+        """
+        for sub in list(self._servicer._subscribers.values()):
+            ip = sub["ctx"]['ip']
+            if sub["last_status"] is not None and selects(*selector, ip, clients.group(ip)):
+                self._servicer._push(sub, self._servicer._handle_status(sub["ctx"], sub["last_status"], report=False))
+        return sum(1 for ip, _ in clients.nodes() if selects(*selector, ip, clients.group(ip)))
+
+    async def SetTargets(self, request, context):
+        """ Set targets of the selected clients, only the fields that are set change
+
+        :param request: TargetChange
+        :param context: gRPC context
+        :return: AdminReply
+        """
+        selector = await self._selector(request.selector, context)
+        if not any(selector):
+            await context.abort(grpc.StatusCode.INVALID_ARGUMENT, "select all the clients, a group, or client ips/networks")
+        targets = targets_from_proto(request.targets)
+        if not targets:
+            await context.abort(grpc.StatusCode.INVALID_ARGUMENT, "no targets set")
+        # an exit is not kept, or every client restarted later would be told to exit again
+        exit_now = targets.pop("exit", False)
+        if targets:
+            try:
+                overrides.set(targets, *selector)
+            except ValueError as e:
+                await context.abort(grpc.StatusCode.INVALID_ARGUMENT, str(e))
+        if exit_now:
+            overrides.exit_once({ip: list(pids) for ip, pids in clients.nodes() if selects(*selector, ip, clients.group(ip))})
+        matched = self._apply(selector)
+        if targets:
+            print("Admin: targets {} set for {}, {} known clients".format(targets, _describe_selector(selector), matched))
+        if exit_now:
+            print("Admin: exit sent to {}, {} known clients".format(_describe_selector(selector), matched))
+        admin_total.inc(method="SetTargets")
+        return busypy_pb2.AdminReply(clients=matched, version=overrides.version)
+
+    async def ClearTargets(self, request, context):
+        """ Drop the targets set for the selected clients, they go back to the server targets
+
+        :param request: TargetSelector
+        :param context: gRPC context
+        :return: AdminReply
+        """
+        selector = await self._selector(request, context)
+        if not any(selector):
+            await context.abort(grpc.StatusCode.INVALID_ARGUMENT, "select all the clients, a group, or client ips/networks")
+        dropped = overrides.clear(*selector)
+        overrides.forget([ip for ip, _ in clients.nodes() if selects(*selector, ip, clients.group(ip))])
+        matched = self._apply(selector) if dropped else 0
+        print("Admin: targets of {} cleared, {} known clients".format(_describe_selector(selector), matched))
+        admin_total.inc(method="ClearTargets")
+        return busypy_pb2.AdminReply(clients=matched, version=overrides.version)
+
+    async def GetStatus(self, request, context):
+        """ Server targets, the targets set on it, and the clients
+
+        :param request: StatusQuery
+        :param context: gRPC context
+        :return: ServerStatus
+        """
+        selector = await self._selector(request.selector, context)
+        if not any(selector):
+            selector = (True, "", [])
+        now = time.time()
+        listed = []
+        total = 0
+        for ip, pids in sorted(clients.nodes(), key=lambda node: ip_key(node[0])):
+            group = clients.group(ip)
+            if not selects(*selector, ip, group):
+                continue
+            total += 1
+            if len(listed) >= request.maxClients:
+                continue
+            targets, overridden = self._servicer._targets(ip, group)
+            if overrides.exit_pending(ip):
+                targets, overridden = dict(targets, exit=True), True
+            cpu = [e.cpu for e in pids.values() if e.cpu is not None]
+            mem = [e.mem for e in pids.values() if e.mem is not None]
+            listed.append(busypy_pb2.ClientInfo(ip=ip, pids=sorted(pids), group=group,
+                                                lastSeen=now - max(e.last_seen for e in pids.values()),
+                                                cpu=sum(cpu) / len(cpu) if cpu else float("nan"),
+                                                mem=sum(mem) / len(mem) if mem else float("nan"),
+                                                targets=targets_to_proto(targets, busypy_pb2.Targets),
+                                                update=self._servicer._will_update(ip, overridden)))
+        admin_total.inc(method="GetStatus")
+        return busypy_pb2.ServerStatus(targets=targets_to_proto(BusyPySettings, busypy_pb2.Targets),
+                                       overrides=[busypy_pb2.TargetOverride(selector=name,
+                                                                            targets=targets_to_proto(t, busypy_pb2.Targets))
+                                                  for name, t in overrides.describe()],
+                                       clients=clients.total(),
+                                       processes=clients.total_pids(),
+                                       subscribers=len(self._servicer._subscribers),
+                                       version=overrides.version,
+                                       uptime=now - self._servicer.started,
+                                       listedTotal=total,
+                                       listed=listed)
+
+
+def _describe_selector(selector):
+    everyone, group, networks = selector
+    if everyone:
+        return "all clients"
+    return ", ".join((["group " + group] if group else []) + [str(n) for n in networks])
+
+
+async def serve():
+    global telemetry
+    server = grpc.aio.server(options=SERVER_OPTIONS)
+    servicer = gRPCServer()
+    try:
+        telemetry = TelemetryStore(telemetry_samples)
+    except RuntimeError as e:
+        print("Fleet telemetry disabled: {}".format(e))
+
+    if snapshot_file:
+        try:
+            snapshot = load_snapshot(snapshot_file, snapshot_max_age)
+        except ValueError as e:
+            print("Snapshot not restored: {}".format(e))
+            snapshot = None
+        if snapshot is not None:
+            saved, snapshot, groups, pruned = snapshot
+            restored = clients.restore(snapshot, groups, saved)
+            print("Snapshot of {}: restored {} clients ({} processes), {} not seen for over {}s pruned".format(
+                time.strftime("%H:%M:%S", time.localtime(saved)), clients.total(), restored, pruned, snapshot_max_age))
+            if restored:
+                servicer.warm_start()
+
+    @metrics.collector
+    def collect():
+        # called on the metrics thread, these are all O(1) reads
+        _clients_gauge.set(clients.total())
+        _pids_gauge.set(clients.total_pids())
+        _pending_gauge.set(clients.pending_total())
+        _subscribers_gauge.set(len(servicer._subscribers))
+        updated, admitted = clients.rollout_progress()
+        _rollout_gauge.set(updated, state="updated")
+        _rollout_gauge.set(admitted - updated, state="scheduled")
+        _rollout_gauge.set(max(0, clients.total() - admitted), state="waiting")
+
+    metrics_server = None
+    if metrics_port:
+        try:
+            metrics_server = MetricsServer(metrics, metrics_port).start()
+            print("Metrics on http://localhost:{}/metrics".format(metrics_server.port))
+        except OSError as e:
+            print("Metrics disabled, port {}: {}".format(metrics_port, e))
+    busypy_pb2_grpc.add_BusyPyServiceServicer_to_server(servicer, server)
+    busypy_pb2_grpc.add_BusyPyAdminServicer_to_server(AdminServicer(servicer), server)
     server.add_insecure_port('[::]:{}'.format(GRPC_SERVER_PORT))
-    server.start()
+    await server.start()
+    # docker stop, stop like on CTRL-C, so the last replies and the snapshot go out
+    asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, set_run_server, False)
     try:
         while run_server:
-            time.sleep(1)
-    except KeyboardInterrupt:
-        print("Stopped by user")
+            servicer.tick()
+            await asyncio.sleep(SERVER_TICK_SEC)
 
     finally:
-        server.stop(0)
+        # give the last replies/pushes a chance to go out
+        servicer.close()
+        await server.stop(SERVER_STOP_GRACE_SEC)
+        if snapshot_file and servicer.save_snapshot():
+            print("Snapshot of {} clients saved to {}".format(clients.total(), snapshot_file))
+        if metrics_server is not None:
+            metrics_server.stop()
 
 
 def _VERSION():
@@ -263,6 +1033,18 @@ if __name__ == '__main__':
     parser.add_argument('--mem', type=int, default=BusyPySettings["mem"],
                         help='Percent usage of the memory, default={}'.format(BusyPySettings["mem"]))
 
+    parser.add_argument('--io-mbps', dest="io_mbps", action='store', type=int, default=BusyPySettings["io_mbps"],
+                        help='Disk I/O MB/s, 0=none, default={}'.format(BusyPySettings["io_mbps"]))
+
+    parser.add_argument('--io-iops', dest="io_iops", action='store', type=int, default=BusyPySettings["io_iops"],
+                        help='Disk I/O operations per second, 0=none, default={}'.format(BusyPySettings["io_iops"]))
+
+    parser.add_argument('--membw', dest="membw", action='store', type=float, default=BusyPySettings["membw"],
+                        help='Memory bandwidth GB/s, 0=none, default={}'.format(BusyPySettings["membw"]))
+
+    parser.add_argument('--net-mbps', dest="net_mbps", action='store', type=float, default=BusyPySettings["net_mbps"],
+                        help='Network Mbit/s sent by each node to the next one, 0=none, default={}'.format(BusyPySettings["net_mbps"]))
+
     parser.add_argument('--grpc-port', dest="grpc_port", action='store', default=GRPC_SERVER_PORT,
                         help='gRPC server port, default={}.'.format(GRPC_SERVER_PORT))
 
@@ -279,7 +1061,59 @@ if __name__ == '__main__':
                         help='Target client ip address only')
 
     parser.add_argument('--monitor', dest="monitor", action='store_true',
-                        help='Monitor clients only')
+                        help='Monitor clients only, prints the fleet statistics, every client status with --verbose')
+
+    parser.add_argument('--client-ttl', dest="client_ttl", action='store', type=float, default=client_ttl,
+                        help='Forget clients not seen for this many seconds, 0=never, default={}'.format(client_ttl))
+
+    parser.add_argument('--profile', dest="profile", action='store',
+                        help='JSON load profile for the clients to play, cpu values like --cpu, see busypy_profile.py')
+
+    parser.add_argument('--profile-align', dest="profile_align", action='store', type=float, default=0,
+                        help='Start the profile on all clients at once, this many seconds after the server starts, '
+                             '0=each client starts it when received (default)')
+
+    parser.add_argument('--metrics-port', dest="metrics_port", action='store', type=int, default=metrics_port,
+                        help='Serve Prometheus metrics on this http port, 0=none, default={}'.format(metrics_port))
+
+    parser.add_argument('--rollout-rate', dest="rollout_rate", action='store', type=float, default=0,
+                        help='Staggered rollout, update this many clients per second, 0=all at once (default)')
+
+    parser.add_argument('--rollout-wave', dest="rollout_wave", action='store', type=float, default=0,
+                        help='Staggered rollout, update this percent of the clients per wave, 0=all at once (default)')
+
+    parser.add_argument('--rollout-interval', dest="rollout_interval", action='store', type=float,
+                        default=ROLLOUT_WAVE_SEC,
+                        help='Seconds between rollout waves, default={}'.format(ROLLOUT_WAVE_SEC))
+
+    parser.add_argument('--rollout-jitter', dest="rollout_jitter", action='store', type=float, default=0,
+                        help='Delay the update of each admitted client by up to this many seconds, default=0')
+
+    parser.add_argument('--poll-interval', dest="poll_interval", action='store', type=float, default=poll_interval,
+                        help='Suggest the clients report every this many seconds, e.g. longer for a large fleet, '
+                             '0=client default (2s)')
+
+    parser.add_argument('--telemetry-samples', dest="telemetry_samples", action='store', type=int,
+                        default=telemetry_samples,
+                        help='Recent samples kept per client process, for the fleet statistics, default={}'.format(telemetry_samples))
+
+    parser.add_argument('--lag-percent', dest="lag_percent", action='store', type=float, default=lag_percent,
+                        help='Clients this far off their target are lagging, default={}'.format(lag_percent))
+
+    parser.add_argument('--snapshot', dest="snapshot", action='store',
+                        help='Save the known clients to this file, at intervals and on exit, and restore them on start, '
+                             'so a restarted server acts on them right away, default none')
+
+    parser.add_argument('--snapshot-interval', dest="snapshot_interval", action='store', type=float,
+                        default=snapshot_interval,
+                        help='Seconds between snapshots, default={}'.format(snapshot_interval))
+
+    parser.add_argument('--snapshot-max-age', dest="snapshot_max_age", action='store', type=float,
+                        default=snapshot_max_age,
+                        help='Do not restore clients not seen for this many seconds, 0=restore all, default={}'.format(snapshot_max_age))
+
+    parser.add_argument('--verbose', dest="verbose", action='store_true',
+                        help='Print every client status')
 
     parser.add_argument('--version', dest="version", action='store_true', help='version')
 
@@ -292,10 +1126,40 @@ if __name__ == '__main__':
     BusyPySettings["cpu"] = args.cpu
     BusyPySettings["mem"] = args.mem
     BusyPySettings["exit"] = args.client_exit
+    BusyPySettings["io_mbps"] = args.io_mbps
+    BusyPySettings["io_iops"] = args.io_iops
+    BusyPySettings["membw"] = args.membw
+    BusyPySettings["net_mbps"] = args.net_mbps
+    if args.profile:
+        try:
+            profile = LoadProfile.load(args.profile)
+        except (IOError, OSError, ValueError) as e:
+            print("Bad profile {}: {}".format(args.profile, e))
+            sys.exit(1)
+        if args.profile_align:
+            profile.start = time.time() + args.profile_align
+        BusyPySettings["profile"] = profile.to_proto()
 
     wait_for_num_clients = int(args.wait_for)
     target_client_ip = args.client_ip
     monitor_only = args.monitor
+    verbose = args.verbose
+    client_ttl = args.client_ttl
+    metrics_port = args.metrics_port
+    GRPC_SERVER_PORT = args.grpc_port
+    telemetry_samples = max(1, args.telemetry_samples)
+    lag_percent = args.lag_percent
+    poll_interval = max(0.0, args.poll_interval)
+    snapshot_file = args.snapshot
+    snapshot_interval = max(1.0, args.snapshot_interval)
+    snapshot_max_age = max(0.0, args.snapshot_max_age)
+    if args.rollout_rate or args.rollout_wave:
+        try:
+            rollout = RolloutPolicy(rate=args.rollout_rate, wave_percent=args.rollout_wave,
+                                    wave_interval=args.rollout_interval, jitter=args.rollout_jitter, start=time.time())
+        except ValueError as e:
+            print("Bad rollout: {}, use one of --rollout-rate and --rollout-wave".format(e))
+            sys.exit(1)
 
     # from https://stackoverflow.com/questions/166506/finding-local-ip-addresses-using-pythons-stdlib
     ip = (([ip for ip in socket.gethostbyname_ex(socket.gethostname())[2] if not ip.startswith("127.")] or [
@@ -303,6 +1167,21 @@ if __name__ == '__main__':
          [socket.socket(socket.AF_INET, socket.SOCK_DGRAM)]][0][1]]) + ["no IP found"])[0]
 
     print("IP: {}, targets are CPU: {}, Memory: {}".format(ip, BusyPySettings["cpu"], BusyPySettings["mem"]))
+    if BusyPySettings["io_mbps"] or BusyPySettings["io_iops"]:
+        print("I/O targets are {} MB/s, {} IOPS".format(BusyPySettings["io_mbps"], BusyPySettings["io_iops"]))
+    if BusyPySettings["membw"]:
+        print("Memory bandwidth target is {} GB/s".format(BusyPySettings["membw"]))
+    if BusyPySettings["net_mbps"]:
+        print("Network target is {} Mbit/s per node".format(BusyPySettings["net_mbps"]))
+    if BusyPySettings["profile"] is not None:
+        print("Load profile {}, {} segments, {}".format(args.profile, len(BusyPySettings["profile"].segments),
+                                                      time.strftime("starts %H:%M:%S", time.localtime(BusyPySettings["profile"].startTime))
+                                                      if BusyPySettings["profile"].startTime else "starts when received"))
+    if rollout is not None:
+        print("Staggered rollout, {}".format(rollout.describe()))
     if wait_for_num_clients:
         print("init: waiting for {} clients to check in... will exit when they do.".format(wait_for_num_clients))
-    serve()
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        print("Stopped by user")
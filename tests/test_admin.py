@@ -0,0 +1,95 @@
+import pytest
+import busypy_pb2
+from busypy_admin import TargetOverrides, targets_from_proto, targets_to_proto, parse_networks, selects, ip_key
+
+
+def test_targets_proto_round_trip():
+    message = targets_to_proto({"cpu": 0, "net_mbps": 2.5}, busypy_pb2.Targets)
+    # 0 is set, not missing
+    assert message.HasField("cpuLoadPercent") and not message.HasField("memoryPercent")
+    assert targets_from_proto(message) == {"cpu": 0, "net_mbps": 2.5}
+
+
+def test_layers_narrowest_wins():
+    o = TargetOverrides()
+    o.set({"cpu": 10, "mem": 5}, everyone=True)
+    o.set({"cpu": 20}, group="web")
+    o.set({"cpu": 30}, networks=parse_networks(["10.0.0.0/16"]))
+    o.set({"cpu": 40}, networks=parse_networks(["10.0.1.0/24"]))
+    o.set({"cpu": 50}, networks=parse_networks(["10.0.1.7"]))
+    assert o.resolve("192.168.0.1") == {"cpu": 10, "mem": 5}
+    assert o.resolve("192.168.0.1", "web") == {"cpu": 20, "mem": 5}
+    assert o.resolve("10.0.2.1", "web") == {"cpu": 30, "mem": 5}
+    assert o.resolve("10.0.1.1", "web") == {"cpu": 40, "mem": 5}
+    assert o.resolve("10.0.1.7") == {"cpu": 50, "mem": 5}
+    assert o.resolve("not an ip") == {"cpu": 10, "mem": 5}
+    assert [name for name, _ in o.describe()] == ["*", "group:web", "10.0.0.0/16", "10.0.1.0/24", "10.0.1.7"]
+    assert o.version == 5
+
+
+def test_set_merges_and_validates():
+    o = TargetOverrides()
+    o.set({"cpu": 10}, group="web")
+    o.set({"mem": 5}, group="web")
+    assert o.resolve("10.0.0.1", "web") == {"cpu": 10, "mem": 5}
+    with pytest.raises(ValueError):
+        o.set({"cpu": 101}, group="web")
+    with pytest.raises(ValueError):
+        o.set({"io_mbps": -1}, group="web")
+    with pytest.raises(ValueError):
+        o.set({"cpu": 10})
+    assert o.resolve("10.0.0.1", "web") == {"cpu": 10, "mem": 5}
+    assert o.version == 2
+
+
+def test_clear():
+    o = TargetOverrides()
+    assert not o and o.resolve("10.0.0.1") == {}
+    o.set({"cpu": 10}, group="web", networks=parse_networks(["10.0.0.1", "10.1.0.0/16"]))
+    assert o.clear(networks=parse_networks(["10.0.0.1"])) == 1
+    assert o.resolve("10.0.0.1") == {}
+    assert o.clear(group="db") == 0
+    version = o.version
+    assert o.clear(everyone=True) == 2
+    assert not o and o.version == version + 1
+
+
+def test_exit_once():
+    o = TargetOverrides()
+    o.exit_once({"10.0.0.1": ["1", "2"], "10.0.0.2": ["3"]})
+    assert o.exit_pending("10.0.0.1")
+    # a restarted client (new pids) is not told
+    assert not o.take_exit("10.0.0.2", ["4"])
+    # one status per node tells all its pids at once
+    assert o.take_exit("10.0.0.1", ["1", "2"])
+    assert not o.take_exit("10.0.0.1", ["1", "2"])
+    assert not o.exit_pending("10.0.0.1")
+    # the exit is not a layer
+    assert not o and o.resolve("10.0.0.1") == {}
+    assert o.forget(["10.0.0.2", "10.0.0.9"]) == 1
+    assert not o.take_exit("10.0.0.2", ["3"])
+
+
+def test_exit_once_per_pid_status():
+    o = TargetOverrides()
+    o.exit_once({"10.0.0.1": ["1", "2"]})
+    assert o.take_exit("10.0.0.1", ["1"])
+    assert o.take_exit("10.0.0.1", ["2"])
+    assert not o.take_exit("10.0.0.1", ["1"])
+
+
+def test_selects():
+    networks = parse_networks(["10.0.1.0/24"])
+    assert selects(True, "", [], "anything", "")
+    assert selects(False, "web", [], "10.9.9.9", "web")
+    assert not selects(False, "web", [], "10.9.9.9", "db")
+    assert selects(False, "", networks, "10.0.1.5", "")
+    assert not selects(False, "", networks, "10.0.2.5", "")
+    assert not selects(False, "", networks, "bogus", "")
+    assert not selects(False, "", [], "10.0.1.5", "")
+    with pytest.raises(ValueError):
+        parse_networks(["bogus"])
+
+
+def test_ip_key():
+    assert sorted(["10.0.0.10", "bogus", "10.0.0.2", "::1"], key=ip_key) == ["10.0.0.2", "10.0.0.10", "::1", "bogus"]
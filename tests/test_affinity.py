@@ -0,0 +1,37 @@
+import pytest
+from busypy_affinity import MPOL_BIND, MPOL_DEFAULT, MPOL_INTERLEAVE, memory_nodes, nodes_of, parse_cpu_list
+
+NODES = {0: [0, 1, 2, 3], 1: [4, 5, 6, 7]}
+
+
+def test_parse_cpu_list():
+    assert parse_cpu_list("0-3,8,10-11") == [0, 1, 2, 3, 8, 10, 11]
+    assert parse_cpu_list(" 3, 1,1-2,") == [1, 2, 3]
+    assert parse_cpu_list("node1,0", NODES) == [0, 4, 5, 6, 7]
+
+
+@pytest.mark.parametrize("spec", ["", ",", "3-1", "a", "node2", "1-b"])
+def test_parse_bad_cpu_list(spec):
+    with pytest.raises(ValueError):
+        parse_cpu_list(spec, NODES)
+
+
+def test_nodes_of():
+    assert nodes_of([1, 2], NODES) == [0]
+    assert nodes_of([3, 4], NODES) == [0, 1]
+    assert nodes_of([9], NODES) == []
+
+
+def test_memory_nodes():
+    assert memory_nodes("none", [0], NODES) == (MPOL_DEFAULT, [])
+    assert memory_nodes("interleave", [0], NODES) == (MPOL_INTERLEAVE, [0, 1])
+    assert memory_nodes("local", [4, 5], NODES) == (MPOL_BIND, [1])
+    assert memory_nodes("remote", [4, 5], NODES) == (MPOL_BIND, [0])
+    assert memory_nodes("0,1", [0], NODES) == (MPOL_BIND, [0, 1])
+
+
+def test_memory_nodes_none_match():
+    with pytest.raises(ValueError, match="remote"):
+        memory_nodes("remote", [0, 4], NODES)
+    with pytest.raises(ValueError):
+        memory_nodes("2", [0], NODES)
@@ -0,0 +1,67 @@
+import time
+import threading
+import pytest
+import busypy
+import busypy_pb2
+import busypyserver
+from busypy import Backoff, NodeSession, gRPCClient
+
+
+def test_backoff_grows_to_the_cap_with_jitter(monkeypatch):
+    monkeypatch.setattr(busypy.random, "uniform", lambda lo, hi: (lo, hi))
+    backoff = Backoff(minimum=1, maximum=10)
+    assert [backoff.next() for _ in range(6)] == [(0.5, 1), (1, 2), (2, 4), (4, 8), (5, 10), (5, 10)]
+    backoff.reset()
+    assert backoff.next() == (0.5, 1)
+
+
+def test_backoff_jitter_spreads_clients():
+    delays = [Backoff(minimum=1, maximum=10).next() for _ in range(50)]
+    assert all(0.5 <= d <= 1 for d in delays)
+    assert len(set(delays)) > 1
+
+
+def client(connected):
+    c = gRPCClient.__new__(gRPCClient)
+    c.connected = threading.Event()
+    if connected:
+        c.connected.set()
+    return c
+
+
+def test_wait_retry_times_out():
+    start = time.time()
+    assert not client(False).wait_retry(0.2, threading.Event())
+    assert time.time() - start == pytest.approx(0.2, abs=0.1)
+
+
+def test_wait_retry_cut_short_when_the_server_comes_back(monkeypatch):
+    monkeypatch.setattr(busypy, "RECONNECT_JITTER_SEC", 0.01)
+    c = client(False)
+    threading.Timer(0.1, c.connected.set).start()
+    start = time.time()
+    assert c.wait_retry(5, threading.Event())
+    assert time.time() - start < 1
+
+
+def test_wait_retry_stops():
+    stop = threading.Event()
+    stop.set()
+    assert not client(True).wait_retry(5, stop)
+
+
+def test_server_suggested_interval(capsys):
+    session = NodeSession.__new__(NodeSession)
+    session.poll_interval = busypy.REPORT_INTERVAL_SEC
+    for suggested, expected in ((10, 10), (0.1, busypy.POLL_INTERVAL_MIN_SEC),
+                                (1e6, busypy.POLL_INTERVAL_MAX_SEC), (0, busypy.REPORT_INTERVAL_SEC)):
+        session.apply_settings(busypy_pb2.BusyPySettings(update=False, pollInterval=suggested))
+        assert session.poll_interval == expected
+    assert "Reporting to the server every 10.0s" in capsys.readouterr().out
+
+
+def test_server_sends_interval(monkeypatch):
+    monkeypatch.setattr(busypyserver, "clients", busypyserver.clientIPs())
+    monkeypatch.setattr(busypyserver, "poll_interval", 15.0)
+    reply = busypyserver.gRPCServer()._handle_status({"ip": "10.0.0.1", "pid": "1"}, busypy_pb2.BusyPySettings())
+    assert reply.pollInterval == 15.0
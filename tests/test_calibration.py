@@ -0,0 +1,68 @@
+from multiprocessing import Array
+import pytest
+import busypy_calibration as calibration
+
+
+def test_lookup_empty():
+    assert calibration.lookup(calibration.empty_table(), 50) is None
+
+
+def test_lookup_interpolates_between_known_points():
+    table = calibration.empty_table()
+    table[40], table[60] = 0.5, 0.7
+    assert calibration.lookup(table, 40) == pytest.approx(0.5)
+    assert calibration.lookup(table, 50) == pytest.approx(0.6)
+    assert calibration.lookup(table, 45.5) == pytest.approx(0.555)
+
+
+def test_lookup_scales_one_sided():
+    table = calibration.empty_table()
+    table[50] = 0.6
+    assert calibration.lookup(table, 25) == pytest.approx(0.3)
+    assert calibration.lookup(table, 75) == pytest.approx(0.9)
+    assert calibration.lookup(table, 100) == 1.0
+
+
+def test_learn_moving_average():
+    table = calibration.empty_table()
+    calibration.learn(table, 50, 0.6)
+    assert table[50] == pytest.approx(0.6)
+    calibration.learn(table, 50, 0.7, alpha=0.5)
+    assert table[50] == pytest.approx(0.65)
+    # scaled to the whole percent
+    calibration.learn(table, 20.4, 0.204)
+    assert table[20] == pytest.approx(0.2)
+    calibration.learn(table, 0, 0.5)
+    assert calibration.known_points(table) == 2
+
+
+def test_learn_shared_array():
+    table = Array('d', calibration.empty_table())
+    calibration.learn(table, 30, 0.4)
+    assert table[30] == pytest.approx(0.4)
+
+
+def test_same_table_nan_aware():
+    a = calibration.empty_table()
+    b = calibration.empty_table()
+    # a shared Array hands out new NaN objects, and NaN != NaN
+    assert list(Array('d', a)) != list(Array('d', b))
+    assert calibration.same_table(a, b)
+    b[10] = 0.1
+    assert not calibration.same_table(a, b)
+    a[10] = 0.1
+    assert calibration.same_table(list(Array('d', a)), b)
+
+
+def test_save_load_round_trip(tmp_path):
+    path = str(tmp_path / "cache" / "calibration.json")
+    assert calibration.load(path, "host") is None
+    table = calibration.empty_table()
+    table[50] = 0.612345678
+    calibration.save(path, "host", table)
+    calibration.save(path, "other", calibration.empty_table())
+    loaded = calibration.load(path, "host")
+    assert loaded[50] == pytest.approx(0.61235)
+    assert calibration.known_points(loaded) == 1
+    assert calibration.load(path, "missing") is None
+    assert calibration.known_points(calibration.load(path, "other")) == 0
@@ -0,0 +1,75 @@
+from busypy_affinity import allowed_cpus
+from busypy_cgroup import CgroupLimits, _ancestors, _cgroup_dir
+
+GB = 1024 ** 3
+
+
+def tree(tmp_path, files):
+    """ Write a fake cgroup mount, files is {relative path: text}
+    """
+    for path, text in files.items():
+        f = tmp_path.joinpath(path)
+        f.parent.mkdir(parents=True, exist_ok=True)
+        f.write_text(text)
+    return str(tmp_path)
+
+
+def limits(version, cpu, memory, host_memory=64 * GB):
+    l = CgroupLimits(pid="no-such-pid")
+    assert not l.found
+    l.version, l._cpu, l._memory, l._host_memory = version, cpu, memory, host_memory
+    return l
+
+
+def test_ancestors_stop_at_the_mount():
+    assert list(_ancestors("/sys/fs/cgroup/a/b", "/sys/fs/cgroup")) == ["/sys/fs/cgroup/a/b", "/sys/fs/cgroup/a",
+                                                                        "/sys/fs/cgroup"]
+    assert list(_ancestors("/sys/fs/cgroup", "/sys/fs/cgroup/")) == ["/sys/fs/cgroup"]
+
+
+def test_cgroup_dir(tmp_path):
+    mount = tree(tmp_path, {"user.slice/busypy/cpu.max": "max 100000\n", "cpu.max": "max 100000\n"})
+    assert _cgroup_dir(mount, "/", "/user.slice/busypy", "cpu.max") == mount + "/user.slice/busypy"
+    # inside a container the cgroup path is not under the mounted root
+    assert _cgroup_dir(mount, "/", "/kubepods/pod1", "cpu.max") == mount
+    assert _cgroup_dir(mount, "/", "/user.slice/busypy", "memory.max") is None
+
+
+def test_v2_lowest_limit_up_the_hierarchy(tmp_path):
+    mount = tree(tmp_path, {"cpu.max": "max 100000", "memory.max": "max",
+                            "a/cpu.max": "150000 100000", "a/memory.max": str(4 * GB),
+                            "a/b/cpu.max": "300000 100000", "a/b/memory.max": str(8 * GB)})
+    leaf = (mount + "/a/b", mount)
+    l = limits(2, leaf, leaf)
+    assert l._cpu_quota() == 1.5
+    assert l._memory_limit() == 4 * GB
+
+
+def test_v2_no_limit(tmp_path):
+    mount = tree(tmp_path, {"a/cpu.max": "max 100000", "a/memory.max": "max"})
+    leaf = (mount + "/a", mount)
+    l = limits(2, leaf, leaf)
+    assert l._cpu_quota() is None
+    assert l._memory_limit() is None
+
+
+def test_v1_quota(tmp_path):
+    mount = tree(tmp_path, {"cpu.cfs_quota_us": "-1", "cpu.cfs_period_us": "100000",
+                            "memory.limit_in_bytes": "9223372036854771712",
+                            "a/cpu.cfs_quota_us": "50000", "a/cpu.cfs_period_us": "100000",
+                            "a/memory.limit_in_bytes": str(2 * GB)})
+    leaf = (mount + "/a", mount)
+    l = limits(1, leaf, leaf)
+    assert l._cpu_quota() == 0.5
+    assert l._memory_limit() == 2 * GB
+
+
+def test_read_throttling(tmp_path):
+    mount = tree(tmp_path, {"cpu.max": "200000 100000", "memory.max": str(GB),
+                            "cpu.stat": "usage_usec 10\nnr_periods 40\nnr_throttled 4\nthrottled_usec 2500000\n"})
+    l = limits(2, (mount, mount), (mount, mount))
+    quota = l.read()
+    assert quota.cpus == min(2.0, len(allowed_cpus()))  # capped at the cpuset
+    assert quota.memory == GB
+    assert (quota.nr_periods, quota.nr_throttled, quota.throttled_sec) == (40, 4, 2.5)
+    assert l.capacity(quota) == (quota.cpus, GB)
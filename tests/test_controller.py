@@ -0,0 +1,76 @@
+import pytest
+from busypy_controller import PIDController, StepController, make_controller, STEP_INITIAL_DUTY
+
+
+def settle(controller, plant, updates=400, dt=0.5):
+    """ Run a controller against a plant, measured cpu percent = plant(duty)
+    """
+    measured = plant(controller.duty)
+    for _ in range(updates):
+        measured = plant(controller.update(measured, dt))
+    return measured
+
+
+def overhead(duty):
+    # 10% of every period goes to interpreter overhead, 50% cpu needs a duty cycle of 0.6
+    return max(0.0, min(100.0, (duty - 0.1) * 100.0))
+
+
+def test_pid_settles_on_target():
+    c = PIDController()
+    c.reset(50)
+    assert settle(c, overhead) == pytest.approx(50, abs=0.5)
+    assert c.duty == pytest.approx(0.6, abs=0.01)
+    assert c.settled
+
+
+def test_pid_retarget_keeps_learned_correction():
+    c = PIDController()
+    c.reset(50)
+    settle(c, overhead)
+    integral = c._integral
+    c.reset(50)
+    assert c.duty == pytest.approx(0.5 + c.ki * integral)
+    assert c.duty == pytest.approx(0.6, abs=0.01)
+    c.reset(30)
+    assert c.duty == pytest.approx(0.3 + c.ki * integral)
+    assert c.duty == pytest.approx(0.4, abs=0.01)
+    assert not c.settled
+
+
+def test_pid_start_at_carries_on_from_duty():
+    c = PIDController()
+    c.reset(50)
+    c.start_at(0.6)
+    assert c.duty == pytest.approx(0.6)
+    # on target, the first update keeps the duty cycle
+    assert c.update(50, 0.5) == pytest.approx(0.6)
+
+
+def test_pid_follow_moves_with_feedforward():
+    c = PIDController()
+    c.reset(40)
+    c.start_at(0.5)
+    c.follow(50)
+    assert c.duty == pytest.approx(0.6)
+    assert c.target == 50
+
+
+def test_step_settles_on_target():
+    c = StepController()
+    c.reset(50)
+    assert c.duty == STEP_INITIAL_DUTY
+    assert settle(c, overhead) == pytest.approx(50, abs=1)
+
+
+def test_step_start_at_skips_fast_search():
+    c = StepController()
+    c.reset(50)
+    c.start_at(0.6)
+    assert c.update(40, 0.5) == pytest.approx(0.605)
+
+
+def test_make_controller():
+    assert isinstance(make_controller("pid"), PIDController)
+    with pytest.raises(ValueError):
+        make_controller("nope")
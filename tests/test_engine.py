@@ -0,0 +1,77 @@
+import time
+import pytest
+from busypy_engine import IterationEngine, TimeSliceEngine, make_engine
+
+
+class Counter(object):
+    """ Unit of work that only counts its calls
+    """
+
+    def __init__(self):
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+
+
+def run(engine, duty, cycles):
+    """ :return: (wall seconds, cpu seconds of this thread) of the cycles
+    """
+    wall, cpu = time.perf_counter(), time.thread_time()
+    for _ in range(cycles):
+        engine.cycle(duty)
+    return time.perf_counter() - wall, time.thread_time() - cpu
+
+
+def test_timeslice_busy_fraction_follows_duty():
+    engine = TimeSliceEngine(period_ms=20, work=Counter())
+    wall, cpu = run(engine, 0.5, 25)
+    assert wall == pytest.approx(0.5, abs=0.1)
+    assert cpu / wall == pytest.approx(0.5, abs=0.15)
+
+
+def test_timeslice_idle_and_full():
+    work = Counter()
+    engine = TimeSliceEngine(period_ms=20, work=work)
+    wall, cpu = run(engine, 0.0, 10)
+    assert work.calls == 0
+    assert wall == pytest.approx(0.2, abs=0.05)
+
+    wall, cpu = run(engine, 1.0, 10)
+    assert work.calls > 0
+    assert cpu / wall > 0.8
+
+
+def test_timeslice_periods_on_absolute_deadlines():
+    engine = TimeSliceEngine(period_ms=20, work=Counter())
+    engine.cycle(0.5)
+    first = engine._next
+    engine.cycle(0.5)
+    assert engine._next == pytest.approx(first + 0.02)
+
+
+def test_timeslice_resyncs_when_behind():
+    engine = TimeSliceEngine(period_ms=20, work=Counter())
+    engine.cycle(0.0)
+    time.sleep(0.1)  # more than a period late, the missed periods are not made up
+    wall, _ = run(engine, 0.5, 1)
+    assert wall < 0.04
+
+
+def test_iterations_engine():
+    work = Counter()
+    engine = IterationEngine(iterations=50, work=work)
+    engine.cycle(1.0)
+    assert work.calls == 50
+    engine.cycle(0.5)
+    assert work.calls == 100
+
+
+def test_make_engine():
+    work = Counter()
+    engine = make_engine("timeslice", period_ms=50, work=work)
+    assert isinstance(engine, TimeSliceEngine)
+    assert engine.period == 0.05 and engine.work is work
+    assert isinstance(make_engine("iterations"), IterationEngine)
+    with pytest.raises(ValueError):
+        make_engine("turbo")
@@ -0,0 +1,60 @@
+import os
+import time
+import pytest
+from busypy_io import LatencyWindow, IOLoad
+
+
+@pytest.fixture
+def load(tmp_path):
+    loads = []
+
+    def make(**kwargs):
+        loads.append(IOLoad(directory=str(tmp_path), block_kb=4, file_mb=1, **kwargs))
+        return loads[-1]
+    yield make
+    for l in loads:
+        l.close()
+
+
+def test_latency_percentiles():
+    window = LatencyWindow(size=100)
+    assert window.percentiles() == [0.0, 0.0, 0.0]
+    for ms in range(1, 101):
+        window.add(ms / 1000.0)
+    assert window.percentiles() == pytest.approx([51.0, 96.0, 100.0])
+    # the ring keeps the last 100
+    for _ in range(100):
+        window.add(0.001)
+    assert window.percentiles() == pytest.approx([1.0, 1.0, 1.0])
+
+
+def test_cycle_paces_ops(load):
+    io = load(mode="randread")
+    start = time.perf_counter()
+    for _ in range(5):
+        io.cycle(200, period=0.1)
+    assert time.perf_counter() - start == pytest.approx(0.5, abs=0.1)
+    assert io.ops == pytest.approx(100, abs=5)
+    assert io.bytes == io.ops * io.block
+
+
+def test_sequential_writes_wrap(load):
+    io = load(mode="write", use_mmap=True)
+    for _ in range(io.blocks + 1):
+        io.op()
+    assert io._offset == io.block
+    assert io._writes == io.blocks + 1
+
+
+def test_scratch_file_removed(tmp_path):
+    io = IOLoad(directory=str(tmp_path), block_kb=4, file_mb=1)
+    assert os.path.getsize(io.path) == io.blocks * io.block
+    io.close()
+    assert not os.listdir(str(tmp_path))
+
+
+def test_bad_options(tmp_path):
+    with pytest.raises(ValueError):
+        IOLoad(directory=str(tmp_path), mode="seek")
+    with pytest.raises(ValueError):
+        IOLoad(directory=str(tmp_path), direct=True, use_mmap=True)
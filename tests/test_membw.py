@@ -0,0 +1,46 @@
+import pytest
+
+numpy = pytest.importorskip("numpy")
+
+from busypy_membw import CACHE_LINE, CHASE_ACCESSES, MemBandwidthLoad
+
+
+@pytest.mark.parametrize("kernel,arrays", [("copy", 2), ("scale", 2), ("triad", 3)])
+def test_stream_bytes(kernel, arrays):
+    load = MemBandwidthLoad(kernel, working_set_mb=3, chunk_kb=64)
+    load()
+    assert load.bytes == 64 * 1024 * arrays
+
+
+def test_triad_result():
+    load = MemBandwidthLoad("triad", working_set_mb=3, chunk_kb=64)
+    load._c[:] = 1.0
+    load()
+    chunk = 64 * 1024 // 8
+    assert (load._a[:chunk] == 1.0 * 3.0 + 2.0).all()
+    assert (load._a[chunk:] == 1.0).all()
+
+
+def test_chunks_wrap_around():
+    load = MemBandwidthLoad("copy", working_set_mb=3, chunk_kb=256)
+    calls = load._size // load._chunk
+    for _ in range(calls):
+        load()
+    assert load._offset == calls * load._chunk
+    load()  # the next chunk does not fit, start over
+    assert load._offset == load._chunk
+
+
+def test_chase_counts_cache_lines():
+    load = MemBandwidthLoad("chase", working_set_mb=8)
+    load()
+    assert load.bytes == CHASE_ACCESSES * CACHE_LINE
+
+
+def test_calibrate():
+    assert MemBandwidthLoad("copy", working_set_mb=3).calibrate(0.05) > 0
+
+
+def test_unknown_kernel():
+    with pytest.raises(ValueError):
+        MemBandwidthLoad("stream")
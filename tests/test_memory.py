@@ -0,0 +1,66 @@
+import sys
+import mmap
+import time
+import subprocess
+import psutil
+import pytest
+from busypy_memory import MemoryArena, MemoryManager, MB
+
+
+def test_arena_rounds_to_pages_and_chunks():
+    arena = MemoryArena(increment_mb=1.001)
+    assert arena.increment % mmap.PAGESIZE == 0 and arena.increment >= 1.001 * MB
+    assert arena.resize(3.4 * arena.increment) == 3 * arena.increment
+    assert arena.resize(0.4 * arena.increment) == 0
+    arena.close()
+
+
+def test_arena_resident_memory_is_its_size():
+    # the chunks are touched in place, nothing but the chunks stays resident
+    proc = psutil.Process()
+    arena = MemoryArena(increment_mb=16)
+    before = proc.memory_info().rss
+    arena.resize(128 * MB)
+    grown = proc.memory_info().rss - before
+    assert grown == pytest.approx(128 * MB, abs=8 * MB)
+    arena.close()
+    assert arena.size == 0
+    assert proc.memory_info().rss - before < 8 * MB
+
+
+class FixedUsage(MemoryManager):
+    """ Resident memory is the arena plus a fixed baseline, so adjust() is deterministic
+    """
+
+    def used_bytes(self):
+        return 100 * MB + self.arena.size
+
+
+def test_manager_adjust_hits_target_and_limit():
+    manager = FixedUsage(MemoryArena(increment_mb=1), total=1000 * MB)
+    assert manager.adjust(30) == pytest.approx(10)
+    assert manager.used_bytes() == 300 * MB
+    # within the tolerance nothing changes
+    manager.adjust(30.1)
+    assert manager.used_bytes() == 300 * MB
+    manager.limit = 200 * MB
+    manager.adjust(50)
+    assert manager.used_bytes() == 200 * MB
+    manager.close()
+
+
+def test_manager_excludes_worker_processes():
+    # a worker child with a large buffer of its own, like the memory bandwidth worker
+    child = subprocess.Popen([sys.executable, "-c", "import sys; b = bytearray(64 * 1024 * 1024); sys.stdin.read()"],
+                             stdin=subprocess.PIPE)
+    try:
+        proc = psutil.Process(child.pid)
+        deadline = time.time() + 10
+        while proc.memory_info().rss < 64 * MB and time.time() < deadline:
+            time.sleep(0.05)
+        counted = MemoryManager(MemoryArena(increment_mb=1), total=1000 * MB)
+        excluded = MemoryManager(MemoryArena(increment_mb=1), total=1000 * MB, exclude=[child.pid])
+        assert counted.used_bytes() - excluded.used_bytes() == pytest.approx(proc.memory_info().rss, rel=0.1)
+        assert counted.used_bytes() - excluded.used_bytes() >= 64 * MB
+    finally:
+        child.communicate(b"")
@@ -0,0 +1,58 @@
+from urllib.request import urlopen
+from busypy_metrics import CONTENT_TYPE, MetricsRegistry, MetricsServer
+
+
+def test_render_gauge_and_counter():
+    registry = MetricsRegistry()
+    up = registry.gauge("busypy_up", "Up")
+    rpcs = registry.counter("busypy_rpc_total", "RPCs", ("method",))
+    up.set(1)
+    rpcs.inc(method="GetSettings")
+    rpcs.inc(2, method="GetSettings")
+    rpcs.inc(method='Sub"scribe')
+    assert registry.render() == ("# HELP busypy_up Up\n"
+                                 "# TYPE busypy_up gauge\n"
+                                 "busypy_up 1.0\n"
+                                 "# HELP busypy_rpc_total RPCs\n"
+                                 "# TYPE busypy_rpc_total counter\n"
+                                 'busypy_rpc_total{method="GetSettings"} 3.0\n'
+                                 'busypy_rpc_total{method="Sub\\"scribe"} 1.0\n')
+
+
+def test_histogram_buckets_are_cumulative():
+    registry = MetricsRegistry()
+    latency = registry.histogram("busypy_seconds", "Latency", buckets=(0.1, 1.0))
+    for value in (0.05, 0.1, 0.5, 5.0):
+        latency.observe(value)
+    lines = registry.render().splitlines()[2:]
+    assert lines == ['busypy_seconds_bucket{le="0.1"} 2.0',
+                     'busypy_seconds_bucket{le="1.0"} 3.0',
+                     'busypy_seconds_bucket{le="+Inf"} 4.0',
+                     "busypy_seconds_sum 5.65",
+                     "busypy_seconds_count 4.0"]
+
+
+def test_collectors_run_at_scrape(capsys):
+    registry = MetricsRegistry()
+    gauge = registry.gauge("busypy_value", "Value")
+    values = iter([1, 2])
+    registry.collector(lambda: gauge.set(next(values)))
+
+    def broken():
+        raise RuntimeError("gone")
+    registry.collector(broken)
+    assert "busypy_value 1.0" in registry.render()
+    assert "busypy_value 2.0" in registry.render()
+    assert "metrics collector broken failed: gone" in capsys.readouterr().out
+
+
+def test_server():
+    registry = MetricsRegistry()
+    registry.gauge("busypy_up", "Up").set(1)
+    server = MetricsServer(registry, 0, host="127.0.0.1").start()
+    try:
+        with urlopen("http://127.0.0.1:{}/metrics".format(server.port), timeout=5) as response:
+            assert response.headers["Content-Type"] == CONTENT_TYPE
+            assert "busypy_up 1.0" in response.read().decode()
+    finally:
+        server.stop()
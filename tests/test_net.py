@@ -0,0 +1,36 @@
+import time
+import pytest
+from busypy_net import NET_PORT, NetSink, NetSender, parse_peer
+
+
+def test_parse_peer():
+    assert parse_peer("10.0.0.1") == ("10.0.0.1", NET_PORT)
+    assert parse_peer("10.0.0.1:6000") == ("10.0.0.1", 6000)
+    assert parse_peer("node1", 7000) == ("node1", 7000)
+    with pytest.raises(ValueError):
+        parse_peer("node1:http")
+
+
+def wait_for(sink, count, timeout=5):
+    deadline = time.time() + timeout
+    while sink.bytes < count and time.time() < deadline:
+        time.sleep(0.01)
+    return sink.bytes
+
+
+@pytest.mark.parametrize("use_sendfile", [False, True])
+def test_sender_paces_to_sink(use_sendfile):
+    sink = NetSink(port=0).start()
+    try:
+        sender = NetSender("127.0.0.1", sink.port, use_sendfile=use_sendfile)
+        try:
+            start = time.perf_counter()
+            for _ in range(5):
+                sender.cycle(1000 * 1000, period=0.05)  # 50 KB per period
+            assert time.perf_counter() - start == pytest.approx(0.25, abs=0.1)
+            assert sender.bytes == 5 * 50 * 1000
+        finally:
+            sender.close()
+        assert wait_for(sink, sender.bytes) == sender.bytes
+    finally:
+        sink.stop()
@@ -0,0 +1,72 @@
+import json
+import pytest
+from busypy_profile import LoadProfile, ProfilePlayer, Segment
+
+SPEC = {"start": 0, "loop": False, "segments": [
+    {"shape": "step", "duration": 10, "cpu": 50},
+    {"shape": "ramp", "duration": 20, "cpu": [10, 30], "mem": [4, 8]},
+    {"shape": "sine", "duration": 40, "cpu": [20, 60], "period": 40},
+    {"shape": "burst", "duration": 100, "cpu": [10, 90], "rate": 0.5, "length": 1, "seed": 7}]}
+
+
+def test_segments_play_back_to_back():
+    profile = LoadProfile.from_dict(SPEC)
+    assert profile.duration == 170
+    assert profile.at(-5) == (50, None)
+    assert profile.at(5) == (50, None)
+    assert profile.at(20) == (pytest.approx(20), pytest.approx(6))
+    assert profile.at(30)[0] == pytest.approx(40)       # sine starts at the middle
+    assert profile.at(40)[0] == pytest.approx(60)       # a quarter period in
+    assert profile.at(1000) == profile.at(170)          # the last segment holds
+
+
+def test_loop():
+    profile = LoadProfile.from_dict(dict(SPEC, loop=True))
+    assert profile.at(175) == profile.at(5)
+
+
+def test_burst_is_deterministic_per_seed():
+    a = [Segment("burst", 100, [10, 90], rate=0.5, seed=7).at(t)[0] for t in range(100)]
+    b = [Segment("burst", 100, [10, 90], rate=0.5, seed=7).at(t + 0.5)[0] for t in range(100)]
+    c = [Segment("burst", 100, [10, 90], rate=0.5, seed=8).at(t)[0] for t in range(100)]
+    assert a == b
+    assert a != c
+    assert set(a) == {10, 90}
+
+
+@pytest.mark.parametrize("segment", [
+    {"shape": "square", "duration": 1, "cpu": 5},
+    {"shape": "step", "duration": 0, "cpu": 5},
+    {"shape": "step", "duration": 1, "cpu": "lots"},
+    {"shape": "step", "duration": 1},
+    {"shape": "step", "duration": 1, "cpu": 5, "color": "red"},
+])
+def test_bad_segments(segment):
+    with pytest.raises(ValueError):
+        LoadProfile.from_dict({"segments": [segment]})
+
+
+def test_no_segments():
+    with pytest.raises(ValueError):
+        LoadProfile.from_dict({"segments": []})
+
+
+def test_proto_round_trip(tmp_path):
+    path = tmp_path / "profile.json"
+    path.write_text(json.dumps(dict(SPEC, start=1000, loop=True)))
+    profile = LoadProfile.load(str(path))
+    copy = LoadProfile.from_proto(profile.to_proto())
+    assert copy.start == 1000 and copy.loop
+    for t in (0, 15, 33.3, 77, 150):
+        cpu, mem = copy.at(t)
+        assert cpu == pytest.approx(profile.at(t)[0], abs=1e-4)
+        assert mem == (None if profile.at(t)[1] is None else pytest.approx(profile.at(t)[1]))
+
+
+def test_player_scales_cpu_from_start():
+    profile = LoadProfile.from_dict(SPEC)
+    player = ProfilePlayer(profile, now=500.0, scale=0.5)
+    assert player.start == 500.0
+    assert player.targets(505.0) == (25.0, None)
+    profile.start = 100.0
+    assert ProfilePlayer(profile, now=500.0).targets(105.0) == (50.0, None)
@@ -0,0 +1,109 @@
+import pytest
+import busypyserver
+from busypyserver import clientIPs
+
+
+class Clock(object):
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def time(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(busypyserver, "time", clock)
+    return clock
+
+
+def test_add_update_remove(clock):
+    c = clientIPs()
+    assert c.add_ip("10.0.0.1", "1", cpu=10, mem=2)
+    assert c.add_ip("10.0.0.1", "2")
+    assert c.add_ip("10.0.0.2", "1")
+    assert c.total() == 2 and c.total_pids() == 3
+
+    clock.now += 5
+    assert not c.add_ip("10.0.0.1", "1", cpu=20)
+    entry = c._clients["10.0.0.1"]["1"]
+    assert (entry.last_seen, entry.cpu, entry.mem) == (1005.0, 20, 2)
+    # seen last, so it is the newest
+    assert [(e.ip, e.pid) for e in c.entries()] == [("10.0.0.1", "2"), ("10.0.0.2", "1"), ("10.0.0.1", "1")]
+
+    assert c.remove_ip_pid("10.0.0.1", "1")
+    assert not c.remove_ip_pid("10.0.0.1", "1")
+    assert not c.remove_ip_pid("10.0.0.9", "1")
+    assert c.is_ip_active("10.0.0.1")
+    assert c.remove_ip_pid("10.0.0.1", "2")
+    assert not c.is_ip_active("10.0.0.1")
+    assert c.total() == 1 and c.total_pids() == 1
+
+
+def test_evict_oldest_at_deadline(clock):
+    c = clientIPs()
+    c.add_ip("10.0.0.1", "1")
+    clock.now += 10
+    c.add_ip("10.0.0.2", "1")
+    clock.now += 10
+    c.add_ip("10.0.0.3", "1")
+    c.add_ip("10.0.0.1", "2")
+
+    # seen exactly ttl ago is stale
+    assert c.evict_stale(30, now=1030.0) == [("10.0.0.1", "1")]
+    assert c.evict_stale(30, now=1030.0) == []
+    assert c.evict_stale(30, now=1039.9) == []
+    assert c.evict_stale(30, now=1040.0) == [("10.0.0.2", "1")]
+    assert c.evict_stale(30, now=1050.0) == [("10.0.0.3", "1"), ("10.0.0.1", "2")]
+    assert c.total() == 0 and c.total_pids() == 0
+
+
+def test_targeted_pending(clock):
+    c = clientIPs()
+    c.add_ip("10.0.0.1", "1")
+    c.add_ip("10.0.0.1", "2")
+    assert c.targeted_client_add("10.0.0.1", "1")
+    assert not c.targeted_client_add("10.0.0.1", "1")
+    assert c.pending_total() == 1
+    assert not c.is_targeted_updated("10.0.0.1")
+
+    # a new pid of a targeted client needs the update too
+    c.add_ip("10.0.0.1", "3")
+    c.targeted_client_add("10.0.0.1", "2")
+    assert not c.is_all_targeted_updated()
+
+    # a pid that goes away does not hold up the update
+    c.remove_ip_pid("10.0.0.1", "3")
+    assert c.is_targeted_updated("10.0.0.1")
+    assert c.is_all_targeted_updated()
+    assert c.pending_total() == 0
+
+    c.remove_ip_pid("10.0.0.1", "1")
+    c.remove_ip_pid("10.0.0.1", "2")
+    assert not c.is_targeted("10.0.0.1")
+    assert c.targeted_total() == 0
+
+
+def test_groups(clock):
+    c = clientIPs()
+    c.add_ip("10.0.0.1", "1", group="db")
+    c.add_ip("10.0.0.1", "2")
+    assert c.group("10.0.0.1") == "db"
+    c.add_ip("10.0.0.1", "1", group=None)   # older clients do not send one, keep it
+    assert c.group("10.0.0.1") == "db"
+    c.add_ip("10.0.0.1", "1", group="")     # restarted without --group
+    assert c.group("10.0.0.1") == ""
+    c.add_ip("10.0.0.1", "1", group="web")
+
+    # the group goes with the last pid of the ip
+    c.remove_ip_pid("10.0.0.1", "1")
+    assert c.group("10.0.0.1") == "web"
+    c.remove_ip_pid("10.0.0.1", "2")
+    assert c.group("10.0.0.1") == ""
+    assert c._groups == {}
+
+    c.add_ip("10.0.0.2", "1", group="db")
+    clock.now += 60
+    assert c.evict_stale(30) == [("10.0.0.2", "1")]
+    assert c._groups == {}
@@ -0,0 +1,46 @@
+import pytest
+from busypy_rollout import RolloutPolicy
+
+
+def admitted(policy, now, fleet, tries):
+    return sum(policy.take(now, fleet) for _ in range(tries))
+
+
+def test_rate_token_bucket():
+    policy = RolloutPolicy(rate=10, start=0.0)
+    # one token at the start, not a second's worth
+    assert admitted(policy, 0.0, 100, 5) == 1
+    assert admitted(policy, 0.5, 100, 20) == 5
+    # the bucket holds at most a second's worth
+    assert admitted(policy, 10.0, 100, 50) == 10
+
+
+def test_slow_rate():
+    policy = RolloutPolicy(rate=0.5, start=0.0)
+    assert admitted(policy, 0.0, 10, 3) == 1
+    assert admitted(policy, 1.0, 10, 3) == 0
+    assert admitted(policy, 2.0, 10, 3) == 1
+
+
+def test_waves():
+    policy = RolloutPolicy(wave_percent=25, wave_interval=10, start=0.0)
+    assert admitted(policy, 0.0, 100, 100) == 25
+    assert admitted(policy, 9.9, 100, 100) == 0
+    assert admitted(policy, 10.0, 100, 100) == 25
+    # the fleet grew while rolling out, wave 3 is 75% of it
+    assert admitted(policy, 20.0, 200, 200) == 100
+    # after the last wave everyone is admitted, clients joining later too
+    assert admitted(policy, 30.0, 200, 500) == 500
+
+
+@pytest.mark.parametrize("kwargs", [{}, {"rate": 1, "wave_percent": 10}, {"wave_percent": 101},
+                                    {"wave_percent": 10, "wave_interval": 0}, {"rate": 1, "jitter": -1}])
+def test_bad_policy(kwargs):
+    with pytest.raises(ValueError):
+        RolloutPolicy(**kwargs)
+
+
+def test_delay_within_jitter():
+    assert RolloutPolicy(rate=1).delay() == 0.0
+    policy = RolloutPolicy(rate=1, jitter=5)
+    assert all(0 <= policy.delay() <= 5 for _ in range(100))
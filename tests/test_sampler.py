@@ -0,0 +1,62 @@
+import os
+import pytest
+import busypy_sampler
+from busypy_sampler import UsageSampler
+
+
+class Clock(object):
+    """ perf_counter() one second on at every call
+    """
+
+    def __init__(self):
+        self.now = -1.0
+
+    def perf_counter(self):
+        self.now += 1
+        return self.now
+
+
+@pytest.fixture
+def reads(monkeypatch):
+    """ Scripted cpu seconds of the process and the node, None is a failed read
+    """
+    reads = {"proc": [], "node": []}
+    monkeypatch.setattr(busypy_sampler, "read_proc_cpu", lambda pid: reads["proc"].pop(0))
+    monkeypatch.setattr(busypy_sampler, "read_node_cpu", lambda: reads["node"].pop(0))
+    monkeypatch.setattr(busypy_sampler, "time", Clock())
+    return reads
+
+
+def sampler():
+    s = UsageSampler(os.getpid(), hz=1, window=10)
+    s._use_proc = True
+    return s
+
+
+def test_failed_reads_are_skipped(reads):
+    s = sampler()
+    reads["proc"] += [1.0, None, 1.5, None]
+    reads["node"] += [(2.0, 8.0), (4.0, 12.0)]
+    assert [s.sample() for _ in range(4)] == [True, False, True, False]
+    # the window is the good samples, at t=0 and t=1
+    assert s.cpu_percent() == pytest.approx(50.0)
+    assert s.node_cpu_percent() == pytest.approx(50.0)
+
+
+def test_only_failed_reads(reads):
+    s = sampler()
+    reads["proc"] += [None, None]
+    s.sample()
+    s.sample()
+    assert s.cpu_percent() == 0.0
+    assert s.node_cpu_percent() is None
+
+
+def test_node_read_fails(reads):
+    s = sampler()
+    reads["proc"] += [1.0, 2.0]
+    reads["node"] += [(2.0, 8.0), (None, None)]
+    s.sample()
+    s.sample()
+    assert s.cpu_percent() == pytest.approx(100.0)
+    assert s.node_cpu_percent() is None
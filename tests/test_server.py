@@ -0,0 +1,71 @@
+import queue
+import asyncio
+import grpc
+import pytest
+import busypy_pb2
+import busypy_pb2_grpc
+import busypyserver
+
+
+@pytest.fixture
+def servicer(monkeypatch):
+    monkeypatch.setattr(busypyserver, "clients", busypyserver.clientIPs())
+    monkeypatch.setattr(busypyserver, "BusyPySettings", dict(busypyserver.BusyPySettings, cpu=40, mem=5))
+    return busypyserver.gRPCServer()
+
+
+def status(cpu=10, *pids):
+    return busypy_pb2.BusyPySettings(cpuLoadPercent=cpu, memoryPercent=1,
+                                     workers=[busypy_pb2.WorkerStatus(pid=pid, cpuLoadPercent=cpu) for pid in pids])
+
+
+def test_push_only_changes(servicer):
+    sub = {"queue": queue.Queue(), "last_sent": None}
+    update = busypy_pb2.BusyPySettings(cpuLoadPercent=40, update=True)
+    servicer._push(sub, update)
+    servicer._push(sub, busypy_pb2.BusyPySettings(cpuLoadPercent=40, update=True))
+    servicer._push(sub, busypy_pb2.BusyPySettings(cpuLoadPercent=40, update=False))
+    assert sub["queue"].qsize() == 1
+    servicer._push(sub, busypy_pb2.BusyPySettings(cpuLoadPercent=50, update=True))
+    assert [sub["queue"].get_nowait().cpuLoadPercent for _ in range(2)] == [40, 50]
+    assert sub["queue"].empty()
+
+
+def test_subscribe_round_trip(servicer):
+    async def session():
+        server = grpc.aio.server()
+        busypy_pb2_grpc.add_BusyPyServiceServicer_to_server(servicer, server)
+        port = server.add_insecure_port("127.0.0.1:0")
+        await server.start()
+        try:
+            async with grpc.aio.insecure_channel("127.0.0.1:{}".format(port)) as channel:
+                stub = busypy_pb2_grpc.BusyPyServiceStub(channel)
+                statuses = asyncio.Queue()
+                for s in (status(10, 101, 102), status(12, 101, 102)):
+                    statuses.put_nowait(s)
+
+                async def requests():
+                    while True:
+                        s = await statuses.get()
+                        if s is None:
+                            return
+                        yield s
+
+                call = stub.Subscribe(requests(), metadata=(("ip", "10.0.0.1"), ("pid", "100")))
+                replies = [await asyncio.wait_for(call.read(), 5)]
+                # the same settings again are not pushed, the stream ends when the client closes it
+                statuses.put_nowait(None)
+                while True:
+                    reply = await asyncio.wait_for(call.read(), 5)
+                    if reply is grpc.aio.EOF:
+                        break
+                    replies.append(reply)
+                return replies
+        finally:
+            await server.stop(None)
+
+    replies = asyncio.run(session())
+    assert len(replies) == 1
+    assert replies[0].update and replies[0].cpuLoadPercent == 40 and replies[0].memoryPercent == 5
+    assert busypyserver.clients.total() == 1
+    assert not servicer._subscribers
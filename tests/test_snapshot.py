@@ -0,0 +1,102 @@
+import zlib
+import pytest
+import struct
+from busypy_snapshot import MAGIC, _HEADER, save_snapshot, load_snapshot
+from busypyserver import clientIPs
+
+CLIENTS = {
+    "10.0.0.1": [("100", 1000.0, 27.5, 7.0), ("101", 990.0, None, None)],
+    "10.0.0.2": [("200", 500.0, 50.0, 3.0)],
+}
+
+
+def test_round_trip(tmp_path):
+    path = str(tmp_path / "state" / "server.bps")
+    size = save_snapshot(path, CLIENTS, {"10.0.0.2": "db"}, now=1000.0)
+    assert size > 0
+    saved, clients, groups, pruned = load_snapshot(path, max_age=0, now=2000.0)
+    assert saved == 1000.0 and pruned == 0
+    assert clients == CLIENTS
+    assert groups == {"10.0.0.2": "db"}
+
+
+def test_loads_version_1(tmp_path):
+    # version 1 has no groups
+    body = b"\x0810.0.0.1\x01\x00\x03100" + struct.pack("<dff", 1000.0, 27.5, 7.0)
+    path = tmp_path / "server.bps"
+    path.write_bytes(_HEADER.pack(MAGIC, 1, 1000.0, 1) + zlib.compress(body))
+    assert load_snapshot(str(path), max_age=0) == (1000.0, {"10.0.0.1": [("100", 1000.0, 27.5, 7.0)]}, {}, 0)
+
+
+def test_prunes_old_entries(tmp_path):
+    path = str(tmp_path / "server.bps")
+    save_snapshot(path, CLIENTS, {"10.0.0.1": "web", "10.0.0.2": "db"}, now=1000.0)
+    saved, clients, groups, pruned = load_snapshot(path, max_age=100, now=1095.0)
+    assert pruned == 2
+    assert clients == {"10.0.0.1": [("100", 1000.0, 27.5, 7.0)]}
+    assert groups == {"10.0.0.1": "web"}
+
+
+def test_missing_file(tmp_path):
+    assert load_snapshot(str(tmp_path / "none.bps")) is None
+
+
+@pytest.mark.parametrize("data", [b"", b"not a snapshot at all, nope", MAGIC + b"\0" * 30])
+def test_not_a_snapshot(tmp_path, data):
+    path = tmp_path / "bad.bps"
+    path.write_bytes(data)
+    with pytest.raises(ValueError):
+        load_snapshot(str(path))
+
+
+def test_damaged_body(tmp_path):
+    path = str(tmp_path / "server.bps")
+    save_snapshot(path, CLIENTS, now=1000.0)
+    with open(path, "rb") as f:
+        data = f.read()
+    with open(path, "wb") as f:
+        f.write(data[:-5])
+    with pytest.raises(ValueError):
+        load_snapshot(path, max_age=0)
+    # a valid zlib body that ends early
+    body = zlib.decompress(data[_HEADER.size:])
+    with open(path, "wb") as f:
+        f.write(data[:_HEADER.size] + zlib.compress(body[:-3]))
+    with pytest.raises(ValueError):
+        load_snapshot(path, max_age=0)
+
+
+def test_registry_restore_and_confirm():
+    registry = clientIPs()
+    assert registry.restore(CLIENTS, {"10.0.0.1": "web"}, saved=1000.0, now=3000.0) == 3
+    assert registry.total() == 2 and registry.restored_total() == 2
+    assert registry.groups() == {"10.0.0.1": "web"}
+    # the 2000s the server was down do not count, the clients have the rest of their ttl to check in, oldest first
+    assert [(e.pid, e.last_seen) for e in registry.entries()] == [("200", 2500.0), ("101", 2990.0), ("100", 3000.0)]
+    assert registry.evict_stale(10, now=3005.0) == [("10.0.0.2", "200"), ("10.0.0.1", "101")]
+    assert registry.restore({"10.0.0.2": [("200", 500.0, 50.0, 3.0)]}, saved=1000.0, now=3000.0) == 1
+    # the node restarted, its old pid 101 is gone
+    assert registry.confirm("10.0.0.1", ["100", "102"])
+    assert not registry.confirm("10.0.0.1", ["100", "102"])
+    assert sorted(pid for pid, _, _, _ in registry.snapshot()["10.0.0.1"]) == ["100"]
+    assert registry.restored_total() == 1
+    # round trip through the registry
+    assert registry.snapshot()["10.0.0.2"] == [("200", 2500.0, 50.0, 3.0)]
+
+
+def test_registry_restore_clamps_to_now():
+    registry = clientIPs()
+    registry.restore({"10.0.0.1": [("100", 5000.0, None, None)]}, saved=1000.0, now=3000.0)
+    assert registry.entries()[0].last_seen == 3000.0
+
+
+def test_registry_groups_round_trip(tmp_path):
+    registry = clientIPs()
+    registry.add_ip("10.0.0.1", "100", group="web")
+    registry.add_ip("10.0.0.2", "200")
+    path = str(tmp_path / "server.bps")
+    save_snapshot(path, registry.snapshot(), registry.groups())
+    saved, snapshot, groups, _ = load_snapshot(path)
+    restored = clientIPs()
+    restored.restore(snapshot, groups, saved)
+    assert restored.group("10.0.0.1") == "web" and restored.group("10.0.0.2") == ""
@@ -0,0 +1,75 @@
+import pytest
+
+pytest.importorskip("numpy")
+
+from busypy_telemetry import TelemetryStore, format_stats
+
+
+def test_ring_keeps_the_last_samples():
+    store = TelemetryStore(samples=3, rows=2)
+    for cpu in (10, 20, 30, 40, 50):
+        store.record("10.0.0.1", "1", cpu, 5, cpu_target=40, mem_target=5)
+    stats = store.query(recent=3)
+    assert stats["cpu"]["max"] == 50
+    # mean of 30, 40, 50 is on target
+    assert stats["cpu_deviation"] == pytest.approx(0)
+    # recent is capped at the ring size
+    assert store.query(recent=10)["cpu_deviation"] == pytest.approx(0)
+    assert store.query(recent=1)["cpu_deviation"] == pytest.approx(10)
+
+
+def test_rows_grow_and_are_reused():
+    store = TelemetryStore(samples=4, rows=2)
+    for n in range(5):
+        store.record("10.0.0.{}".format(n), "1", n, 1)
+    assert len(store) == 5
+    assert store.query()["clients"] == 5
+    assert store.remove("10.0.0.0", "1")
+    assert not store.remove("10.0.0.0", "1")
+    store.record("10.0.0.9", "1", 99, 1)
+    # the freed row starts empty, not with the old client's samples
+    stats = store.query()
+    assert stats["processes"] == 5 and stats["cpu"]["max"] == 99
+    assert len(store._keys) == 8
+
+
+def test_clients_are_ips():
+    store = TelemetryStore(samples=2, rows=4)
+    store.record("10.0.0.1", "1", 10, 5)
+    store.record("10.0.0.1", "2", 30, 5)
+    stats = store.query()
+    assert stats["clients"] == 1 and stats["processes"] == 2
+    assert stats["cpu"]["p50"] == pytest.approx(20)
+    store.remove("10.0.0.1", "1")
+    assert store.query()["clients"] == 1
+    store.remove("10.0.0.1", "2")
+    assert store.query()["clients"] == 0
+
+
+def test_lagging_worst_first():
+    store = TelemetryStore(samples=5, rows=4)
+    store.record("10.0.0.1", "1", 50, 5, cpu_target=50, mem_target=5)
+    store.record("10.0.0.2", "1", 30, 5, cpu_target=50, mem_target=5)
+    store.record("10.0.0.3", "1", 45, 20, cpu_target=50, mem_target=5)
+    # no target known, never lagging
+    store.record("10.0.0.4", "1", 0, 0, cpu_target=float("nan"), mem_target=float("nan"))
+    stats = store.query(lag_percent=4, max_lagging=1)
+    assert stats["lagging_total"] == 2
+    assert [c["ip"] for c in stats["lagging"]] == ["10.0.0.2"]
+    assert stats["lagging"][0]["cpu_target"] == 50
+    assert stats["cpu_deviation"] == pytest.approx((0 + 20 + 5) / 3.0)
+
+
+def test_empty_query_and_format():
+    store = TelemetryStore(samples=2, rows=1)
+    stats = store.query()
+    assert stats["processes"] == 0 and stats["cpu"]["p50"] == 0.0
+    store.record("10.0.0.1", "1", 12, 3, cpu_target=50, mem_target=3)
+    lines = format_stats(store.query(lag_percent=5))
+    assert lines[0].startswith("Fleet: 1 clients, 1 processes")
+    assert any("10.0.0.1" in line for line in lines)
+
+
+def test_bad_samples():
+    with pytest.raises(ValueError):
+        TelemetryStore(samples=0)
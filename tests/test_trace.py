@@ -0,0 +1,94 @@
+import math
+import pytest
+import busypy
+from busypy_trace import CSVTrace, BinaryTrace, TracePlayer, open_trace, convert, expand_columns
+
+
+def write(tmp_path, text, name="trace.csv"):
+    path = tmp_path / name
+    path.write_text(text)
+    return str(path)
+
+
+def test_csv_rows(tmp_path):
+    trace = CSVTrace(write(tmp_path, "cpu,time,mem\n10%,0,5\n,1.5,6\n30,2024-01-01T00:00:00Z\n"))
+    assert trace.columns == ["cpu", "mem"]
+    rows = list(trace.rows())
+    assert rows[0] == (0.0, [10.0, 5.0])
+    assert rows[1][0] == 1.5 and math.isnan(rows[1][1][0])
+    assert rows[2][0] == 1704067200.0 and math.isnan(rows[2][1][1])
+
+
+def test_csv_bad_rows(tmp_path):
+    with pytest.raises(ValueError, match="line 3"):
+        list(CSVTrace(write(tmp_path, "time,cpu\n0,10\n1,ten\n")).rows())
+    # a short row without the time column
+    with pytest.raises(ValueError, match="line 2"):
+        list(CSVTrace(write(tmp_path, "cpu,time\n10\n")).rows())
+    with pytest.raises(ValueError):
+        CSVTrace(write(tmp_path, "time\n0\n"))
+
+
+def test_binary_round_trip(tmp_path):
+    csv_path = write(tmp_path, "time,cpu,mem\n0,10,5\n1,,6\n")
+    out = str(tmp_path / "trace.bpt")
+    assert convert(csv_path, out) == 2
+    trace = open_trace(out)
+    assert isinstance(trace, BinaryTrace)
+    assert trace.columns == ["cpu", "mem"]
+    rows = list(trace.rows())
+    assert rows[0] == (0.0, [10.0, 5.0])
+    assert math.isnan(rows[1][1][0])
+
+
+def test_player_validate(tmp_path):
+    apply = lambda cpu, mem: None
+    assert TracePlayer(open_trace(write(tmp_path, "time,cpu\n0,10\n1,20\n")), apply, ["cpu"]).validate() == 2
+    with pytest.raises(ValueError):
+        TracePlayer(open_trace(write(tmp_path, "time,cpu\n0,10\nx,20\n")), apply, ["cpu"]).validate()
+    with pytest.raises(ValueError):
+        TracePlayer(open_trace(write(tmp_path, "time,cpu\n")), apply, ["cpu"]).validate()
+    with pytest.raises(ValueError):
+        TracePlayer(open_trace(write(tmp_path, "time,cpu\n0,1\n")), apply, ["gpu"])
+
+
+def test_player_holds_nan_and_plays_all(tmp_path):
+    played = []
+    trace = open_trace(write(tmp_path, "time,cpu,mem\n0,10,5\n0.01,,6\n0.02,30,\n"))
+    player = TracePlayer(trace, lambda cpu, mem: played.append((cpu, mem)), ["cpu"], "mem", speed=10)
+    player.start()
+    player._thread.join(5)
+    assert played == [([10.0], 5.0), ([10.0], 6.0), ([30.0], 6.0)]
+
+
+def test_player_stops_on_bad_row(tmp_path, capsys):
+    played = []
+    path = write(tmp_path, "time,cpu\n0,10\n0.01,bad\n0.02,30\n")
+    player = TracePlayer(open_trace(path), lambda cpu, mem: played.append(cpu), ["cpu"], speed=10)
+    player.start()
+    player._thread.join(5)
+    assert not player._thread.is_alive()
+    assert played == [[10.0]]
+    assert "trace replay stopped after 1 rows" in capsys.readouterr().out
+
+
+def test_expand_columns():
+    assert expand_columns("cpu_{host}, mem", host="n1") == ["cpu_n1", "mem"]
+
+
+def test_apply_trace_scales_worker_columns(monkeypatch):
+    # with --cgroup-targets the trace is in percent of the quota, like the node target
+    monkeypatch.setattr(busypy, "shared", busypy._make_shared(2))
+    monkeypatch.setattr(busypy, "BURN_THREADS", 2)
+    busypy.shared["cpu_scale"].value = 0.5
+    busypy.apply_trace([40.0, 80.0], 5.0)
+    assert list(busypy.shared["worker_target"]) == [10.0, 20.0]
+    assert busypy.shared["mem_target"].value == 5
+    for x in range(2):
+        assert busypy._cpu_target(x) == busypy.shared["worker_target"][x]
+
+    monkeypatch.setattr(busypy, "CGROUP_TARGETS", True)
+    busypy.apply_trace([40.0], None)
+    assert busypy.shared["cpu_target"].value == 40.0
+    busypy.shared["worker_target"][:] = [-1.0, -1.0]
+    assert busypy._cpu_target(0) == 20.0
@@ -0,0 +1,37 @@
+import pytest
+import busypy_workload
+from busypy_workload import WORKLOADS, SortWork, make_workload
+
+
+@pytest.mark.parametrize("name", sorted(WORKLOADS))
+def test_kernels_run(name):
+    if name in ("gemm", "fft") and busypy_workload.numpy is None:
+        pytest.skip("needs numpy")
+    work = make_workload(name)
+    assert work.name == name
+    for _ in range(3):
+        work()
+
+
+def test_only_sort_holds_the_gil():
+    assert [name for name, w in WORKLOADS.items() if not w.releases_gil] == ["sort"]
+
+
+def test_sort_work_alternates():
+    work = SortWork()
+    work()
+    assert work._sortme == sorted(work._sortme)
+    work()
+    assert work._sortme == sorted(work._sortme, reverse=True)
+
+
+def test_numpy_kernels_need_numpy(monkeypatch):
+    monkeypatch.setattr(busypy_workload, "numpy", None)
+    with pytest.raises(RuntimeError, match="numpy"):
+        make_workload("gemm")
+    make_workload("hash")
+
+
+def test_unknown_workload():
+    with pytest.raises(ValueError):
+        make_workload("mine")